@@ -0,0 +1,222 @@
+"""Agentic travel advice: the ReAct agent and the compiled plan that skips it for city names.
+
+The agent always drives the same decision: ``valid_city(city)``, then
+``travel_advice(city)`` or ``excuse(city)``. Every ReAct step is an LLM round trip
+whose JSON blob has to be parsed, so a city takes five LLM calls (three agent steps,
+two tools). The compiled plan runs that tool graph directly:
+
+    prompt is a city name (at most four words of letters, optionally after "travel to",
+    "advice for", ...)
+        in the gazetteer .............................. travel_advice                1 LLM call
+        one unknown word .............................. valid_city (LLM), then
+                                                        travel_advice or excuse      2 LLM calls
+    anything else, including unknown multi-word names .. ReAct agent (max 5 iterations)
+
+The gazetteer is cities.txt next to this file, plus the file in GAZETTEER_PATH: one
+name per line, or a GeoNames cities TSV (e.g. cities15000.txt, with alternate names).
+The tools are memoized per city, see tool_cache.py.
+
+The plan taken is set on the current span (``agentic.plan`` compiled or react,
+``agentic.city_check`` gazetteer or valid_city, ``agentic.city``) and counted in the
+``travel_advisor.agentic.requests`` counter with the ``plan`` attribute.
+"""
+
+# environment variables used:
+# - AGENTIC_PLAN: "compiled" runs city prompts through the compiled plan, "react" sends every prompt to the agent (default: compiled)
+# - GAZETTEER_PATH: file with more city names for the compiled plan's city check (default: none)
+
+import os
+import re
+from pathlib import Path
+
+from langchain.agents import AgentExecutor, create_structured_chat_agent
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
+from opentelemetry import metrics, trace
+from traceloop.sdk.decorators import task
+
+from tool_cache import memoize, normalize_city
+
+PLAN_MODE = os.environ.get("AGENTIC_PLAN", "compiled").lower()
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH", "")
+CITIES_PATH = Path(__file__).resolve().parent / "cities.txt"
+
+meter = metrics.get_meter("travel-advisor")
+agentic_requests = meter.create_counter(
+    "travel_advisor.agentic.requests", description="Agentic completions by the plan that answered them")
+
+# requests phrased around a city name, the rest of the prompt is the city
+_CITY_REQUEST = re.compile(
+    r"^(?:please\s+)?(?:(?:give\s+me\s+)?(?:some\s+|a\s+)?(?:travel\s+)?(?:advice|advise|tips)\s+(?:for|about|on)"
+    r"|tell\s+me\s+about|what\s+about|how\s+about|visiting|visit|travel(?:l?ing)?\s+to|trip\s+to|going\s+to)\s+",
+    re.IGNORECASE)
+# a normalized city name: words of letters joined by spaces, hyphens or apostrophes
+_CITY_NAME = re.compile(r"[^\W\d_]+(?:[ '-][^\W\d_]+){0,3}")
+_NOT_LETTERS = re.compile('[^a-zA-Z]')
+
+
+##########
+# Agentic Tools
+
+def create_tools(ollama_client, model):
+    """Return the tools of the agent, ``[valid_city, travel_advice, excuse]``, calling ``model`` through ``ollama_client``."""
+
+    @tool
+    async def excuse(city: str)->str:
+        """ Returns an excuse why it cannot provide an answer """
+        prompt = f"Provide an excuse on why you cannot provide a travel advice about {city}"
+        response = await ollama_client.generate(model=model, prompt=prompt)
+        return response.get("response")
+
+    # valid_city and travel_advice answer the same for the same city, their results are
+    # memoized per normalized city name, see tool_cache.py
+    @tool
+    @task(name="valid_city")
+    @memoize("valid_city")
+    async def valid_city(city: str)->bool:
+        """ Returns if the input is a valid city"""
+        prompt = f"Is {city} a city? respond ONLY with yes or no."
+        response = await ollama_client.generate(model=model, prompt=prompt)
+        response = _NOT_LETTERS.sub('', response.get("response")).lower()
+        return response == "yes" or response.startswith("yes")
+
+    @tool
+    @task(name="travel_advice")
+    @memoize("travel_advice")
+    async def travel_advice(city: str)->str:
+        """ Provide travel advice for the given city"""
+        prompt = f"Give travel advise in a paragraph of max 50 words about {city}"
+        response = await ollama_client.generate(model=model, prompt=prompt)
+        return "Final Answer:" + response.get("response")
+
+    return [valid_city, travel_advice, excuse]
+
+
+def create_react_executor(llm, tools):
+    __system = '''Respond to the human as helpfully and accurately as possible. You have access to the following tools:
+    
+{tools}
+
+Use a json blob to specify a tool by providing an action key (tool name) and an action_input key (tool input).
+
+Valid "action" values: "Final Answer" or {tool_names}
+
+Provide only ONE action per $JSON_BLOB, as shown:
+
+```
+{{
+  "action": $TOOL_NAME,
+  "action_input": $INPUT
+}}
+```
+
+Follow this format:
+
+Question: input question to answer
+Thought: consider previous and subsequent steps
+Action:
+```
+$JSON_BLOB
+```
+Observation: action result
+... (repeat Thought/Action/Observation N times)
+Thought: I know what to respond
+Action:
+```
+{{
+  "action": "Final Answer",
+  "action_input": "Final response to human"
+}}
+
+Begin! Reminder to ALWAYS respond with a valid json blob of a single action. Use tools if necessary. Respond directly if appropriate. Format is Action:```$JSON_BLOB```then Observation'''
+
+    __human = '''
+{input}
+
+{agent_scratchpad}
+
+(reminder to respond in a JSON blob no matter what)'''
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", __system),
+            MessagesPlaceholder("chat_history", optional=True),
+            ("human", __human),
+        ]
+    )
+    agent = create_structured_chat_agent(llm, tools, prompt)
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        handle_parsing_errors=True,
+        max_iterations=5,
+    )
+
+
+##########
+# Compiled plan
+
+def load_gazetteer(paths=None):
+    """Return the normalized city names in ``paths`` (default: cities.txt and GAZETTEER_PATH)."""
+    if paths is None:
+        paths = [CITIES_PATH] + ([GAZETTEER_PATH] if GAZETTEER_PATH else [])
+    names = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) > 3:
+                    # GeoNames: geonameid, name, asciiname, alternatenames, ...
+                    candidates = [fields[1], fields[2]] + fields[3].split(",")
+                else:
+                    candidates = [fields[0]]
+                names.update(key for key in map(normalize_city, candidates) if key)
+    return names
+
+
+def plan_city(prompt):
+    """Return the city the prompt asks about, or None if it does not fit the compiled plan."""
+    city = _CITY_REQUEST.sub("", prompt.strip(), count=1).strip(" ?!.")
+    return city if _CITY_NAME.fullmatch(normalize_city(city)) else None
+
+
+class TravelAgent:
+    """Answers agentic prompts, through the compiled plan where it fits and the ReAct agent otherwise."""
+
+    def __init__(self, llm, ollama_client, model, plan_mode=PLAN_MODE, gazetteer=None):
+        self.plan_mode = plan_mode
+        self.tools = create_tools(ollama_client, model)
+        self.executor = create_react_executor(llm, self.tools)
+        self.gazetteer = load_gazetteer() if gazetteer is None else gazetteer
+        self._tools = {agent_tool.name: agent_tool for agent_tool in self.tools}
+
+    def plan(self, prompt):
+        """Return ``(city, city_check)`` for the compiled plan, ``(None, None)`` for the ReAct agent."""
+        city = plan_city(prompt) if self.plan_mode == "compiled" else None
+        if city is None:
+            return None, None
+        key = normalize_city(city)
+        if key in self.gazetteer:
+            return city, "gazetteer"
+        # an unknown phrase ("best food in rome") is no city name, but the agent may find one in it
+        return (city, "valid_city") if " " not in key else (None, None)
+
+    async def answer(self, prompt):
+        city, city_check = self.plan(prompt)
+        span = trace.get_current_span()
+        if city is None:
+            span.set_attribute("agentic.plan", "react")
+            agentic_requests.add(1, {"plan": "react"})
+            response = await self.executor.ainvoke({
+                "input": f"If {prompt} is a city, provide a travel advice. ",
+            })
+            return response['output']
+
+        span.set_attributes({"agentic.plan": "compiled", "agentic.city_check": city_check, "agentic.city": city})
+        agentic_requests.add(1, {"plan": "compiled"})
+        if city_check == "gazetteer" or await self._tools["valid_city"].ainvoke({"city": city}):
+            advice = await self._tools["travel_advice"].ainvoke({"city": city})
+            return advice[len("Final Answer:"):].strip() if advice.startswith("Final Answer:") else advice
+        return await self._tools["excuse"].ainvoke({"city": city})
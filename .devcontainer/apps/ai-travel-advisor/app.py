@@ -1,29 +1,31 @@
 import ollama
-from langchain.agents import AgentExecutor, create_structured_chat_agent
-from langchain_core.tools import tool
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.document_loaders import BSHTMLLoader
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
 from langchain_ollama.chat_models import ChatOllama
 from langchain_ollama.embeddings import OllamaEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+import asyncio
 import logging
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
-from opentelemetry import trace
+from opentelemetry import metrics, trace
 from traceloop.sdk import Traceloop
 from traceloop.sdk.decorators import workflow, task
 from colorama import Fore
 
 import weaviate
-import weaviate.classes as wvc
 from langchain_weaviate.vectorstores import WeaviateVectorStore
+from agent import TravelAgent
+from ingest import KB_COLLECTION, ingest, scan_sources, start_parse_pool
+from telemetry import create_span_processor
 
 
 # disable traceloop telemetry
@@ -62,9 +64,29 @@ WEAVIATE_ENDPOINT = os.environ.get("WEAVIATE_ENDPOINT", "localhost")
 print(f"{Fore.GREEN} Connecting to Ollama ({AI_MODEL}) LLM: {OLLAMA_ENDPOINT} {Fore.RESET}")
 print(f"{Fore.GREEN} Connecting to Weaviate VectorDB: {WEAVIATE_ENDPOINT} {Fore.RESET}")
 
-llm = ChatOllama(model=AI_MODEL, base_url=OLLAMA_ENDPOINT)
-ollama_client = ollama.Client(
+# Fork the HTML parsers of the KB ingestion before the telemetry and the Weaviate client
+# start their threads (see ingest.py), they are shut down once the KB is ingested
+parse_pool = start_parse_pool(len(scan_sources("destinations")))
+
+## Admission control: completions of a mode allowed to run at the same time, and how
+## many more may wait for a slot before the service answers 503. The handlers are async,
+## so running and waiting completions hold no worker thread.
+MAX_CONCURRENCY = {
+    "llm": int(os.environ.get("LLM_MAX_CONCURRENCY", "64")),
+    "rag": int(os.environ.get("RAG_MAX_CONCURRENCY", "32")),
+    "agentic": int(os.environ.get("AGENTIC_MAX_CONCURRENCY", "16")),
+}
+MAX_QUEUE = int(os.environ.get("COMPLETION_MAX_QUEUE", "256"))
+
+# one connection to Ollama per admitted completion, httpx allows only 100 by default
+ollama_client_kwargs = {
+    "limits": httpx.Limits(max_connections=sum(MAX_CONCURRENCY.values()),
+                           max_keepalive_connections=sum(MAX_CONCURRENCY.values())),
+}
+llm = ChatOllama(model=AI_MODEL, base_url=OLLAMA_ENDPOINT, client_kwargs=ollama_client_kwargs)
+ollama_client = ollama.AsyncClient(
     host=OLLAMA_ENDPOINT,
+    **ollama_client_kwargs,
 )
 
 MAX_PROMPT_LENGTH = 50
@@ -99,10 +121,22 @@ if not instrumentor.is_instrumented_by_opentelemetry:
     instrumentor.instrument()
 
 # Initialize OpenLLMetry
+# Telemetry profile (TELEMETRY_PROFILE): "development" exports every span synchronously on
+# the request path, "production" batches spans with the bounded, dropping span processor
+# of telemetry.py (the same profiles as app/telemetry.py of the NAT app)
+otel_meter = metrics.get_meter("travel-advisor")
+waiting_completions = otel_meter.create_up_down_counter(
+    "travel_advisor.completions.waiting", description="Completions waiting for a free slot of their mode")
+running_completions = otel_meter.create_up_down_counter(
+    "travel_advisor.completions.in_flight", description="Completions being processed")
+
+span_processor = create_span_processor(OTEL_ENDPOINT, headers)
+
 Traceloop.init(
     app_name="ai-travel-advisor",
     api_endpoint=OTEL_ENDPOINT,
-    disable_batch=True, # This is recomended for testing but NOT for production
+    disable_batch=span_processor is None, # synchronous export is for testing, NOT for production
+    processor=span_processor,
     headers=headers,
 )
 
@@ -111,46 +145,20 @@ def format_docs(docs):
 
 def prep_rag():
     # Create the embedding and the Weaviate Client
-    embeddings = OllamaEmbeddings(model=AI_EMBEDDING_MODEL, base_url=OLLAMA_ENDPOINT)
+    embeddings = OllamaEmbeddings(model=AI_EMBEDDING_MODEL, base_url=OLLAMA_ENDPOINT, client_kwargs=ollama_client_kwargs)
     weaviate_client = weaviate.connect_to_local(host=WEAVIATE_ENDPOINT)
-    # Cleanup the collection containing our documents and recreate it
-    weaviate_client.collections.delete("KB")
-    weaviate_client.collections.create(
-        name = "KB",
-        vectorizer_config=wvc.config.Configure.Vectorizer.text2vec_ollama(api_endpoint=OLLAMA_ENDPOINT, model=AI_EMBEDDING_MODEL),
-        properties = [
-            wvc.config.Property(
-                name="text",
-                data_type=wvc.config.DataType.TEXT,
-            ),
-            wvc.config.Property(
-                name="source",
-                data_type=wvc.config.DataType.TEXT,
-            ),
-            wvc.config.Property(
-                name="title",
-                data_type=wvc.config.DataType.TEXT,
-            ),
-        ],
-    )
+    # Embed and store only the destinations that changed since the last start, see ingest.py
+    try:
+        ingest(weaviate_client, embeddings, "destinations", OLLAMA_ENDPOINT, AI_EMBEDDING_MODEL, parse_pool=parse_pool)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
 
-    # Retrieve the source data
-    docs_list = []
-    for item in os.listdir(path="destinations"):
-        if item.endswith(".html"):
-            item_docs_list = BSHTMLLoader(file_path=f"destinations/{item}").load()
-            for item in item_docs_list:
-                docs_list.append(item)
-
-    # Split Document into tokens
-    text_splitter = RecursiveCharacterTextSplitter()
-    documents = text_splitter.split_documents(docs_list)
-
-    vector = WeaviateVectorStore.from_documents(
-        documents,
-        embeddings,
+    vector = WeaviateVectorStore(
         client=weaviate_client,
-        index_name="KB"
+        index_name=KB_COLLECTION,
+        text_key="text",
+        embedding=embeddings,
     )
     retriever = vector.as_retriever()
 
@@ -172,94 +180,45 @@ def prep_rag():
 
     return rag_chain
 
-##########
-# Agentic Tools
-
-import re
-regex = re.compile('[^a-zA-Z]')
-
-@tool
-def excuse(city: str)->str:
-    """ Returns an excuse why it cannot provide an answer """
-    prompt = f"Provide an excuse on why you cannot provide a travel advice about {city}"
-    response = ollama_client.generate(model=AI_MODEL, prompt=prompt)
-    return response.get("response")
-
-@tool
-def valid_city(city: str)->bool:
-    """ Returns if the input is a valid city"""
-    prompt = f"Is {city} a city? respond ONLY with yes or no."
-    response = ollama_client.generate(model=AI_MODEL, prompt=prompt)
-    response = regex.sub('', response.get("response")).lower()
-    return response == "yes" or response.startswith("yes")
-
-@tool
-def travel_advice(city: str)->str:
-    """ Provide travel advice for the given city"""
-    prompt = f"Give travel advise in a paragraph of max 50 words about {city}"
-    response = ollama_client.generate(model=AI_MODEL, prompt=prompt)
-    return "Final Answer:" + response.get("response")
-
-def prep_agent_executor():
-    __tools = [valid_city, travel_advice, excuse]
-    __system = '''Respond to the human as helpfully and accurately as possible. You have access to the following tools:
-    
-{tools}
-
-Use a json blob to specify a tool by providing an action key (tool name) and an action_input key (tool input).
-
-Valid "action" values: "Final Answer" or {tool_names}
-
-Provide only ONE action per $JSON_BLOB, as shown:
-
-```
-{{
-  "action": $TOOL_NAME,
-  "action_input": $INPUT
-}}
-```
-
-Follow this format:
-
-Question: input question to answer
-Thought: consider previous and subsequent steps
-Action:
-```
-$JSON_BLOB
-```
-Observation: action result
-... (repeat Thought/Action/Observation N times)
-Thought: I know what to respond
-Action:
-```
-{{
-  "action": "Final Answer",
-  "action_input": "Final response to human"
-}}
-
-Begin! Reminder to ALWAYS respond with a valid json blob of a single action. Use tools if necessary. Respond directly if appropriate. Format is Action:```$JSON_BLOB```then Observation'''
-
-    __human = '''
-{input}
-
-{agent_scratchpad}
-
-(reminder to respond in a JSON blob no matter what)'''
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", __system),
-            MessagesPlaceholder("chat_history", optional=True),
-            ("human", __human),
-        ]
-    )
-    agent = create_structured_chat_agent(llm, __tools, prompt)
-    return AgentExecutor(
-        agent=agent,
-        tools=__tools,
-        verbose=True,
-        handle_parsing_errors=True,
-        max_iterations=5,
-    )
+############
+# Admission control
+
+class Admission:
+    """Bounds the completions of one mode running at once, the rest wait up to MAX_QUEUE."""
+
+    def __init__(self, mode, max_concurrency, max_queue):
+        self.mode = mode
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.waiting = 0
+        # created on first use, on Python 3.9 a semaphore binds to the loop current at creation
+        self._slots = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_queue:
+            raise HTTPException(status_code=503, detail=f"Too many queued {self.mode} completions",
+                                headers={"Retry-After": "1"})
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        attributes = {"mode": self.mode}
+        self.waiting += 1
+        waiting_completions.add(1, attributes)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            waiting_completions.add(-1, attributes)
+
+        running_completions.add(1, attributes)
+        try:
+            yield
+        finally:
+            running_completions.add(-1, attributes)
+            self._slots.release()
+
+
+admission = {mode: Admission(mode, limit, MAX_QUEUE) for mode, limit in MAX_CONCURRENCY.items()}
 
 
 ############
@@ -267,35 +226,37 @@ Begin! Reminder to ALWAYS respond with a valid json blob of a single action. Use
 
 app = FastAPI()
 retrieval_chain = prep_rag()
-agentic_executor = prep_agent_executor()
+# city prompts run the compiled tool plan, the rest the ReAct agent, see agent.py
+travel_agent = TravelAgent(llm, ollama_client, AI_MODEL)
 
 
 ####################################
 @app.get("/api/v1/completion")
-def submit_completion(framework: str, prompt: str):
+async def submit_completion(framework: str, prompt: str):
     with otel_tracer.start_as_current_span(name="/api/v1/completion", kind=trace.SpanKind.SERVER) as span:
-        if framework == "llm":
-            return llm_chat(prompt)
-        if framework == "rag":
-            return rag_chat(prompt)
-        if framework == "agentic":
-            return agentic_chat(prompt)
-        span.set_status(trace.StatusCode.ERROR, f"{framework} mode is not supported")
-        return {"message": "invalid Mode"}
+        if framework not in admission:
+            span.set_status(trace.StatusCode.ERROR, f"{framework} mode is not supported")
+            return {"message": "invalid Mode"}
+        async with admission[framework].slot():
+            if framework == "llm":
+                return await llm_chat(prompt)
+            if framework == "rag":
+                return await rag_chat(prompt)
+            return await agentic_chat(prompt)
 
 
 @task(name="ollama_chat")
-def llm_chat(prompt: str):
+async def llm_chat(prompt: str):
     prompt = f"Give travel advise in a paragraph of max 50 words about {prompt}"
-    res = ollama_client.generate(model=AI_MODEL, prompt=prompt)
+    res = await ollama_client.generate(model=AI_MODEL, prompt=prompt)
     return {"message": res.get("response")}
 
 
 @workflow(name="travelgenerator")
-def rag_chat(prompt: str):
+async def rag_chat(prompt: str):
     if prompt:
         logger.info(f"Calling RAG to get the answer to the question: {prompt}...")
-        response = retrieval_chain.invoke( prompt, config={})
+        response = await retrieval_chain.ainvoke( prompt, config={})
         return {"message": response}
     else:  # No, or invalid prompt given
         err_msg = f"No prompt provided or prompt too long (over {MAX_PROMPT_LENGTH} chars)"
@@ -308,12 +269,8 @@ def rag_chat(prompt: str):
         }
 
 @task(name="agentic_chat")
-def agentic_chat(prompt: str):
-    task = f"If {prompt} is a city, provide a travel advice. "
-    response = agentic_executor.invoke({
-        "input": task,
-    })
-    return {"message": response['output']}
+async def agentic_chat(prompt: str):
+    return {"message": await travel_agent.answer(prompt)}
 
 ####################################
 @app.get("/api/v1/thumbsUp")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the agentic travel mode: ReAct agent against the compiled plan.
+
+Replays the prompts in data/agentic_prompts.jsonl through agent.TravelAgent in each
+plan mode, against a stand-in Ollama that counts the LLM calls:
+
+    /api/chat       the agent steps of ChatOllama. The stand-in plays a well-behaved
+                    agent: valid_city, then travel_advice or excuse, then the final
+                    answer, each as a JSON blob, reading the observations from the
+                    scratchpad.
+    /api/generate   the tools. "Is X a city?" is answered "yes" for the prompts whose
+                    ``city`` is set in the corpus, advice and excuses are fixed texts
+                    per city.
+
+Each request of a mode is timed and the report shows the LLM calls per request (agent
+steps and tool calls), p50/p95 latency, throughput, how many prompts the compiled plan
+answered itself, and how many prompts got the same answer in both modes (prompts
+phrased around a city, "travel to Kyoto", differ: the stand-in agent passes them to the
+tools verbatim, the compiled plan passes the city; the results file has the answers of
+each mode per prompt). The tool cache is off unless --tool-cache is given, so the
+numbers show the plan alone. Traceloop is initialized without library instrumentations
+and with an exporter that drops the spans, so the tool task spans are created as in
+the app.
+
+Usage:
+    python benchmarks/bench_agentic.py
+    python benchmarks/bench_agentic.py --requests 300 --concurrency 16 --chat-latency-ms 400
+    python benchmarks/bench_agentic.py --tool-cache
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+CORPUS_PATH = Path(__file__).resolve().parent / "data" / "agentic_prompts.jsonl"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+MODES = ["react", "compiled"]
+MODEL = "orca-mini:3b"
+
+_AGENT_INPUT = re.compile(r"If (?P<city>.+?) is a city, provide a travel advice\.")
+_OBSERVATION = re.compile(r"Observation: (?P<observation>.*?)\nThought: ", re.DOTALL)
+_IS_CITY = re.compile(r"Is (?P<city>.+) a city\?")
+_ABOUT = re.compile(r"about (?P<city>.+)$")
+
+
+# ------------------------------------------------------------------------------
+# stand-in Ollama
+# ------------------------------------------------------------------------------
+class StandInOllama:
+    """Threaded Ollama stand-in on a free local port, counting the requests per kind."""
+
+    def __init__(self, cities, chat_latency_ms, generate_latency_ms):
+        from tool_cache import normalize_city
+
+        self.cities = {normalize_city(city) for city in cities}
+        self.normalize_city = normalize_city
+        self.chat_latency = chat_latency_ms / 1000
+        self.generate_latency = generate_latency_ms / 1000
+        self.requests = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+
+    def close(self):
+        self.server.shutdown()
+
+    def agent_step(self, messages):
+        content = messages[-1]["content"]
+        city = _AGENT_INPUT.search(content)["city"]
+        observations = [match["observation"].strip() for match in _OBSERVATION.finditer(content)]
+        if not observations:
+            action, action_input = "valid_city", {"city": city}
+        elif len(observations) == 1:
+            action = "travel_advice" if observations[0] == "True" else "excuse"
+            action_input = {"city": city}
+        else:
+            action, action_input = "Final Answer", observations[-1].replace("Final Answer:", "", 1).strip()
+        blob = json.dumps({"action": action, "action_input": action_input}, indent=2)
+        return f"Thought: I follow the plan.\nAction:\n```\n{blob}\n```"
+
+    def tool_answer(self, prompt):
+        match = _IS_CITY.match(prompt)
+        if match:
+            self.count("generate.valid_city")
+            return "Yes." if self.normalize_city(match["city"]) in self.cities else "No."
+        city = _ABOUT.search(prompt)["city"]
+        if prompt.startswith("Give travel advise"):
+            self.count("generate.travel_advice")
+            return f"{city} rewards slow travellers: walk the old quarters early, eat where locals queue."
+        self.count("generate.excuse")
+        return f"Sorry, I only know about cities, and {city} is not one I can advise on."
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_lines(self, lines):
+                body = "".join(json.dumps(line) + "\n" for line in lines).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0) or 0)))
+                created_at = datetime.now().isoformat() + "Z"
+                if self.path == "/api/chat":
+                    stand_in.count("chat")
+                    time.sleep(stand_in.chat_latency)
+                    content = stand_in.agent_step(request["messages"])
+                    self.send_lines([{"model": request["model"], "created_at": created_at, "done": True,
+                                      "done_reason": "stop", "message": {"role": "assistant", "content": content}}])
+                elif self.path == "/api/generate":
+                    time.sleep(stand_in.generate_latency)
+                    response = stand_in.tool_answer(request["prompt"])
+                    self.send_lines([{"model": request["model"], "created_at": created_at, "done": True,
+                                      "done_reason": "stop", "response": response}])
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+
+# ------------------------------------------------------------------------------
+# benchmark
+# ------------------------------------------------------------------------------
+def init_traceloop():
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+    from traceloop.sdk import Traceloop
+    from traceloop.sdk.instruments import Instruments
+
+    class DroppingExporter(SpanExporter):
+        def export(self, spans):
+            return SpanExportResult.SUCCESS
+
+    # only the workflow and task spans, the library instrumentations would time themselves
+    Traceloop.init(app_name="bench-agentic", exporter=DroppingExporter(), disable_batch=True,
+                   telemetry_enabled=False, block_instruments=set(Instruments))
+
+
+async def run_mode(mode, prompts, stand_in, requests, concurrency):
+    import ollama
+    from langchain_ollama.chat_models import ChatOllama
+
+    from agent import TravelAgent
+
+    llm = ChatOllama(model=MODEL, base_url=stand_in.url)
+    travel_agent = TravelAgent(llm, ollama.AsyncClient(host=stand_in.url), MODEL, plan_mode=mode)
+    travel_agent.executor.verbose = False
+    compiled = sum(travel_agent.plan(prompt)[0] is not None for prompt in prompts)
+
+    stand_in.reset()
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    answers = {}
+
+    async def one(prompt):
+        async with slots:
+            start_time = time.perf_counter()
+            answers[prompt] = await travel_agent.answer(prompt)
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[one(prompts[index % len(prompts)]) for index in range(requests)])
+    wall_seconds = time.perf_counter() - start_time
+
+    llm_calls = sum(stand_in.requests.values())
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": requests,
+        "wall_seconds": wall_seconds,
+        "requests_per_second": requests / wall_seconds,
+        "latency_p50": statistics.median(latencies),
+        "latency_p95": latencies[int(len(latencies) * 0.95) - 1],
+        "llm_calls": llm_calls,
+        "llm_calls_per_request": llm_calls / requests,
+        "agent_steps_per_request": stand_in.requests.get("chat", 0) / requests,
+        "compiled_prompts": compiled,
+        "backend_requests": dict(stand_in.requests),
+    }, answers
+
+
+def print_report(results, prompts, different_answers):
+    print(f"\n🧭 {len(prompts)} distinct prompts")
+    print(f"{'mode':<10} {'LLM calls/req':>14} {'agent steps/req':>16} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+          f"{'req/s':>7} {'compiled':>9}")
+    for result in results:
+        print(f"{result['mode']:<10} {result['llm_calls_per_request']:>14.2f} {result['agent_steps_per_request']:>16.2f} "
+              f"{result['latency_p50'] * 1000:>9.0f} {result['latency_p95'] * 1000:>9.0f} "
+              f"{result['requests_per_second']:>7.1f} {result['compiled_prompts']:>5}/{len(prompts)}")
+    by_mode = {result["mode"]: result for result in results}
+    if "react" in by_mode and "compiled" in by_mode:
+        before, after = by_mode["react"]["llm_calls_per_request"], by_mode["compiled"]["llm_calls_per_request"]
+        print(f"\nLLM calls per request: {before:.2f} → {after:.2f} ({(after - before) / before * 100:+.0f}%)")
+        print(f"Same answers in both modes: {len(prompts) - len(different_answers)}/{len(prompts)}")
+        for prompt in different_answers:
+            print(f"  ≠ {prompt}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ReAct agent against the compiled plan")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH, help="JSONL file of prompts to replay")
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=MODES,
+                        help=f"Comma separated modes out of {','.join(MODES)}")
+    parser.add_argument("--requests", type=int, default=120, help="Requests per mode, cycling through the corpus")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--chat-latency-ms", type=float, default=150.0, help="Stand-in latency of an agent step")
+    parser.add_argument("--generate-latency-ms", type=float, default=100.0, help="Stand-in latency of a tool call")
+    parser.add_argument("--tool-cache", action="store_true", help="Memoize the tools (tool_cache.py) as in the app")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Results file (default: results/bench_agentic_<time>.json next to this script)")
+    args = parser.parse_args()
+
+    if not args.tool_cache:
+        os.environ["TOOL_CACHE_TTL_SECONDS"] = "0"
+    os.environ["TRACELOOP_TELEMETRY"] = "false"
+    init_traceloop()
+
+    corpus = [json.loads(line) for line in args.corpus.read_text().splitlines() if line.strip()]
+    prompts = [entry["prompt"] for entry in corpus]
+    stand_in = StandInOllama([entry["city"] for entry in corpus if entry["city"]],
+                             args.chat_latency_ms, args.generate_latency_ms)
+    print(f"✓ Stand-in Ollama at {stand_in.url}, replaying {len(prompts)} prompts from {args.corpus}")
+
+    results = []
+    answers = {}
+    try:
+        for mode in args.modes:
+            print(f"⏱️  {mode}...")
+            result, answers[mode] = asyncio.run(run_mode(mode, prompts, stand_in, args.requests, args.concurrency))
+            results.append(result)
+    finally:
+        stand_in.close()
+
+    # prompt -> {mode: answer}, and the prompts the modes answered differently
+    prompt_answers = {prompt: {mode: mode_answers.get(prompt) for mode, mode_answers in answers.items()}
+                      for prompt in prompts}
+    different_answers = [prompt for prompt, by_mode in prompt_answers.items() if len(set(by_mode.values())) > 1]
+    print_report(results, prompts, different_answers)
+    output = args.output or RESULTS_DIR / f"bench_agentic_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"corpus": str(args.corpus), "concurrency": args.concurrency,
+                                  "tool_cache": args.tool_cache, "results": results,
+                                  "same_answers": len(prompts) - len(different_answers),
+                                  "different_answers": different_answers, "answers": prompt_answers}, indent=2))
+    print(f"✓ Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
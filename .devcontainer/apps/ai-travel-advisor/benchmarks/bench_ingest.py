@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the KB ingestion on a large generated corpus.
+
+Generates --files synthetic destination pages (HTML with a title and paragraphs of
+travel prose, sizes spread over --min-kb..--max-kb) and ingests them into an empty KB
+in each mode:
+
+    legacy       the ingestion before ingest.py: load every file, split all documents,
+                 embed all chunks in one call, then write them
+    serial       ingest.ingest with INGEST_WORKERS=0, parsing in the ingesting process
+    parallel     ingest.ingest with up to --workers parsing processes (default: all cores),
+                 forked with ingest.start_parse_pool before the clients, as app.py does
+
+Each mode runs in its own process, so the peak resident memory (ru_maxrss) of one mode
+does not hide the next one. The report shows wall time, files/s, chunks/s and the peak
+memory of the ingesting process and of its largest parse worker; the unchanged re-run
+after the parallel ingestion (hashing only) is timed as well.
+
+By default Ollama and Weaviate are local stand-ins: embeddings are hash vectors with
+a fixed latency per request plus a time per chunk, and Weaviate keeps only the
+manifest and a count of the chunks. --ollama-endpoint and --weaviate-host run against
+the real services instead (the KB and KBManifest collections are dropped first).
+
+Usage:
+    python benchmarks/bench_ingest.py
+    python benchmarks/bench_ingest.py --files 2000 --modes serial,parallel
+    python benchmarks/bench_ingest.py --ollama-endpoint http://localhost:11434 --weaviate-host localhost
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+MODES = ["legacy", "serial", "parallel"]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+WORDS = (
+    "beach temple market harbour museum trail sunset island mountain village street food festival "
+    "river canyon reef lagoon cathedral old town ferry night market garden palace desert oasis "
+    "hike surf dive local guide season rainy dry cuisine spice coffee wine cheese bazaar lantern "
+    "the a of and to in with for from near during after every visitors travellers locals"
+).split()
+
+
+# ------------------------------------------------------------------------------
+# corpus
+# ------------------------------------------------------------------------------
+def generate_corpus(directory, files, min_kb, max_kb, seed=7):
+    """Write ``files`` synthetic destination pages into ``directory``, return their total size in bytes."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for index in range(files):
+        target = rng.randint(min_kb * 1024, max_kb * 1024)
+        paragraphs = []
+        size = 0
+        while size < target:
+            sentence_count = rng.randint(3, 8)
+            paragraph = " ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                for _ in range(sentence_count)
+            )
+            paragraphs.append(f"<p>{paragraph}</p>")
+            size += len(paragraph) + 7
+        page = (f"<html><head><title>Destination {index}</title></head><body>"
+                f"<h1>Destination {index}</h1>{''.join(paragraphs)}</body></html>")
+        (directory / f"destination_{index:05d}.html").write_text(page)
+        total += len(page)
+    return total
+
+
+# ------------------------------------------------------------------------------
+# stand-ins
+# ------------------------------------------------------------------------------
+class StandInEmbeddings:
+    """Hash vectors after a fixed latency per request and a time per chunk, like a local Ollama."""
+
+    def __init__(self, dimensions, latency_ms, ms_per_chunk):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.ms_per_chunk = ms_per_chunk
+        self.requests = 0
+
+    def embed_documents(self, texts):
+        self.requests += 1
+        time.sleep((self.latency_ms + self.ms_per_chunk * len(texts)) / 1000)
+        vectors = []
+        for text in texts:
+            digest = hashlib.blake2b(text.encode(), digest_size=32).digest()
+            vectors.append([digest[i % 32] / 255 for i in range(self.dimensions)])
+        return vectors
+
+
+class _StandInBatch:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add_object(self, properties, uuid=None, vector=None):
+        self.collection.add(properties, uuid)
+
+
+class _StandInBatchFactory:
+    def __init__(self, collection, latency_ms):
+        self.collection = collection
+        self.latency_ms = latency_ms
+        self.failed_objects = []
+
+    @contextlib.contextmanager
+    def fixed_size(self, batch_size=100, concurrent_requests=2):
+        batch = _StandInBatch(self.collection)
+        yield batch
+        # one request per batch_size objects, concurrent_requests of them at a time
+        requests = -(-self.collection.added // batch_size)
+        time.sleep(requests / concurrent_requests * self.latency_ms / 1000)
+        self.collection.added = 0
+
+
+class _StandInData:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def delete_many(self, where):
+        self.collection.objects.clear()
+
+    def delete_by_id(self, uuid):
+        self.collection.objects.pop(uuid, None)
+
+
+class _StandInQuery:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def fetch_objects(self, limit=None, return_properties=None):
+        return argparse.Namespace(objects=self.collection.iterator()[:limit])
+
+
+class StandInCollection:
+    """Keeps the objects of the manifest, and only counts the chunks of the KB."""
+
+    def __init__(self, keep_objects, latency_ms):
+        self.keep_objects = keep_objects
+        self.objects = {}
+        self.count = 0
+        self.added = 0
+        self.batch = _StandInBatchFactory(self, latency_ms)
+        self.data = _StandInData(self)
+        self.query = _StandInQuery(self)
+
+    def add(self, properties, uuid):
+        self.count += 1
+        self.added += 1
+        if self.keep_objects:
+            self.objects[uuid] = properties
+
+    def iterator(self):
+        return [argparse.Namespace(properties=properties) for properties in self.objects.values()]
+
+
+class _StandInCollections:
+    def __init__(self, latency_ms):
+        self.latency_ms = latency_ms
+        self.collections = {}
+
+    def exists(self, name):
+        return name in self.collections
+
+    def create(self, name, **kwargs):
+        self.collections[name] = StandInCollection(name != "KB", self.latency_ms)
+
+    def get(self, name):
+        return self.collections[name]
+
+    def delete(self, name):
+        self.collections.pop(name, None)
+
+
+class StandInWeaviate:
+    def __init__(self, latency_ms):
+        self.collections = _StandInCollections(latency_ms)
+
+    def close(self):
+        pass
+
+
+# ------------------------------------------------------------------------------
+# modes
+# ------------------------------------------------------------------------------
+def legacy_ingest(client, embeddings, source_dir, ollama_endpoint, embedding_model, batch_size):
+    """The ingestion before ingest.py: everything in memory, one embedding call."""
+    import ingest
+    from langchain_community.document_loaders import BSHTMLLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    kb, _ = ingest.ensure_collections(client, ollama_endpoint, embedding_model)
+    documents = []
+    for path in ingest.scan_sources(source_dir).values():
+        documents.extend(BSHTMLLoader(file_path=path).load())
+    chunks = RecursiveCharacterTextSplitter().split_documents(documents)
+    vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    with kb.batch.fixed_size(batch_size=batch_size) as batch:
+        for index, (chunk, vector) in enumerate(zip(chunks, vectors)):
+            batch.add_object(properties={"text": chunk.page_content, "source": chunk.metadata["source"],
+                                         "title": chunk.metadata.get("title", "")},
+                             uuid=ingest.chunk_uuid(chunk.metadata["source"], index, chunk.page_content),
+                             vector=vector)
+    return {"chunks": len(chunks)}
+
+
+def peak_memory_mb():
+    # ru_maxrss is in KB on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+
+def connect(args):
+    if args.ollama_endpoint:
+        from langchain_ollama import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(model=args.embedding_model, base_url=args.ollama_endpoint)
+    else:
+        embeddings = StandInEmbeddings(args.dimensions, args.embed_latency_ms, args.embed_ms_per_chunk)
+    if args.weaviate_host:
+        import weaviate
+        client = weaviate.connect_to_local(host=args.weaviate_host)
+        for name in ("KB", "KBManifest"):
+            client.collections.delete(name)
+    else:
+        client = StandInWeaviate(args.weaviate_latency_ms)
+    return client, embeddings
+
+
+def run_mode(args):
+    """Ingest the corpus in one mode in this process, print the result as JSON."""
+    import ingest
+
+    workers = 0 if args.run_mode == "serial" else args.workers
+    # forked before the clients start their threads, like in app.py
+    parse_pool = (ingest.start_parse_pool(len(ingest.scan_sources(args.corpus_dir)), workers)
+                  if args.run_mode == "parallel" else None)
+    client, embeddings = connect(args)
+    ollama_endpoint = args.ollama_endpoint or "http://ollama:11434"
+    baseline_mb, _ = peak_memory_mb()
+    start_time = time.perf_counter()
+    if args.run_mode == "legacy":
+        counts = legacy_ingest(client, embeddings, args.corpus_dir, ollama_endpoint, args.embedding_model,
+                               ingest.BATCH_SIZE)
+    else:
+        counts = ingest.ingest(client, embeddings, args.corpus_dir, ollama_endpoint, args.embedding_model,
+                               parse_pool=parse_pool, workers=workers)
+    wall_seconds = time.perf_counter() - start_time
+    if parse_pool is not None:
+        # the workers count in the peak memory of the children once they exited
+        parse_pool.shutdown()
+    peak_mb, worker_peak_mb = peak_memory_mb()
+    result = {
+        "mode": args.run_mode,
+        "wall_seconds": wall_seconds,
+        "chunks": counts["chunks"],
+        "embedding_requests": getattr(embeddings, "requests", None),
+        "baseline_mb": baseline_mb,
+        "peak_mb": peak_mb,
+        "worker_peak_mb": worker_peak_mb,
+    }
+    if args.run_mode == "parallel":
+        start_time = time.perf_counter()
+        # nothing changed, nothing to parse
+        ingest.ingest(client, embeddings, args.corpus_dir, ollama_endpoint, args.embedding_model)
+        result["unchanged_rerun_seconds"] = time.perf_counter() - start_time
+    client.close()
+    print(json.dumps(result))
+
+
+def print_report(results, files, corpus_mb):
+    print(f"\n📚 {files} files, {corpus_mb:.1f} MB of HTML")
+    print(f"{'mode':<10} {'wall (s)':>9} {'files/s':>9} {'chunks/s':>9} {'chunks':>8} "
+          f"{'peak (MB)':>10} {'growth (MB)':>12} {'worker (MB)':>12}")
+    for result in results:
+        print(f"{result['mode']:<10} {result['wall_seconds']:>9.2f} {files / result['wall_seconds']:>9.0f} "
+              f"{result['chunks'] / result['wall_seconds']:>9.0f} {result['chunks']:>8} {result['peak_mb']:>10.1f} "
+              f"{result['peak_mb'] - result['baseline_mb']:>12.1f} {result['worker_peak_mb']:>12.1f}")
+    for result in results:
+        if "unchanged_rerun_seconds" in result:
+            print(f"\nUnchanged re-run: {result['unchanged_rerun_seconds']:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the KB ingestion on a generated corpus")
+    parser.add_argument("--files", type=int, default=10000, help="Generated HTML files")
+    parser.add_argument("--min-kb", type=int, default=2, help="Smallest generated file")
+    parser.add_argument("--max-kb", type=int, default=24, help="Largest generated file")
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=MODES,
+                        help=f"Comma separated modes out of {','.join(MODES)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parse processes of the parallel mode")
+    parser.add_argument("--embedding-model", default="orca-mini:3b")
+    parser.add_argument("--dimensions", type=int, default=768, help="Size of the stand-in embedding vectors")
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0, help="Stand-in latency per embedding request")
+    parser.add_argument("--embed-ms-per-chunk", type=float, default=0.5, help="Stand-in time per embedded chunk")
+    parser.add_argument("--weaviate-latency-ms", type=float, default=10.0, help="Stand-in latency per batch request")
+    parser.add_argument("--ollama-endpoint", default=None, help="Embed with this Ollama instead of the stand-in")
+    parser.add_argument("--weaviate-host", default=None, help="Write to this Weaviate instead of the stand-in")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Results file (default: results/bench_ingest_<time>.json next to this script)")
+    parser.add_argument("--run-mode", choices=MODES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--corpus-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench_ingest_") as work_dir:
+        corpus_dir = Path(work_dir) / "destinations"
+        start_time = time.perf_counter()
+        corpus_bytes = generate_corpus(corpus_dir, args.files, args.min_kb, args.max_kb)
+        print(f"✓ Generated {args.files} files in {time.perf_counter() - start_time:.1f} s")
+
+        results = []
+        passed = [f"--workers={args.workers}", f"--embedding-model={args.embedding_model}",
+                  f"--dimensions={args.dimensions}", f"--embed-latency-ms={args.embed_latency_ms}",
+                  f"--embed-ms-per-chunk={args.embed_ms_per_chunk}",
+                  f"--weaviate-latency-ms={args.weaviate_latency_ms}"]
+        passed += [f"--ollama-endpoint={args.ollama_endpoint}"] if args.ollama_endpoint else []
+        passed += [f"--weaviate-host={args.weaviate_host}"] if args.weaviate_host else []
+        for mode in args.modes:
+            print(f"⏱️  {mode}...")
+            completed = subprocess.run(
+                [sys.executable, __file__, *passed, "--run-mode", mode, "--corpus-dir", str(corpus_dir)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_report(results, args.files, corpus_bytes / 1024 / 1024)
+    output = args.output or RESULTS_DIR / f"bench_ingest_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"files": args.files, "corpus_bytes": corpus_bytes, "workers": args.workers,
+                                  "results": results}, indent=2))
+    print(f"✓ Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
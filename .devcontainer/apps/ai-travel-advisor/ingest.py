@@ -0,0 +1,313 @@
+"""Idempotent, streaming ingestion of the destinations documents into the Weaviate KB.
+
+Instead of dropping and re-embedding the whole KB on every start, a manifest
+collection (KBManifest) records the SHA-256 of every ingested source file together
+with the embedding model. On start only the differences are applied:
+
+- new or changed files are parsed, split, embedded in batches and written with the
+  Weaviate batch API; the old chunks of a changed file are deleted first
+- files that were removed from the destinations folder lose their chunks
+- unchanged files are not read past their hash
+
+The changed files flow through a pipeline of generators, so memory stays flat however
+large the corpus is: a process pool parses and splits the HTML files (CPU bound, up to
+every core), at most a few tasks ahead of the consumer; the chunks are grouped into
+embedding requests, a bounded number of them in flight; and the embedded chunks go
+into a fixed-size Weaviate batch that sends them in the background.
+
+Chunks get deterministic UUIDs (uuid5 of source, position and text), so a re-run after
+an interrupted ingestion overwrites instead of duplicating, and a source's manifest
+entry is only written after all its chunks were stored. The manifest lives next to the
+data, so an emptied Weaviate is rebuilt from scratch; a KB without manifest (created
+before it existed) or embedded with another AI_EMBEDDING_MODEL is recreated.
+
+The pool is forked by ``start_parse_pool`` before the app starts any thread (the span
+exporter of the telemetry, the gRPC channel of the Weaviate client): a fork only copies
+the calling thread, and a lock another thread held at that moment stays locked in the
+worker for good. It gets at most one worker per task of the candidate files; when the
+changed files fit into one task they are parsed in-process.
+
+Tuning (environment variables):
+    - INGEST_WORKERS: most processes parsing HTML files, 0 parses in-process (default: CPU count)
+    - INGEST_FILES_PER_TASK: files parsed per process pool task (default: 16)
+    - INGEST_EMBED_BATCH_SIZE: chunks per embedding request to Ollama (default: 32)
+    - INGEST_EMBED_CONCURRENCY: embedding requests in flight (default: 2)
+    - INGEST_BATCH_SIZE: objects per Weaviate batch request (default: 100)
+    - INGEST_CONCURRENT_REQUESTS: Weaviate batch requests in flight (default: 2)
+"""
+
+import collections
+import hashlib
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import weaviate.classes as wvc
+from weaviate.classes.query import Filter
+from weaviate.util import generate_uuid5
+
+from langchain_community.document_loaders import BSHTMLLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from colorama import Fore
+
+KB_COLLECTION = "KB"
+MANIFEST_COLLECTION = "KBManifest"
+
+WORKERS = int(os.environ.get("INGEST_WORKERS", str(os.cpu_count() or 1)))
+FILES_PER_TASK = int(os.environ.get("INGEST_FILES_PER_TASK", "16"))
+EMBED_BATCH_SIZE = int(os.environ.get("INGEST_EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.environ.get("INGEST_EMBED_CONCURRENCY", "2"))
+BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "100"))
+CONCURRENT_REQUESTS = int(os.environ.get("INGEST_CONCURRENT_REQUESTS", "2"))
+# sources per delete request of their chunks
+DELETE_BATCH_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+# text splitter of the current (worker) process
+_splitter = None
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_sources(source_dir):
+    """Return {source: path} of the HTML files, the source is the path as stored in the KB."""
+    return {
+        f"{source_dir}/{item}": os.path.join(source_dir, item)
+        for item in sorted(os.listdir(source_dir)) if item.endswith(".html")
+    }
+
+
+def load_chunks(path):
+    """Parse an HTML file and split it into the chunks that are embedded."""
+    global _splitter
+    if _splitter is None:
+        _splitter = RecursiveCharacterTextSplitter()
+    return _splitter.split_documents(BSHTMLLoader(file_path=path).load())
+
+
+def parse_sources(items):
+    """Process pool task: parse ``[(source, path, sha256)]``, return ``[(source, sha256, [(text, title)])]``."""
+    return [
+        (source, sha256, [(chunk.page_content, chunk.metadata.get("title", "")) for chunk in load_chunks(path)])
+        for source, path, sha256 in items
+    ]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bounded_map(executor, fn, iterable, max_pending):
+    """Like ``executor.map``, but submits at most ``max_pending`` tasks ahead of the consumer."""
+    pending = collections.deque()
+    try:
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def parse_workers(file_count, workers=WORKERS, files_per_task=FILES_PER_TASK):
+    """Return the parsing processes worth starting for ``file_count`` files, 0 if one task holds them all."""
+    tasks = math.ceil(file_count / files_per_task)
+    return min(workers, tasks) if tasks > 1 else 0
+
+
+def start_parse_pool(file_count, workers=WORKERS, files_per_task=FILES_PER_TASK):
+    """Fork the processes parsing up to ``file_count`` HTML files, or return None to parse in-process.
+
+    The workers are forked before this returns, so call it before the process starts
+    other threads and shut the pool down after the ingestion.
+    """
+    workers = parse_workers(file_count, workers, files_per_task)
+    # spawned workers would import the main module, which is app.py with its start-up code
+    if workers == 0 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    # a fork pool forks all its workers for the first task
+    pool.submit(os.getpid).result()
+    return pool
+
+
+def iter_parsed(items, parse_pool=None, workers=WORKERS, files_per_task=FILES_PER_TASK):
+    """Yield ``(source, sha256, [(text, title)])`` of the ``(source, path, sha256)`` items.
+
+    They are parsed in ``parse_pool`` (see ``start_parse_pool``), at most ``workers`` at once,
+    or in-process without a pool or if they fit into one task.
+    """
+    tasks = batched(items, files_per_task)
+    workers = parse_workers(len(items), workers, files_per_task)
+    if parse_pool is None or workers == 0:
+        for task in tasks:
+            yield from parse_sources(task)
+        return
+    for parsed in bounded_map(parse_pool, parse_sources, tasks, max_pending=2 * workers):
+        yield from parsed
+
+
+def chunk_uuid(source, index, text):
+    return generate_uuid5(f"{source}:{index}:{text}", KB_COLLECTION)
+
+
+def _create_kb(client, ollama_endpoint, embedding_model):
+    client.collections.create(
+        name=KB_COLLECTION,
+        vectorizer_config=wvc.config.Configure.Vectorizer.text2vec_ollama(api_endpoint=ollama_endpoint,
+                                                                          model=embedding_model),
+        properties=[
+            wvc.config.Property(name="text", data_type=wvc.config.DataType.TEXT),
+            # whole-value tokenization, so a source filter does not match other paths with the same words
+            wvc.config.Property(name="source", data_type=wvc.config.DataType.TEXT,
+                                tokenization=wvc.config.Tokenization.FIELD),
+            wvc.config.Property(name="title", data_type=wvc.config.DataType.TEXT),
+        ],
+    )
+
+
+def stored_embedding_model(manifest):
+    """Return the embedding model of the ingested chunks, or None if nothing was ingested yet.
+
+    All manifest entries share one model: the KB is recreated when it changes.
+    """
+    entries = manifest.query.fetch_objects(limit=1, return_properties=["embedding_model"]).objects
+    return entries[0].properties["embedding_model"] if entries else None
+
+
+def ensure_collections(client, ollama_endpoint, embedding_model):
+    """Create the KB and the manifest collection if they do not exist yet.
+
+    A KB without manifest was filled before the manifest existed and cannot be
+    reconciled, it is recreated empty. So is a KB embedded with another model: its
+    vectorizer and vector dimension are those of the old model, and the manifest is
+    reset with it, so every file is embedded again.
+    """
+    if client.collections.exists(MANIFEST_COLLECTION):
+        stored_model = stored_embedding_model(client.collections.get(MANIFEST_COLLECTION))
+        if stored_model is not None and stored_model != embedding_model:
+            print(f"{Fore.YELLOW} Embedding model changed from {stored_model} to {embedding_model}, "
+                  f"recreating the KB {Fore.RESET}")
+            client.collections.delete(MANIFEST_COLLECTION)
+    if not client.collections.exists(MANIFEST_COLLECTION):
+        if client.collections.exists(KB_COLLECTION):
+            client.collections.delete(KB_COLLECTION)
+        client.collections.create(
+            name=MANIFEST_COLLECTION,
+            vectorizer_config=wvc.config.Configure.Vectorizer.none(),
+            properties=[
+                wvc.config.Property(name="source", data_type=wvc.config.DataType.TEXT,
+                                    tokenization=wvc.config.Tokenization.FIELD),
+                wvc.config.Property(name="sha256", data_type=wvc.config.DataType.TEXT),
+                wvc.config.Property(name="embedding_model", data_type=wvc.config.DataType.TEXT),
+                wvc.config.Property(name="chunks", data_type=wvc.config.DataType.INT),
+            ],
+        )
+    if not client.collections.exists(KB_COLLECTION):
+        _create_kb(client, ollama_endpoint, embedding_model)
+    return client.collections.get(KB_COLLECTION), client.collections.get(MANIFEST_COLLECTION)
+
+
+def read_manifest(manifest):
+    """Return {source: properties} of the ingested source files."""
+    return {obj.properties["source"]: obj.properties for obj in manifest.iterator()}
+
+
+def ingest(client, embeddings, source_dir, ollama_endpoint, embedding_model, parse_pool=None, workers=WORKERS,
+           embed_batch_size=EMBED_BATCH_SIZE, embed_concurrency=EMBED_CONCURRENCY,
+           batch_size=BATCH_SIZE, concurrent_requests=CONCURRENT_REQUESTS):
+    """Bring the KB collection in line with the HTML files in ``source_dir``, return the counts.
+
+    The changed files are parsed in ``parse_pool``, started with ``start_parse_pool`` before
+    the client, or in-process without one.
+    """
+    start_time = time.perf_counter()
+    kb, manifest = ensure_collections(client, ollama_endpoint, embedding_model)
+    ingested = read_manifest(manifest)
+    sources = scan_sources(source_dir)
+
+    changed = []
+    for source, path in sources.items():
+        sha256 = file_hash(path)
+        entry = ingested.get(source)
+        if entry is None or entry["sha256"] != sha256 or entry["embedding_model"] != embedding_model:
+            changed.append((source, path, sha256))
+    removed = [source for source in ingested if source not in sources]
+
+    # chunks of changed and removed sources go first, a changed file may have fewer chunks now
+    stale = [source for source, _, _ in changed if source in ingested] + removed
+    for sources_batch in batched(stale, DELETE_BATCH_SIZE):
+        kb.data.delete_many(where=Filter.by_property("source").contains_any(sources_batch))
+    for source in removed:
+        manifest.data.delete_by_id(generate_uuid5(source, MANIFEST_COLLECTION))
+
+    # source -> (sha256, chunks) of the parsed sources, the manifest entries written at the end
+    stored = {}
+
+    def iter_chunks():
+        for source, sha256, chunks in iter_parsed(changed, parse_pool, workers):
+            stored[source] = (sha256, len(chunks))
+            for index, (text, title) in enumerate(chunks):
+                yield source, index, text, title
+
+    def embed(chunk_batch):
+        return chunk_batch, embeddings.embed_documents([text for _, _, text, _ in chunk_batch])
+
+    chunk_count = 0
+    with ThreadPoolExecutor(max_workers=embed_concurrency) as embed_executor, \
+            kb.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+        embedded = bounded_map(embed_executor, embed, batched(iter_chunks(), embed_batch_size),
+                               max_pending=embed_concurrency)
+        for chunk_batch, vectors in embedded:
+            for (source, index, text, title), vector in zip(chunk_batch, vectors):
+                batch.add_object(
+                    properties={"text": text, "source": source, "title": title},
+                    uuid=chunk_uuid(source, index, text),
+                    vector=vector,
+                )
+            chunk_count += len(chunk_batch)
+
+    # a source whose chunks did not all make it is retried on the next start
+    failed_sources = {obj.object_.properties["source"] for obj in kb.batch.failed_objects}
+    for obj in kb.batch.failed_objects[:5]:
+        logger.error(f"Failed to store chunk of {obj.object_.properties['source']}: {obj.message}")
+    with manifest.batch.fixed_size(batch_size=batch_size) as batch:
+        for source, (sha256, chunks) in stored.items():
+            if source not in failed_sources:
+                batch.add_object(
+                    properties={"source": source, "sha256": sha256, "embedding_model": embedding_model,
+                                "chunks": chunks},
+                    uuid=generate_uuid5(source, MANIFEST_COLLECTION),
+                )
+
+    counts = {
+        "unchanged": len(sources) - len(changed),
+        "updated": len(changed) - len(failed_sources),
+        "removed": len(removed),
+        "failed": len(failed_sources),
+        "chunks": chunk_count,
+        "seconds": time.perf_counter() - start_time,
+    }
+    print(f"{Fore.GREEN} KB ingestion: {counts['updated']} updated, {counts['unchanged']} unchanged, "
+          f"{counts['removed']} removed, {counts['failed']} failed source files, {counts['chunks']} chunks "
+          f"in {counts['seconds']:.1f} seconds {Fore.RESET}")
+    return counts
@@ -0,0 +1,96 @@
+"""Span export profiles of the travel advisor, the same as those of the NAT app (app/telemetry.py).
+
+``development`` exports every span synchronously when it ends (``disable_batch=True``).
+``production`` exports spans in batches from a background thread; past
+``OTEL_BSP_MAX_QUEUE_SIZE`` waiting spans new ones are dropped instead of blocking the
+request, and counted in ``otel.exporter.spans.dropped``.
+
+Environment variables:
+    - TELEMETRY_PROFILE: 'production' or 'development' (default: production)
+    - OTEL_BSP_MAX_QUEUE_SIZE: spans waiting for export before new ones are dropped (default: 2048)
+    - OTEL_BSP_SCHEDULE_DELAY: flush interval in milliseconds (default: 1000)
+    - OTEL_BSP_MAX_EXPORT_BATCH_SIZE: spans per export request (default: 512)
+    - OTEL_BSP_EXPORT_TIMEOUT: timeout of one export request in milliseconds (default: 10000)
+"""
+
+import os
+import threading
+
+from opentelemetry import metrics
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+meter = metrics.get_meter(__name__)
+dropped_spans_counter = meter.create_counter(
+    "otel.exporter.spans.dropped", description="Spans dropped because the export queue was full")
+failed_spans_counter = meter.create_counter(
+    "otel.exporter.spans.failed", description="Spans the collector did not accept")
+
+
+class _CountingExporter(SpanExporter):
+    """Passes batches on to the real exporter and reports how many spans left the queue."""
+
+    def __init__(self, exporter, on_exported):
+        self._exporter = exporter
+        self._on_exported = on_exported
+
+    def export(self, spans):
+        result = SpanExportResult.FAILURE
+        try:
+            result = self._exporter.export(spans)
+        finally:
+            self._on_exported(len(spans))
+            if result != SpanExportResult.SUCCESS:
+                failed_spans_counter.add(len(spans))
+        return result
+
+    def shutdown(self):
+        return self._exporter.shutdown()
+
+    def force_flush(self, timeout_millis=30000):
+        return self._exporter.force_flush(timeout_millis)
+
+
+class DroppingBatchSpanProcessor(BatchSpanProcessor):
+    """BatchSpanProcessor that never blocks and counts the spans it drops."""
+
+    def __init__(self, span_exporter, max_queue_size, **kwargs):
+        self.max_queue_size = max_queue_size
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        super().__init__(_CountingExporter(span_exporter, self._exported), max_queue_size=max_queue_size, **kwargs)
+
+    def on_end(self, span):
+        if not (span.context and span.context.trace_flags.sampled):
+            return
+        with self._pending_lock:
+            if self._pending >= self.max_queue_size:
+                dropped_spans_counter.add(1)
+                return
+            self._pending += 1
+        super().on_end(span)
+
+    def _exported(self, count):
+        with self._pending_lock:
+            self._pending -= count
+
+
+def create_span_processor(api_endpoint, headers=None):
+    """Return the span processor of TELEMETRY_PROFILE, or None for synchronous export."""
+    if os.environ.get("TELEMETRY_PROFILE", "production").lower() == "development":
+        return None
+
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    export_timeout_millis = int(os.environ.get("OTEL_BSP_EXPORT_TIMEOUT", "10000"))
+    exporter = OTLPSpanExporter(
+        endpoint=f"{api_endpoint.rstrip('/')}/v1/traces",
+        headers=headers,
+        timeout=export_timeout_millis / 1000,
+    )
+    return DroppingBatchSpanProcessor(
+        exporter,
+        max_queue_size=int(os.environ.get("OTEL_BSP_MAX_QUEUE_SIZE", "2048")),
+        schedule_delay_millis=int(os.environ.get("OTEL_BSP_SCHEDULE_DELAY", "1000")),
+        max_export_batch_size=int(os.environ.get("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+        export_timeout_millis=export_timeout_millis,
+    )
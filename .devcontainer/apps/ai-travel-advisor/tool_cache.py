@@ -0,0 +1,217 @@
+"""Memoization of the agentic tools, keyed on the normalized city name.
+
+Every agentic completion asks the LLM whether the input is a city (valid_city) and
+then for the travel advice (travel_advice), although the same popular cities are asked
+for over and over. ``memoize`` stores the result of a tool per normalized city name:
+
+- an in-memory LRU of at most TOOL_CACHE_MAX_ENTRIES results per tool, each valid for
+  TOOL_CACHE_TTL_SECONDS
+- optionally a SQLite file (TOOL_CACHE_PATH) behind it, so the results survive a
+  restart and are shared by the workers on the same volume
+- concurrent misses for the same city wait for the one Ollama call already running;
+  the call runs as its own task, so a cancelled request does not fail the others
+
+Failed calls are not stored. The excuse tool is not memoized: it is only used for
+inputs that are not cities, which rarely repeat.
+
+The outcome is set on the current span, the Traceloop @task span of the tool:
+
+    tool_cache.hit      True if the result did not come from a new LLM call
+    tool_cache.source   memory, sqlite, in_flight (joined a running call) or llm
+    tool_cache.key      the normalized city name
+
+and counted in the ``travel_advisor.tool_cache.lookups`` counter (attributes ``tool``
+and ``source``).
+
+Tuning (environment variables):
+    - TOOL_CACHE_TTL_SECONDS: how long a result is reused, 0 disables the cache (default: 86400)
+    - TOOL_CACHE_MAX_ENTRIES: results kept in memory per tool (default: 1024)
+    - TOOL_CACHE_PATH: SQLite file of the persistent cache, empty keeps it in memory only (default: empty)
+"""
+
+import asyncio
+import collections
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from opentelemetry import metrics, trace
+
+TTL_SECONDS = float(os.environ.get("TOOL_CACHE_TTL_SECONDS", "86400"))
+MAX_ENTRIES = int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", "1024"))
+CACHE_PATH = os.environ.get("TOOL_CACHE_PATH", "")
+
+meter = metrics.get_meter("travel-advisor")
+cache_lookups = meter.create_counter(
+    "travel_advisor.tool_cache.lookups", description="Tool calls by where their result came from")
+
+_SEPARATORS = re.compile(r"[\s_]+")
+_NOT_NAME = re.compile(r"[^\w\s'-]")
+
+
+def normalize_city(city):
+    """Cache key of a city name, ignoring case, punctuation and spacing."""
+    city = unicodedata.normalize("NFKC", str(city)).casefold()
+    city = _NOT_NAME.sub(" ", city)
+    return _SEPARATORS.sub(" ", city).strip(" '-")
+
+
+class TTLCache:
+    """Size-bounded LRU whose entries expire after ``ttl_seconds``."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires at, value), least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return ``(found, value)``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._entries[key] = (expires_at or time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Tool results in a SQLite file, with the same expiry and size bound as ``TTLCache``."""
+
+    def __init__(self, path, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # the calls run in worker threads (asyncio.to_thread), serialized by the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache (tool TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (tool, key))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tool_cache_used_at ON tool_cache (tool, used_at)")
+
+    def get(self, tool, key):
+        """Return ``(found, value, expires_at)``."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE tool = ? AND key = ? AND expires_at > ?",
+                (tool, key, now)).fetchone()
+            if row is None:
+                return False, None, None
+            self._connection.execute("UPDATE tool_cache SET used_at = ? WHERE tool = ? AND key = ?", (now, tool, key))
+        return True, json.loads(row[0]), row[1]
+
+    def set(self, tool, key, value):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tool_cache (tool, key, value, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (tool, key, json.dumps(value), now + self.ttl_seconds, now))
+            # expired entries first, then the least recently used ones beyond the bound
+            self._connection.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (now,))
+            self._connection.execute(
+                "DELETE FROM tool_cache WHERE tool = ? AND key NOT IN "
+                "(SELECT key FROM tool_cache WHERE tool = ? ORDER BY used_at DESC LIMIT ?)",
+                (tool, tool, self.max_entries))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ToolCache:
+    """The results of one tool: memory first, then the optional SQLite file."""
+
+    def __init__(self, tool, store=None, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.tool = tool
+        self.store = store
+        self.enabled = ttl_seconds > 0
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        # key -> task of the LLM call running for it
+        self._in_flight = {}
+
+    async def get_or_call(self, key, call):
+        """Return ``(value, source)``, calling ``call()`` only if no stored or running result exists."""
+        found, value = self.memory.get(key)
+        if found:
+            return value, "memory"
+        running = self._in_flight.get(key)
+        if running is None:
+            running = asyncio.ensure_future(self._load_or_call(key, call))
+            self._in_flight[key] = running
+            running.add_done_callback(functools.partial(self._call_done, key))
+            joined = False
+        else:
+            joined = True
+        # the call runs as its own task: a cancelled caller (e.g. a disconnected client)
+        # stops waiting, the call goes on for the others waiting for the same key
+        value, source = await asyncio.shield(running)
+        return value, "in_flight" if joined else source
+
+    def _call_done(self, key, running):
+        if self._in_flight.get(key) is running:
+            del self._in_flight[key]
+        if not running.cancelled():
+            # retrieved here, so a failure no one waited for any more is not logged; the next call tries again
+            running.exception()
+
+    async def _load_or_call(self, key, call):
+        if self.store is not None:
+            found, value, expires_at = await asyncio.to_thread(self.store.get, self.tool, key)
+            if found:
+                self.memory.set(key, value, expires_at)
+                return value, "sqlite"
+        value = await call()
+        self.memory.set(key, value)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, self.tool, key, value)
+        return value, "llm"
+
+
+_store = SQLiteCache(CACHE_PATH) if CACHE_PATH and TTL_SECONDS > 0 else None
+
+
+def memoize(tool):
+    """Memoize an async tool taking a city name, per normalized city name."""
+    cache = ToolCache(tool, _store)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(city):
+            if not cache.enabled:
+                return await fn(city)
+            key = normalize_city(city)
+            value, source = await cache.get_or_call(key, lambda: fn(city))
+            trace.get_current_span().set_attributes({
+                "tool_cache.hit": source != "llm",
+                "tool_cache.source": source,
+                "tool_cache.key": key,
+            })
+            cache_lookups.add(1, {"tool": tool, "source": source})
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -1,85 +1,34 @@
 # environment variables used:
 # - OTEL_OTLP_ENDPOINT: OpenTelemetry OTLP exporter endpoint (default: http://localhost:4317)
 
-import asyncio
-import contextlib
-import io
-import logging
-import warnings
 import os
-import sys
-import time
 from pathlib import Path
 
-APP_DIR = Path(__file__).resolve().parent
-REPO_ROOT = APP_DIR.parent
-GUARDRAILS_CONFIG_PATH = APP_DIR / "guardrails_config" / "config.yml"
-NAT_CONFIG_PATH = APP_DIR / "src" / "nat_simple_web_query" / "configs" / "config.yml"
-GUARDRAILS_DIR = APP_DIR / "guardrails_config"
-
-# Suppress Pydantic warnings BEFORE importing libraries that use Pydantic
-warnings.filterwarnings("ignore", message=".*validate_default.*", module="pydantic")
-
 # for streamlit app
 import streamlit as st
 
-# for NVIDIA Guardrails
-from nemoguardrails import RailsConfig, LLMRails
-
-# for OpenTelemetry setup
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor,ConsoleSpanExporter
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-
 # for OpenTelemetry and Dynatrace Traceloop
 from opentelemetry import trace
-from traceloop.sdk import Traceloop
-
-# ------------------------------------------------------------------------------
-# constants
-# ------------------------------------------------------------------------------
-# name used in tracing
-SERVICE_NAME = "nvidia-example" + ("-" + os.getenv("GITHUB_USER", "") if os.getenv("GITHUB_USER", "") else "")
-# used in UI selectbox
-OPTION_WITH_GUARDRAILS = "With NeMo Guardrails"
-OPTION_WITHOUT_GUARDRAILS = "Without NeMo Guardrails"
-
-# ------------------------------------------------------------------------------
-# traceloop-sdk setup for intrumentation and Dynatrace OTLP ingestion
-# ------------------------------------------------------------------------------
 
-# disable SDK collects anonymous telemetry data
-os.environ['TRACELOOP_TELEMETRY'] = "false"
-# set metrics preference to delta since this is what Dynatrace API expects
-os.environ['OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE'] = "delta"
+# guarded query pipeline (guardrails and NAT workflow)
+from pipeline import (
+    EXECUTION_MODE,
+    EXECUTION_MODE_SEQUENTIAL,
+    EXECUTION_MODE_SPECULATIVE,
+    NAT_CONFIG_PATH,
+    OPTION_WITH_GUARDRAILS,
+    OPTION_WITHOUT_GUARDRAILS,
+    SERVICE_NAME,
+    find_missing_config_files,
+    process_query,
+    stream_query,
+)
 
-@st.cache_resource(show_spinner="Initializing Traceloop SDK...")
-def initialize_traceloop():
-    """Initialize Traceloop once (cached to prevent re-initialization on every Streamlit rerun)."""
+# for the long-lived event loop shared by all queries
+from async_runtime import StatusRelay, iterate, wait_for
 
-    print("✓ Initializing Traceloop SDK...")
-    Traceloop.init(
-        app_name=SERVICE_NAME,
-        api_endpoint=os.environ.get('OTEL_OTLP_ENDPOINT', 'http://localhost:4318'),
-        disable_batch=True,
-        should_enrich_metrics=True,
-    )
-    print("✓ Traceloop SDK initialized with: "+ os.environ.get('OTEL_OTLP_ENDPOINT', 'http://localhost:4318'))
-    
-# ------------------------------------------------------------------------------
-# Suppress verbose NAT agent logging and warnings
-# ------------------------------------------------------------------------------
-@st.cache_resource(show_spinner="Configuring logging...")
-def configure_logging():
-    """Configure logging levels once (cached to prevent re-execution on every Streamlit rerun)."""
-    print("✓ Configuring logging levels...")
-    logging.getLogger("nat.agent").setLevel(logging.CRITICAL)
-    logging.getLogger("nat").setLevel(logging.CRITICAL)
-    logging.getLogger("langchain_community").setLevel(logging.ERROR)
-    logging.getLogger("nemoguardrails.actions.action_dispatcher").setLevel(logging.ERROR)
-    warnings.filterwarnings("ignore")
-    return True
+# for initializing the pipeline components in the background
+from startup import READY_FILE, Startup, pipeline_steps
 
 # ------------------------------------------------------------------------------
 # Config file validation
@@ -89,15 +38,8 @@ def ensure_config_files_exist():
     """Verify required config files exist before app starts."""
     print("✓ Ensuring required config files exist...")
 
-    # Construct config file paths
-    guardrails_config_path = GUARDRAILS_CONFIG_PATH
-    nat_config_path = NAT_CONFIG_PATH
-    
     # Ensure both config files exist
-    missing_files = []
-    for config_path in [guardrails_config_path, nat_config_path]:
-        if not config_path.exists():
-            missing_files.append(str(config_path))
+    missing_files = find_missing_config_files()
     
     if missing_files:
         print(f"❌ Error: The following config files were not found:")
@@ -109,200 +51,25 @@ def ensure_config_files_exist():
     print("✓ All required config files found")
 
 # ------------------------------------------------------------------------------
-# guardrail functions
-# ------------------------------------------------------------------------------
-@st.cache_resource(show_spinner="Configuring guardrails...")
-def initialize_guardrails():
-    """Initialize guardrails configuration once (cached to prevent re-initialization on every Streamlit rerun)."""
-    print("✓ Initializing guardrails configuration...")
-    try:
-        # Load guardrails configuration
-        guardrails_path = GUARDRAILS_DIR
-        
-        if not guardrails_path.exists():
-            print(f"⚠️ Guardrails config not found at: {guardrails_path}")
-            return None
-        
-        rails_config = RailsConfig.from_path(str(guardrails_path))
-        rails = LLMRails(rails_config)
-        
-        # Register custom guardrails actions
-        import sys
-        sys.path.insert(0, str(guardrails_path))
-        
-        try:
-            from actions import (
-                check_jailbreak, 
-                check_blocked_terms, 
-                check_input_topic, 
-                check_input_length,
-                check_output_relevance,
-                check_politics
-            )
-            
-            rails.register_action(check_jailbreak, "check_jailbreak")
-            rails.register_action(check_input_topic, "check_input_topic")
-            rails.register_action(check_output_relevance, "check_output_relevance")
-            rails.register_action(check_blocked_terms, "check_blocked_terms")
-            rails.register_action(check_input_length, "check_input_length")
-            rails.register_action(check_politics, "check_politics")
-            
-            print("✓ Guardrails initialized successfully")
-            return rails
-        except ImportError as e:
-            print(f"⚠️ Could not load custom actions: {e}")
-            return rails
-            
-    except Exception as e:
-        print(f"❌ Error initializing guardrails: {e}")
-        return None
-
-async def check_input_guardrails(rails, user_input):
-    """Apply input guardrails and return (is_safe, message)."""
-    try:
-        start_time = time.time()
-        input_result = await rails.generate_async(
-            messages=[{"role": "user", "content": user_input}]
-        )
-        end_time = time.time()
-        duration = end_time - start_time
-        print(f"⏱️  Input guardrail execution time: {duration:.2f} seconds")
-        
-        # Check if input was blocked
-        # Handle GenerationResponse objects (from NeMo Guardrails)
-        if hasattr(input_result, 'response') and isinstance(input_result.response, list):
-            # Extract content from GenerationResponse
-            if input_result.response:
-                content = input_result.response[-1].get('content', '')
-                if any(phrase in content.lower() for phrase in ["i'm sorry", "i can't", "i cannot", "please ask", "i can only"]):
-                    return False, content
-        elif isinstance(input_result, dict):
-            content = input_result.get('content', '')
-            # Consistent phrase checking across both branches
-            if any(phrase in content.lower() for phrase in ["i'm sorry", "i can't", "i cannot", "please ask", "i can only"]):
-                return False, content
-        elif hasattr(input_result, 'is_stop') and input_result.is_stop:
-            return False, input_result.return_value
-        
-        return True, "Input passed guardrails"
-    except Exception as e:
-        return False, f"Error checking input: {str(e)}"
-
-async def check_output_guardrails(rails, user_input, workflow_result):
-    """Apply output guardrails and return (is_safe, message)."""
-    try:
-        start_time = time.time()
-        output_result = await rails.generate_async(
-            messages=[
-                {"role": "user", "content": user_input},
-                {"role": "assistant", "content": workflow_result}
-            ]
-        )
-        end_time = time.time()
-        duration = end_time - start_time
-        print(f"⏱️  Output guardrail execution time: {duration:.2f} seconds")
-        
-        # Check if output was blocked
-        # Handle GenerationResponse objects (from NeMo Guardrails)
-        if hasattr(output_result, 'response') and isinstance(output_result.response, list):
-            # Extract content from GenerationResponse
-            if output_result.response:
-                content = output_result.response[-1].get('content', '')
-                if any(phrase in content.lower() for phrase in ["i can only", "please ask questions", "i'm sorry", "i cannot"]):
-                    return False, content
-        elif isinstance(output_result, dict):
-            content = output_result.get('content', '')
-            # Fixed: Added "i cannot" to match GenerationResponse branch for consistency
-            if any(phrase in content.lower() for phrase in ["i can only", "please ask questions", "i'm sorry", "i cannot"]):
-                return False, content
-        elif hasattr(output_result, 'is_stop') and output_result.is_stop:
-            return False, output_result.return_value
-        
-        return True, "Output passed guardrails"
-    except Exception as e:
-        return False, f"Error checking output: {str(e)}"
-    
-# ------------------------------------------------------------------------------
-# NAT functions
+# Background start-up: Traceloop, logging, event loop, guardrails, response cache
+# and the NAT workflow are initialized and warmed up while the page is already rendered
 # ------------------------------------------------------------------------------
-async def run_nat_workflow(user_input, nat_config_path):
-    """Execute the NAT workflow."""
-    from nat.runtime.loader import load_workflow
-    
-    stderr_capture = io.StringIO()
-    
-    try:
-        with contextlib.redirect_stderr(stderr_capture):
-            async with load_workflow(nat_config_path) as workflow:
-                start_time = time.time()
-                async with workflow.run(user_input) as runner:
-                    workflow_result = await runner.result(to_type=str)
-                end_time = time.time()
-                duration = end_time - start_time
-                print(f"⏱️  NAT workflow execution time: {duration:.2f} seconds")
-        return True, str(workflow_result)
-    except Exception as e:
-        error_msg = str(e)
-        if "list index out of range" in error_msg or "Failed to parse" in error_msg:
-            return False, "Request was refused by the AI model for safety reasons"
-        #if "match any of the expected tags" in error_msg:
-        #    return False, "Request was refused by the AI model for safety reasons"
-        return False, f"Error: {error_msg}"
+@st.cache_resource(show_spinner=False)
+def start_pipeline():
+    """Start the pipeline initializers in a background thread once per Streamlit server process."""
+    print("✓ Starting pipeline components in the background...")
+    return Startup(pipeline_steps(SERVICE_NAME), name="pipeline-startup", ready_file=READY_FILE).start()
 
-# ------------------------------------------------------------------------------
-# Main functions
-# ------------------------------------------------------------------------------
-async def process_query(user_input, user_option_guardrail, rails, nat_config_path, status_text=None):
-    """Main processing function that coordinates all steps."""
-    print("Processing", user_option_guardrail, "query:", user_input)
-    results = {
-        "input_safe": False,
-        "input_message": "",
-        "workflow_success": False,
-        "workflow_result": "",
-        "output_safe": False,
-        "output_message": "",
-        "final_result": ""
-    }
-    
-    if user_option_guardrail == OPTION_WITH_GUARDRAILS:
-        # Step 1: Input guardrails
-        status_text.text("⚡ Running input guardrails...")
-        results["input_safe"], results["input_message"] = await check_input_guardrails(rails, user_input)
-        if not results["input_safe"]:
-            return results
-    else:
-        results["input_safe"] = True
-    
-    # Step 2: Run NAT workflow
-    status_text.text("⚡ Running NAT workflow...")
-    results["workflow_success"], results["workflow_result"] = await run_nat_workflow(user_input, nat_config_path)
-    if not results["workflow_success"]:
-        return results
-    
-    # Check for safety refusal in NAT workflow result
-    if "Invalid Format" in results["workflow_result"] and (
-        "can't" in results["workflow_result"].lower() or 
-        "illegal" in results["workflow_result"].lower()
-    ):
-        results["workflow_success"] = False
-        results["workflow_result"] = "(NAT workflow) Request was refused by the AI model for safety reasons. Details: " + results["workflow_result"]
-        return results
-    
-    # Step 3: Output guardrails
-    if user_option_guardrail == OPTION_WITH_GUARDRAILS:
-        status_text.text("⚡ Running Output guardrails...")
-        results["output_safe"], results["output_message"] = await check_output_guardrails(
-            rails, user_input, results["workflow_result"]
-        )
-        if results["output_safe"]:
-            results["final_result"] = results["workflow_result"]
-    else:
-        # Output guardrails disabled - set as safe and use workflow result
-        results["output_safe"] = True
-        results["final_result"] = results["workflow_result"]
-    
-    return results
+@st.fragment(run_every=1)
+def show_startup_progress(startup):
+    """Show the warm-up progress until the start-up finished, then rerun the page to enable queries."""
+    if startup.done:
+        st.rerun()
+    status = startup.status()
+    finished = ", ".join(f"{step['name']} {step['seconds']:.1f}s" for step in status["steps"])
+    st.info(f"⏳ Warming up {status['current_step'] or 'pipeline'}... ({status['elapsed_seconds']:.0f}s)"
+            + (f"  \n✓ {finished}" if finished else "")
+            + (f"  \n⚠️ Retry {status['retry']}, last error: {status['last_error']}" if status["retry"] else ""))
 
 # ------------------------------------------------------------------------------
 # streamlit Setup
@@ -313,10 +80,14 @@ def main():
     # Verify config files exist first (will exit if missing)
     ensure_config_files_exist()
     
-    # Initialize components will caching to prevent re-initialization on every rerun
-    initialize_traceloop()
-    configure_logging()
-    rails = initialize_guardrails() 
+    # Initialize components in the background, the page renders while they warm up
+    startup = start_pipeline()
+    components = startup.components
+    event_loop = components.get("event_loop")
+    rails = components.get("guardrails")
+    local_rails = components.get("local_input_rails")
+    parallel_rails = components.get("parallel_input_rails")
+    response_cache = components.get("response_cache")
 
     # Page configuration (must be first Streamlit command)
     st.set_page_config(
@@ -381,6 +152,14 @@ def main():
         # Show Service name
         st.markdown(f'<hr><p><div style="text-align: left; font-style: italic;">Service Name: {SERVICE_NAME}</div></p>', unsafe_allow_html=True)
 
+        # Show the warm-up progress, queries are enabled once the components are ready
+        if not startup.done:
+            show_startup_progress(startup)
+        elif startup.error:
+            st.warning(f"⚠️ Start-up failed: {startup.error}")
+        elif startup.warnings:
+            st.info("⚠️ " + "; ".join(f"{step_name} failed: {error}" for step_name, error in startup.warnings.items()))
+
         # Query input
         user_input = st.text_area(
             "💬 Ask your question",
@@ -394,11 +173,23 @@ def main():
             options=[OPTION_WITHOUT_GUARDRAILS, OPTION_WITH_GUARDRAILS],
             index=0,
             help="Choose an option to run with or without NeMo guardrails")
+
+        stream_response = st.checkbox(
+            "⚡ Stream the response as it is generated",
+            value=True,
+            help="Show tokens while the NAT workflow answers; with guardrails they pass chunked output rails first")
+
+        speculative = st.checkbox(
+            "🏎️ Start the NAT workflow while the input guardrails run",
+            value=EXECUTION_MODE == EXECUTION_MODE_SPECULATIVE,
+            help="Speculative execution: the workflow result is discarded if the input guardrails block the query")
+        execution_mode = EXECUTION_MODE_SPECULATIVE if speculative else EXECUTION_MODE_SEQUENTIAL
                 
         col_submit, col_clear = st.columns([1, 1])
         
         with col_submit:
-            submit_button = st.button("🚀 Submit Query", type="primary", use_container_width=True)
+            submit_button = st.button("🚀 Submit Query", type="primary", use_container_width=True,
+                                      disabled=event_loop is None or not startup.done)
         
         with col_clear:
             clear_button = st.button("🗑️ Clear History", use_container_width=True)
@@ -427,11 +218,26 @@ def main():
                         else:
                             status_text.text("⚡ Skipping guardrails...")
                         
-                        # Run async processing
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        results = loop.run_until_complete(process_query(user_input, user_option_guardrail, rails, Path(nat_config_path), status_text=status_text))
-                        loop.close()
+                        # Run async processing on the shared background loop, so the warm
+                        # NAT workflow and the guardrails connection pools are reused
+                        status_relay = StatusRelay()
+                        if stream_response:
+                            # Render tokens as they arrive, the final layout below replaces the preview
+                            streamed_text = ""
+                            response_preview = st.empty()
+                            for event in iterate(event_loop, stream_query(user_input, user_option_guardrail, rails, Path(nat_config_path), status_text=status_relay, local_rails=local_rails, execution_mode=execution_mode, response_cache=response_cache, parallel_rails=parallel_rails, context=trace.set_span_in_context(span)), status_relay, status_text):
+                                if event["type"] == "token":
+                                    streamed_text += event["text"]
+                                    response_preview.markdown(streamed_text + "▌")
+                                elif event["type"] == "retract":
+                                    streamed_text = ""
+                                    response_preview.empty()
+                                elif event["type"] == "result":
+                                    results = event["results"]
+                            response_preview.empty()
+                        else:
+                            future = event_loop.submit(process_query(user_input, user_option_guardrail, rails, Path(nat_config_path), status_text=status_relay, local_rails=local_rails, execution_mode=execution_mode, response_cache=response_cache, parallel_rails=parallel_rails))
+                            results = wait_for(future, status_relay, status_text)
                         
                         # Update progress
                         progress_bar.progress(100)
@@ -441,6 +247,9 @@ def main():
                         # Display results
                         st.divider()
                         
+                        if results["cached"]:
+                            st.info("⚡ Answer served from the response cache, guardrails and NAT workflow were skipped")
+
                         # Input check result
                         if not results["input_safe"]:
                             st.error(f"🚫 Input Blocked: {results['input_message']}")
@@ -0,0 +1,139 @@
+"""Long-lived asyncio event loop running in a background thread.
+
+Async clients (the NAT workflow, the LLMRails model clients and their HTTP/gRPC
+connection pools) are bound to the event loop they are first used on. Running every
+query on one loop per process keeps those clients, and their TLS and keep-alive
+connections, warm across queries. Synchronous callers, like the Streamlit script
+thread, hand coroutines to the loop and wait on thread-safe futures.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import queue
+import threading
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever in a daemon thread."""
+
+    def __init__(self, name="background-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the loop and return a ``concurrent.futures.Future``.
+
+        The coroutine runs in a copy of the caller's context, so context variables like
+        the current OpenTelemetry span carry over from the submitting thread.
+        """
+        context = contextvars.copy_context()
+
+        async def run_in_context():
+            return await asyncio.get_running_loop().create_task(coro, context=context)
+
+        return asyncio.run_coroutine_threadsafe(run_in_context(), self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the loop and block the calling thread until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        """Stop the loop after the callbacks already scheduled have run."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+class RunningLoop:
+    """Hands coroutines to an event loop that already runs in another thread, like uvicorn's.
+
+    Offers the ``submit`` and ``run`` methods of ``BackgroundLoop``, so code written for the
+    background loop can also use the loop of an async server.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the loop and return a ``concurrent.futures.Future``."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the loop and block the calling thread until it finishes."""
+        return self.submit(coro).result(timeout)
+
+
+class StatusRelay:
+    """Thread-safe stand-in for a Streamlit placeholder.
+
+    Streamlit elements may only be updated from the script thread, so coroutines on
+    the background loop write their progress here and the script thread polls it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._message = None
+
+    def text(self, message):
+        with self._lock:
+            self._message = message
+
+    def pop(self):
+        """Return the latest message that has not been picked up yet, if any."""
+        with self._lock:
+            message, self._message = self._message, None
+            return message
+
+
+def wait_for(future, status_relay=None, status_text=None, poll_interval=0.1):
+    """Block until ``future`` is done, forwarding relayed status messages to ``status_text``."""
+    while True:
+        try:
+            return future.result(timeout=poll_interval)
+        except concurrent.futures.TimeoutError:
+            pass
+        finally:
+            message = status_relay.pop() if status_relay else None
+            if message and status_text is not None:
+                status_text.text(message)
+
+
+def iterate(background_loop, agen, status_relay=None, status_text=None, poll_interval=0.1):
+    """Consume the async generator ``agen`` on ``background_loop`` from the calling thread.
+
+    Items are handed over through a thread-safe queue as soon as they are produced, so
+    the caller can render them while the generator is still running. Exceptions raised
+    by the generator are re-raised here; closing this iterator early cancels it.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        finally:
+            items.put(done)
+
+    future = background_loop.submit(pump())
+    try:
+        while True:
+            try:
+                item = items.get(timeout=poll_interval)
+            except queue.Empty:
+                continue
+            finally:
+                message = status_relay.pop() if status_relay else None
+                if message and status_text is not None:
+                    status_text.text(message)
+            if item is done:
+                future.result()
+                return
+            yield item
+    finally:
+        future.cancel()
@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+Offline load benchmark of the full query pipeline.
+
+Replays the prompts in data/pipeline_prompts.jsonl through pipeline.process_query with
+the real guardrails config and NAT workflow, but against local stand-ins instead of
+the NIM endpoints and Tavily:
+
+    model server   OpenAI/NIM compatible /v1/models, /v1/chat/completions (plain and
+                   streamed) and /v1/embeddings. The main model answers in ReAct format
+                   (one web search, then a final answer), the NeMoGuard models answer
+                   "safe" and "on-topic". Time to first token and token rate are set
+                   on the command line.
+    search server  Tavily compatible /search with a fixed latency.
+
+The guardrails and NAT configs are generated into a temporary directory from the
+.brev templates by replacing the NVIDIA_MODEL_ENDPOINT_*_PLACEHOLDER values with the
+model server URL, like update_config.py does with the real endpoints.
+
+For each concurrency level, the corpus is replayed by that many simulated users and
+the run reports p50/p95/p99 latency of the whole query and of each stage (taken from
+the status messages of process_query), throughput and resident memory growth. The
+results are saved as JSON; --compare prints the change against an earlier result file
+and exits with an error when a latency or the throughput regressed by more than
+--regression-threshold percent.
+
+Usage:
+    python app/benchmarks/bench_pipeline.py
+    python app/benchmarks/bench_pipeline.py --concurrency 1,4,16 --queries 64 --output after.json
+    python app/benchmarks/bench_pipeline.py --llm-latency-ms 400 --tokens-per-second 30
+    python app/benchmarks/bench_pipeline.py --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import yaml
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from update_config import CONFIG_TYPE_HEADER  # noqa: E402
+
+CORPUS_PATH = Path(__file__).resolve().parent / "data" / "pipeline_prompts.jsonl"
+GUARDRAILS_TEMPLATE_DIR = APP_DIR / "guardrails_config"
+NAT_TEMPLATE_PATH = APP_DIR / "src" / "nat_simple_web_query" / "configs" / "config.yml.brev"
+PLACEHOLDERS = [f"NVIDIA_MODEL_ENDPOINT_800{port}_PLACEHOLDER" for port in range(1, 5)]
+
+# status messages of process_query -> stage that starts with them
+STAGE_MESSAGES = {
+    "⚡ Running local input guardrails...": "local_input_rails",
+    "⚡ Running input guardrails...": "input_rails",
+    "⚡ Running input guardrails and NAT workflow...": "input_rails",
+    "⚡ Running NAT workflow...": "workflow",
+    "⚡ Running Output guardrails...": "output_rails",
+}
+STAGES = ["response_cache", "local_input_rails", "input_rails", "workflow", "output_rails", "total"]
+
+ANSWER_WORDS = (
+    "Dynatrace combines traces, metrics and logs from OneAgent and OpenTelemetry in Grail, and Davis AI "
+    "correlates them into problems with a root cause, so a slow service is traced down to the database "
+    "call, the Kubernetes pod or the deployment that caused it."
+).split()
+SEARCH_THOUGHT = "Thought: I should search the web for this."
+
+
+# ------------------------------------------------------------------------------
+# stand-in servers
+# ------------------------------------------------------------------------------
+class _StandInServer:
+    """Threaded HTTP server on a free local port."""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.requests = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _json_handler(stand_in, routes):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _dispatch(self, method):
+            route = routes.get((method, self.path.split("?")[0].rstrip("/")))
+            if route is None:
+                self.send_json({"error": f"no stand-in for {method} {self.path}"}, status=404)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+            route(self, json.loads(body) if body else {})
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def send_json(self, payload, status=200):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    Handler.stand_in = stand_in
+    return Handler
+
+
+class ModelServer(_StandInServer):
+    """OpenAI/NIM compatible chat and embedding endpoints with simulated latency."""
+
+    def __init__(self, models, llm_latency, guard_latency, embed_latency, tokens_per_second, answer_tokens,
+                 direct_answers):
+        self.models = models
+        self.llm_latency = llm_latency
+        self.guard_latency = guard_latency
+        self.embed_latency = embed_latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.direct_answers = direct_answers
+        super().__init__(_json_handler(self, {
+            ("GET", "/v1/models"): self._models,
+            ("POST", "/v1/chat/completions"): self._chat,
+            ("POST", "/v1/embeddings"): self._embeddings,
+        }))
+
+    def _models(self, handler, _):
+        handler.send_json({"object": "list", "data": [
+            {"id": model, "object": "model", "owned_by": "bench"} for model in self.models
+        ]})
+
+    def _reply(self, model, messages):
+        """Return (kind, reply text) for a chat request."""
+        if "content-safety" in model:
+            return "content_safety", '{"User Safety": "safe", "Response Safety": "safe"}'
+        if "topic-control" in model:
+            return "topic_control", "on-topic"
+        transcript = "\n".join(str(message.get("content", "")) for message in messages)
+        if self.direct_answers or SEARCH_THOUGHT in transcript:
+            words = itertools.islice(itertools.cycle(ANSWER_WORDS), self.answer_tokens)
+            return "main", "Thought: I now know the final answer\nFinal Answer: " + " ".join(words)
+        question = next((str(message.get("content", "")) for message in reversed(messages)
+                         if message.get("role") == "user"), "")
+        action_input = json.dumps({"question": question.splitlines()[-1][:200] if question else ""})
+        return "main", f"{SEARCH_THOUGHT}\nAction: web_search\nAction Input: {action_input}"
+
+    def _chat(self, handler, request):
+        model = request.get("model", "")
+        kind, reply = self._reply(model, request.get("messages", []))
+        self.count(kind)
+        tokens = [token if index == 0 else f" {token}" for index, token in enumerate(reply.split(" "))]
+        time.sleep(self.llm_latency if kind == "main" else self.guard_latency)
+        created = int(time.time())
+
+        if not request.get("stream"):
+            time.sleep(len(tokens) / self.tokens_per_second)
+            handler.send_json({
+                "id": f"chatcmpl-{created}", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(str(request.get("messages"))) // 4,
+                          "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        for index, token in enumerate(tokens + [None]):
+            chunk = {
+                "id": f"chatcmpl-{created}", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": token} if token is not None else {},
+                             "finish_reason": None if token is not None else "stop"}],
+            }
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            handler.wfile.flush()
+            if token is not None and index:
+                time.sleep(1 / self.tokens_per_second)
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+
+    def _embeddings(self, handler, request):
+        self.count("embeddings")
+        texts = request.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        time.sleep(self.embed_latency)
+        handler.send_json({"object": "list", "model": request.get("model", ""), "data": [
+            {"object": "embedding", "index": index, "embedding": _embedding(text)} for index, text in enumerate(texts)
+        ], "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+
+def _embedding(text, dimensions=1024):
+    """Deterministic unit vector of ``text``, equal texts embed equally."""
+    vector = [0.0] * dimensions
+    for word in text.lower().split():
+        digest = zlib.crc32(word.encode())
+        vector[digest % dimensions] += 1.0 if digest & 1 else -1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+class SearchServer(_StandInServer):
+    """Tavily compatible /search endpoint with a fixed latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        super().__init__(_json_handler(self, {("POST", "/search"): self._search}))
+
+    def _search(self, handler, request):
+        self.count("search")
+        time.sleep(self.latency)
+        query = request.get("query", "")
+        handler.send_json({
+            "query": query, "answer": None, "images": [], "follow_up_questions": None,
+            "response_time": self.latency,
+            "results": [{
+                "title": f"Result {index + 1} for {query}",
+                "url": f"https://example.com/{index + 1}",
+                "content": " ".join(ANSWER_WORDS),
+                "score": 0.9 - index * 0.1,
+                "raw_content": None,
+            } for index in range(request.get("max_results", 5))],
+        })
+
+
+def point_tavily_at(search_url):
+    """Send the Tavily requests of langchain_tavily to the stand-in search server."""
+    os.environ.setdefault("TAVILY_API_KEY", "tvly-bench")
+    try:
+        from langchain_tavily import _utilities
+    except ImportError:
+        print("⚠️ langchain_tavily not installed, web searches are not redirected to the stand-in")
+        return
+    _utilities.TAVILY_API_URL = search_url
+
+
+# ------------------------------------------------------------------------------
+# configs
+# ------------------------------------------------------------------------------
+def generate_configs(work_dir, model_url):
+    """Write the guardrails and NAT configs for the stand-ins, return (guardrails dir, NAT config path)."""
+    endpoint = f"{model_url}/v1"
+    guardrails_dir = work_dir / "guardrails_config"
+    shutil.copytree(GUARDRAILS_TEMPLATE_DIR, guardrails_dir, ignore=shutil.ignore_patterns("__pycache__"))
+    content = (GUARDRAILS_TEMPLATE_DIR / "config.yml.brev").read_text()
+    for placeholder in PLACEHOLDERS:
+        content = content.replace(placeholder, endpoint)
+    # the stage metrics of benchmark runs are reported with config type "bench"
+    (guardrails_dir / "config.yml").write_text(f"{CONFIG_TYPE_HEADER}bench\n{content}")
+
+    content = NAT_TEMPLATE_PATH.read_text()
+    for placeholder in PLACEHOLDERS:
+        content = content.replace(placeholder, endpoint)
+    nat_config = yaml.safe_load(content)
+    # no collector runs next to the benchmark
+    nat_config.get("general", {}).pop("telemetry", None)
+    nat_config_path = work_dir / "nat_config.yml"
+    nat_config_path.write_text(f"{CONFIG_TYPE_HEADER}bench\n" + yaml.safe_dump(nat_config, sort_keys=False))
+    return guardrails_dir, nat_config_path
+
+
+def model_names(*paths):
+    """Return the model names used in the config templates."""
+    names = set()
+    for path in paths:
+        for line in Path(path).read_text().splitlines():
+            key, _, value = line.strip().partition(":")
+            if key in ("model", "model_name") and value.strip():
+                names.add(value.strip())
+    return sorted(names)
+
+
+# ------------------------------------------------------------------------------
+# measurement
+# ------------------------------------------------------------------------------
+class StageClock:
+    """status_text stand-in that timestamps the stage messages of process_query."""
+
+    def __init__(self):
+        self.marks = [("response_cache", time.perf_counter())]
+
+    def text(self, message):
+        stage = STAGE_MESSAGES.get(message)
+        if stage:
+            self.marks.append((stage, time.perf_counter()))
+
+    def durations(self):
+        end = time.perf_counter()
+        durations = {"total": end - self.marks[0][1]}
+        for (stage, start), (_, stop) in zip(self.marks, self.marks[1:] + [(None, end)]):
+            durations[stage] = durations.get(stage, 0.0) + stop - start
+        return durations
+
+
+def rss_mb():
+    """Return the resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # peak instead of current RSS outside Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {"p50": value, "p95": value, "p99": value, "mean": value}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "mean": statistics.fmean(values)}
+
+
+async def run_level(pipeline, components, corpus, concurrency, queries, option, execution_mode):
+    """Replay ``queries`` prompts with ``concurrency`` users, return the level result."""
+    rails, local_rails, parallel_rails, response_cache, nat_config_path = components
+    prompts = itertools.islice(itertools.cycle(corpus), queries)
+    samples = []
+    outcomes = {"answered": 0, "blocked": 0, "failed": 0, "cached": 0, "unexpected": 0}
+
+    async def user():
+        for entry in prompts:
+            clock = StageClock()
+            results = await pipeline.process_query(
+                entry["prompt"], option, rails, nat_config_path, status_text=clock, local_rails=local_rails,
+                execution_mode=execution_mode, response_cache=response_cache, parallel_rails=parallel_rails,
+            )
+            samples.append(clock.durations())
+            if results["cached"]:
+                outcomes["cached"] += 1
+            if results["final_result"]:
+                outcome = "answered"
+            elif not results["input_safe"] or (results["workflow_success"] and not results["output_safe"]):
+                outcome = "blocked"
+            else:
+                outcome = "failed"
+            outcomes[outcome] += 1
+            if outcome != entry.get("expected", outcome) and option == pipeline.OPTION_WITH_GUARDRAILS:
+                outcomes["unexpected"] += 1
+
+    gc.collect()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - start
+    gc.collect()
+
+    return {
+        "concurrency": concurrency,
+        "queries": len(samples),
+        "wall_seconds": wall_seconds,
+        "throughput_qps": len(samples) / wall_seconds,
+        "outcomes": outcomes,
+        "latency_seconds": {
+            stage: percentiles([sample[stage] for sample in samples if stage in sample])
+            for stage in STAGES if any(stage in sample for sample in samples)
+        },
+        "rss_mb_before": rss_before,
+        "rss_mb_after": rss_mb(),
+    }
+
+
+async def run_benchmark(args, corpus, guardrails_dir, nat_config_path):
+    # imported here so --compare works without NeMo Guardrails and NAT installed
+    import pipeline
+
+    with_guardrails = not args.without_guardrails
+    option = pipeline.OPTION_WITH_GUARDRAILS if with_guardrails else pipeline.OPTION_WITHOUT_GUARDRAILS
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    rss_start = rss_mb()
+    with quiet:
+        http_pool = None if args.without_http_pool else pipeline.load_http_pool(guardrails_dir / "config.yml")
+        rails = pipeline.load_guardrails(guardrails_dir) if with_guardrails else None
+        local_rails = pipeline.load_local_input_rails(rails, guardrails_dir) if rails else None
+        parallel_rails = pipeline.load_parallel_input_rails(rails, local_rails, guardrails_dir) if rails else None
+        response_cache = pipeline.load_response_cache(nat_config_path) if args.response_cache else None
+    if with_guardrails and rails is None:
+        raise SystemExit("❌ Could not load the guardrails config")
+    components = (rails, local_rails, parallel_rails, response_cache, nat_config_path)
+
+    # the first queries build the NAT workflow and warm the clients
+    with quiet:
+        await run_level(pipeline, components, corpus, 1, args.warmup, option, args.execution_mode)
+    rss_warm = rss_mb()
+
+    levels = []
+    for concurrency in args.concurrency:
+        with quiet:
+            level = await run_level(pipeline, components, corpus, concurrency, args.queries, option,
+                                    args.execution_mode)
+        levels.append(level)
+        print_level(level)
+
+    if response_cache is not None:
+        await response_cache.aclose()
+    if http_pool is not None:
+        await http_pool.aclose()
+    return {
+        "mode": {
+            "guardrails": with_guardrails,
+            "execution_mode": args.execution_mode or pipeline.EXECUTION_MODE,
+            "input_rails_mode": os.environ.get("INPUT_RAILS_MODE", "parallel"),
+            "response_cache": args.response_cache,
+            "http_pool": not args.without_http_pool,
+        },
+        "levels": levels,
+        "memory_mb": {"start": rss_start, "after_warmup": rss_warm, "end": rss_mb(),
+                      "growth_after_warmup": rss_mb() - rss_warm},
+    }
+
+
+# ------------------------------------------------------------------------------
+# reporting
+# ------------------------------------------------------------------------------
+def print_level(level):
+    outcomes = ", ".join(f"{count} {outcome}" for outcome, count in level["outcomes"].items() if count)
+    print(f"\n👥 {level['concurrency']} concurrent users: {level['queries']} queries in {level['wall_seconds']:.2f} s, "
+          f"{level['throughput_qps']:.2f} queries/s ({outcomes}), "
+          f"RSS {level['rss_mb_before']:.0f} → {level['rss_mb_after']:.0f} MB")
+    print(f"{'stage':<18} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for stage, latency in level["latency_seconds"].items():
+        print(f"{stage:<18} {latency['p50'] * 1000:>10.1f} {latency['p95'] * 1000:>10.1f} "
+              f"{latency['p99'] * 1000:>10.1f}")
+
+
+def compare(baseline_path, current_path, threshold):
+    """Print the change of every level between two result files, return the number of regressions."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    current = json.loads(Path(current_path).read_text())
+    print(f"Comparing {current_path} against {baseline_path}")
+    if baseline.get("mode") != current.get("mode") or baseline.get("settings", {}).get("stand_ins") != \
+            current.get("settings", {}).get("stand_ins"):
+        print("⚠️ The runs used different modes or stand-in settings")
+
+    regressions = 0
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in current["levels"]:
+        before = baseline_levels.get(level["concurrency"])
+        if before is None:
+            continue
+        print(f"\n👥 {level['concurrency']} concurrent users")
+        print(f"{'metric':<26} {'baseline':>10} {'current':>10} {'change':>8}")
+        rows = [("throughput (queries/s)", before["throughput_qps"], level["throughput_qps"], True)]
+        for stage, latency in level["latency_seconds"].items():
+            for quantile in ("p50", "p95", "p99"):
+                if stage in before["latency_seconds"]:
+                    rows.append((f"{stage} {quantile} (ms)", before["latency_seconds"][stage][quantile] * 1000,
+                                 latency[quantile] * 1000, False))
+        for name, old, new, higher_is_better in rows:
+            change = (new - old) / old * 100 if old else 0.0
+            regressed = (-change if higher_is_better else change) > threshold
+            regressions += regressed
+            print(f"{name:<26} {old:>10.1f} {new:>10.1f} {change:>+7.1f}%{' ❌' if regressed else ''}")
+    print(f"\nMemory growth after warm-up: {baseline['memory_mb']['growth_after_warmup']:.1f} MB → "
+          f"{current['memory_mb']['growth_after_warmup']:.1f} MB")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query pipeline against local stand-in backends")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH, help="JSONL file of prompts to replay")
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+                        default=[1, 4, 8], help="Comma-separated numbers of concurrent users")
+    parser.add_argument("--queries", type=int, default=48, help="Queries per concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="Queries run before measuring")
+    parser.add_argument("--without-guardrails", action="store_true", help="Run the pipeline without guardrails")
+    parser.add_argument("--execution-mode", choices=["sequential", "speculative"], default=None)
+    parser.add_argument("--without-http-pool", action="store_true",
+                        help="Let every model client open its own connections, as without the shared HTTP pool")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Enable the semantic response cache (repeated prompts become hits)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Time to first token of the main model")
+    parser.add_argument("--guard-latency-ms", type=float, default=80.0,
+                        help="Time to first token of the NeMoGuard models")
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0, help="Latency of an embeddings request")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Token rate of the model server")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="Tokens of a final answer")
+    parser.add_argument("--direct-answers", action="store_true", help="Answer without a web search step")
+    parser.add_argument("--search-latency-ms", type=float, default=400.0, help="Latency of the stand-in Tavily")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Result file (default: bench_pipeline_<timestamp>.json in the current directory)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), default=None,
+                        help="Compare two result files instead of running the benchmark")
+    parser.add_argument("--regression-threshold", type=float, default=10.0,
+                        help="Percent change of a latency or the throughput counted as a regression")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline output")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.regression_threshold)
+        if regressions:
+            print(f"\n❌ {regressions} regressions above {args.regression_threshold:.0f}%")
+            raise SystemExit(1)
+        print("\n✓ No regressions")
+        return
+
+    corpus = [json.loads(line) for line in args.corpus.read_text().splitlines() if line.strip()]
+    stand_ins = {
+        "llm_latency_ms": args.llm_latency_ms, "guard_latency_ms": args.guard_latency_ms,
+        "embed_latency_ms": args.embed_latency_ms, "tokens_per_second": args.tokens_per_second,
+        "answer_tokens": args.answer_tokens, "direct_answers": args.direct_answers,
+        "search_latency_ms": args.search_latency_ms,
+    }
+    model_server = ModelServer(
+        model_names(GUARDRAILS_TEMPLATE_DIR / "config.yml.brev", NAT_TEMPLATE_PATH),
+        args.llm_latency_ms / 1000, args.guard_latency_ms / 1000, args.embed_latency_ms / 1000,
+        args.tokens_per_second, args.answer_tokens, args.direct_answers,
+    )
+    search_server = SearchServer(args.search_latency_ms / 1000)
+    point_tavily_at(search_server.url)
+    os.environ.setdefault("NVIDIA_API_KEY", "nvapi-bench")
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as work_dir:
+        guardrails_dir, nat_config_path = generate_configs(Path(work_dir), model_server.url)
+        print(f"✓ Stand-in model server at {model_server.url}, Tavily at {search_server.url}")
+        print(f"✓ Replaying {len(corpus)} prompts from {args.corpus}")
+        try:
+            result = asyncio.run(run_benchmark(args, corpus, guardrails_dir, nat_config_path))
+        finally:
+            model_server.close()
+            search_server.close()
+
+    result.update({
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "settings": {"corpus": str(args.corpus), "queries": args.queries, "warmup": args.warmup,
+                     "stand_ins": stand_ins},
+        "backend_requests": {**model_server.requests, **search_server.requests},
+    })
+    output = args.output or Path(f"bench_pipeline_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.write_text(json.dumps(result, indent=2))
+    print(f"\nMemory growth after warm-up: {result['memory_mb']['growth_after_warmup']:.1f} MB")
+    print(f"Backend requests: {result['backend_requests']}")
+    print(f"✓ Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the request latency overhead of span export.
+
+Starts a local stand-in OTLP/HTTP receiver that answers every export after a fixed
+delay (a collector some network hops away) and simulates requests that each end a
+root span and a few child spans, like one prompt through guardrails and the NAT
+workflow. Each request is timed with:
+
+    none         no span processor (baseline)
+    development  synchronous export per span, what disable_batch=True does
+    production   the bounded batch processor from telemetry.py
+
+A second run against a receiver that is much slower than the request rate shows the
+production profile dropping spans instead of slowing requests down (the development
+profile is left out there, it would block for requests x spans x delay).
+
+Usage:
+    python app/benchmarks/bench_telemetry.py
+    python app/benchmarks/bench_telemetry.py --requests 200 --receiver-delay-ms 50
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter  # noqa: E402
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest  # noqa: E402
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+
+from telemetry import DroppingBatchSpanProcessor  # noqa: E402
+
+
+# ------------------------------------------------------------------------------
+# stand-in OTLP receiver
+# ------------------------------------------------------------------------------
+class Receiver:
+    """OTLP/HTTP trace receiver that counts spans and answers after ``delay`` seconds."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.spans = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                request = ExportTraceServiceRequest.FromString(body)
+                count = sum(len(scope.spans) for resource in request.resource_spans for scope in resource.scope_spans)
+                time.sleep(receiver.delay)
+                with receiver._lock:
+                    receiver.spans += count
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-protobuf")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ------------------------------------------------------------------------------
+# measurement
+# ------------------------------------------------------------------------------
+def make_processor(profile, endpoint, queue_size):
+    exporter = OTLPSpanExporter(endpoint=f"{endpoint}/v1/traces", timeout=10)
+    if profile == "development":
+        return SimpleSpanProcessor(exporter)
+    if profile == "production":
+        return DroppingBatchSpanProcessor(exporter, max_queue_size=queue_size, schedule_delay_millis=1000,
+                                          max_export_batch_size=min(512, queue_size), export_timeout_millis=10000)
+    return None
+
+
+def run(profile, endpoint, requests, spans_per_request, queue_size):
+    provider = TracerProvider()
+    processor = make_processor(profile, endpoint, queue_size)
+    if processor is not None:
+        provider.add_span_processor(processor)
+    tracer = provider.get_tracer("bench")
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        with tracer.start_as_current_span("prompt"):
+            for index in range(spans_per_request - 1):
+                with tracer.start_as_current_span(f"step-{index}"):
+                    pass
+        latencies.append(time.perf_counter() - start)
+
+    dropped = getattr(processor, "dropped_spans", 0)
+    provider.shutdown()
+    return latencies, dropped
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def report(title, endpoint_delay, args, profiles=("none", "development", "production")):
+    print(f"\n{title} (receiver delay {endpoint_delay * 1000:.0f} ms, "
+          f"{args.requests} requests x {args.spans_per_request} spans)")
+    print(f"{'profile':<12} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'received':>9} {'dropped':>8}")
+    for profile in profiles:
+        receiver = Receiver(endpoint_delay)
+        latencies, dropped = run(profile, receiver.endpoint, args.requests, args.spans_per_request, args.queue_size)
+        receiver.close()
+        print(f"{profile:<12} {percentile(latencies, 50) * 1000:>9.3f} {percentile(latencies, 95) * 1000:>9.3f} "
+              f"{percentile(latencies, 99) * 1000:>9.3f} {receiver.spans:>9} {dropped:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark synchronous vs batched span export")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--spans-per-request", type=int, default=8)
+    parser.add_argument("--receiver-delay-ms", type=float, default=5.0,
+                        help="Delay of the stand-in receiver per export request")
+    parser.add_argument("--slow-receiver-delay-ms", type=float, default=3000.0,
+                        help="Delay of the receiver in the slow collector run")
+    parser.add_argument("--queue-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    report("Collector keeping up", args.receiver_delay_ms / 1000, args)
+    # a queue smaller than the burst shows the drops while the collector is stuck
+    slow_args = argparse.Namespace(**{**vars(args), "queue_size": min(args.queue_size, args.requests)})
+    # synchronous export would take requests x spans x delay here, it is left out
+    report("Slow collector", args.slow_receiver_delay_ms / 1000, slow_args, profiles=("none", "production"))
+
+
+if __name__ == "__main__":
+    main()
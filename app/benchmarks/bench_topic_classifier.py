@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency benchmark of the embedding topic classifier.
+
+Embeds the labelled prompts in data/topic_prompts.jsonl with the nv-embedqa-e5-v5
+embedder of the NAT workflow config and runs them through the classifier of
+guardrails_config/topic_classifier.py, counting the correct, wrong and uncertain
+predictions. on_topic and off_topic predictions are decided without the topic control
+model, only uncertain prompts are sent to it. The keyword check check_input_topic is
+scored on the same prompts for comparison.
+
+The embedding round trip and the local classification are timed separately, and the
+predictions are repeated for a grid of TOPIC_CLASSIFIER_MIN_SIMILARITY and
+TOPIC_CLASSIFIER_MIN_MARGIN values to calibrate them: pick the setting without wrong
+predictions that sends the fewest prompts to the model.
+
+Exits with an error if a prompt gets the wrong label with the configured thresholds
+(an off-topic prompt would skip the topic control model, an on-topic one would be
+refused) or the p99 latency of the local classification is above the budget.
+
+Usage:
+    python app/benchmarks/bench_topic_classifier.py
+    python app/benchmarks/bench_topic_classifier.py --budget-ms 5 --repeat 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+sys.path.insert(0, str(APP_DIR / "guardrails_config"))
+
+from matchers import GUARDRAIL_MATCHER  # noqa: E402
+from prompt_embedder import PromptEmbedder  # noqa: E402
+from topic_classifier import OFF_TOPIC, ON_TOPIC, TOPIC_CLASSIFIER, UNCERTAIN, EmbeddingTopicClassifier  # noqa: E402
+
+CORPUS_PATH = Path(__file__).resolve().parent / "data" / "topic_prompts.jsonl"
+NAT_CONFIG_PATH = APP_DIR / "src" / "nat_simple_web_query" / "configs" / "config.yml"
+MIN_SIMILARITIES = (0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6)
+MIN_MARGINS = (0.0, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2)
+
+
+def keyword_label(prompt):
+    hits = GUARDRAIL_MATCHER.scan(prompt.lower(), ("topic", "off_topic"))
+    return OFF_TOPIC if "topic" not in hits and "off_topic" in hits else ON_TOPIC
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def score(classifier, entries, prompt_vectors, example_vectors):
+    """Return the counts of correct, wrong and uncertain predictions."""
+    counts = {"correct": 0, "wrong": 0, "uncertain": 0}
+    for entry, vector in zip(entries, prompt_vectors):
+        label = classifier.classify_vector(vector, example_vectors).label
+        if label == UNCERTAIN:
+            counts["uncertain"] += 1
+        else:
+            counts["correct" if label == entry["expected"] else "wrong"] += 1
+    return counts
+
+
+async def embed_corpus(embedder, entries):
+    """Return the prompt embeddings and the seconds each embedding request took."""
+    vectors, latencies = [], []
+    for entry in entries:
+        start = time.perf_counter()
+        vectors.append(await embedder.embed(entry["prompt"]))
+        latencies.append(time.perf_counter() - start)
+    return vectors, latencies
+
+
+async def run(args):
+    entries = [json.loads(line) for line in CORPUS_PATH.read_text().splitlines()]
+    embedder = PromptEmbedder(args.nat_config)
+    TOPIC_CLASSIFIER.bind(embedder)
+    try:
+        start = time.perf_counter()
+        example_vectors = await TOPIC_CLASSIFIER.example_vectors()
+        print(f"✓ {len(example_vectors)} topic examples embedded in {time.perf_counter() - start:.2f}s")
+        prompt_vectors, embed_latencies = await embed_corpus(embedder, entries)
+    finally:
+        await embedder.aclose()
+
+    counts = {"correct": 0, "wrong": 0, "uncertain": 0}
+    keyword_correct = 0
+    for entry, vector in zip(entries, prompt_vectors):
+        prediction = TOPIC_CLASSIFIER.classify_vector(vector, example_vectors)
+        if prediction.label == UNCERTAIN:
+            counts["uncertain"] += 1
+        elif prediction.label == entry["expected"]:
+            counts["correct"] += 1
+        else:
+            counts["wrong"] += 1
+            print(f"❌ '{entry['prompt']}': expected {entry['expected']}, "
+                  f"got {prediction.label} ({prediction.group}, margin {prediction.confidence:.3f})")
+        keyword_correct += keyword_label(entry["prompt"]) == entry["expected"]
+    print(f"✓ classifier (min similarity {TOPIC_CLASSIFIER.min_similarity}, min margin "
+          f"{TOPIC_CLASSIFIER.min_margin}): {counts['correct']} correct, {counts['wrong']} wrong, "
+          f"{counts['uncertain']} uncertain of {len(entries)}; "
+          f"{counts['uncertain']} sent to the topic control model")
+    print(f"  keyword check: {keyword_correct}/{len(entries)} correct")
+
+    print(f"\n{'min similarity':>14} {'min margin':>10} {'correct':>8} {'wrong':>6} {'uncertain':>10}")
+    for min_similarity in MIN_SIMILARITIES:
+        for min_margin in MIN_MARGINS:
+            classifier = EmbeddingTopicClassifier(min_similarity=min_similarity, min_margin=min_margin)
+            sweep = score(classifier, entries, prompt_vectors, example_vectors)
+            print(f"{min_similarity:>14.3f} {min_margin:>10.3f} {sweep['correct']:>8} {sweep['wrong']:>6} "
+                  f"{sweep['uncertain']:>10}")
+
+    latencies = []
+    for _ in range(args.repeat):
+        for vector in prompt_vectors:
+            start = time.perf_counter()
+            TOPIC_CLASSIFIER.classify_vector(vector, example_vectors)
+            latencies.append(time.perf_counter() - start)
+    p99 = percentile(latencies, 99) * 1000
+    print(f"\n{'stage':<16} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    print(f"{'embedding':<16} {percentile(embed_latencies, 50) * 1000:>9.3f} "
+          f"{percentile(embed_latencies, 95) * 1000:>9.3f} {percentile(embed_latencies, 99) * 1000:>9.3f}")
+    print(f"{'classification':<16} {percentile(latencies, 50) * 1000:>9.3f} "
+          f"{percentile(latencies, 95) * 1000:>9.3f} {p99:>9.3f}")
+
+    return counts["wrong"] == 0 and p99 <= args.budget_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check, calibrate and benchmark the embedding topic classifier")
+    parser.add_argument("--nat-config", type=Path, default=NAT_CONFIG_PATH,
+                        help="NAT workflow config with the nv-embedqa-e5-v5 embedder")
+    parser.add_argument("--repeat", type=int, default=100, help="Timed classifications per prompt")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="Allowed p99 latency of the local classification")
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
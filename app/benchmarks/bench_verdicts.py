@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Regression corpus and microbenchmark for the guardrails verdicts.
+
+Runs the allowed and blocked guardrails responses in data/guardrail_verdicts.jsonl
+through rail_verdicts.rails_verdict() and exits with an error if any of them is
+classified wrongly. Each entry has the rails kind, the response text, the activated
+rails log (or null for a response without log) and the expected verdict.
+
+For comparison, the phrase scan the pipeline used before (lower-casing the response
+and searching it for refusal phrases) is run over the same corpus and timed.
+
+Usage:
+    python app/benchmarks/bench_verdicts.py
+    python app/benchmarks/bench_verdicts.py --number 50000
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from rail_verdicts import load_refusal_messages, rails_verdict  # noqa: E402
+
+CORPUS_PATH = Path(__file__).resolve().parent / "data" / "guardrail_verdicts.jsonl"
+FLOWS_PATH = APP_DIR / "guardrails_config" / "flows.co"
+
+LEGACY_PHRASES = {
+    "input": ["i'm sorry", "i can't", "i cannot", "please ask", "i can only"],
+    "output": ["i can only", "please ask questions", "i'm sorry", "i cannot"],
+}
+
+
+def legacy_is_blocked(rails, content):
+    return any(phrase in content.lower() for phrase in LEGACY_PHRASES[rails])
+
+
+def load_corpus():
+    entries = []
+    for line in CORPUS_PATH.read_text().splitlines():
+        entry = json.loads(line)
+        log = None
+        if entry["activated_rails"] is not None:
+            log = SimpleNamespace(activated_rails=[SimpleNamespace(**rail) for rail in entry["activated_rails"]])
+        entry["response"] = SimpleNamespace(response=[{"role": "assistant", "content": entry["content"]}], log=log)
+        entries.append(entry)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the guardrails verdicts")
+    parser.add_argument("--number", type=int, default=20000, help="Iterations over the corpus per measurement")
+    args = parser.parse_args()
+
+    refusal_messages = load_refusal_messages(FLOWS_PATH)
+    entries = load_corpus()
+
+    failures = 0
+    legacy_failures = 0
+    for entry in entries:
+        expected = entry["expected"] == "blocked"
+        is_blocked, _, _ = rails_verdict(entry["response"], entry["rails"], refusal_messages)
+        if is_blocked != expected:
+            failures += 1
+            print(f"❌ {entry['rails']}: expected {entry['expected']} for '{entry['note']}'")
+        if legacy_is_blocked(entry["rails"], entry["content"]) != expected:
+            legacy_failures += 1
+    print(f"✓ {len(entries) - failures}/{len(entries)} verdicts correct "
+          f"(phrase scan: {len(entries) - legacy_failures}/{len(entries)})")
+
+    verdicts = min(timeit.repeat(
+        lambda: [rails_verdict(entry["response"], entry["rails"], refusal_messages) for entry in entries],
+        number=args.number // len(entries), repeat=3))
+    legacy = min(timeit.repeat(
+        lambda: [legacy_is_blocked(entry["rails"], entry["content"]) for entry in entries],
+        number=args.number // len(entries), repeat=3))
+    per_response = args.number // len(entries) * len(entries)
+    print(f"\n{'classifier':<14} {'µs / response':>14}")
+    print(f"{'phrase scan':<14} {legacy / per_response * 1e6:>14.2f}")
+    print(f"{'verdict':<14} {verdicts / per_response * 1e6:>14.2f}")
+
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
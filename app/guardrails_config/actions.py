@@ -1,8 +1,17 @@
 """Custom actions for NeMo Guardrails."""
 
-import re
+import os
+import sys
 from typing import Optional
 
+# NeMo Guardrails loads this file by path, so make the sibling modules importable
+GUARDRAILS_DIR = os.path.dirname(os.path.abspath(__file__))
+if GUARDRAILS_DIR not in sys.path:
+    sys.path.insert(0, GUARDRAILS_DIR)
+
+from matchers import GUARDRAIL_MATCHER
+from topic_classifier import TOPIC_CLASSIFIER, UNCERTAIN
+
 
 def check_jailbreak(context: Optional[dict] = None) -> bool:
     """Check if user input contains jailbreak attempts.
@@ -21,29 +30,7 @@ def check_jailbreak(context: Optional[dict] = None) -> bool:
     if not user_input:
         return False
     
-    user_input = user_input.lower()
-    
-    # Define jailbreak patterns
-    jailbreak_patterns = [
-        r"ignore\s+(all\s+)?(previous|prior|above)\s+instructions?",
-        r"disregard\s+(all\s+)?(previous|prior|above)",
-        r"forget\s+(all\s+)?(previous|prior|above)",
-        r"pretend\s+(you\s+are|to\s+be)",
-        r"roleplay\s+as",
-        r"act\s+as\s+(if\s+)?you",
-        r"simulate\s+(being|that\s+you)",
-        r"jailbreak",
-        r"DAN\s+mode",
-        r"developer\s+mode",
-        r"bypass\s+(your\s+)?(safety|guidelines|rules|restrictions)",
-        r"override\s+(your\s+)?(safety|guidelines|rules|restrictions)",
-    ]
-    
-    for pattern in jailbreak_patterns:
-        if re.search(pattern, user_input, re.IGNORECASE):
-            return True
-    
-    return False
+    return GUARDRAIL_MATCHER.matches("jailbreak", user_input.lower())
 
 
 def check_blocked_terms(context: Optional[dict] = None) -> bool:
@@ -63,47 +50,7 @@ def check_blocked_terms(context: Optional[dict] = None) -> bool:
     bot_text = context.get("bot_message", "") or context.get("last_bot_message", "") or ""
     text = (user_text + " " + bot_text).lower()
     
-    # Define blocked term categories - harmful/dangerous content
-    blocked_terms = [
-        # Cybersecurity threats
-        "hack",
-        "exploit",
-        "bypass",
-        "malware",
-        "virus",
-        # Weapons and violence
-        "bomb",
-        "explosive",
-        "weapon",
-        "gun",
-        "ammunition",
-        "grenade",
-        "missile",
-        # Violence and harm
-        "kill",
-        "murder",
-        "assassinate",
-        "torture",
-        "poison",
-        "suicide",
-        # Illegal activities
-        "illegal",
-        "smuggle",
-        "counterfeit",
-        "fraud",
-        "scam",
-        # Drugs
-        "cocaine",
-        "heroin",
-        "methamphetamine",
-        "fentanyl",
-    ]
-    
-    for term in blocked_terms:
-        if term in text:
-            return True
-    
-    return False
+    return GUARDRAIL_MATCHER.matches("blocked_terms", text)
 
 
 def check_input_length(context: Optional[dict] = None) -> bool:
@@ -142,44 +89,7 @@ def check_politics(context: Optional[dict] = None) -> bool:
     if not user_input:
         return False
     
-    user_input = user_input.lower()
-    
-    # Political terms and figures to block
-    political_terms = [
-        # US Political figures
-        "trump",
-        "donald trump",
-        "biden",
-        "joe biden",
-        "obama",
-        "clinton",
-        "hillary",
-        # Political parties
-        "republican",
-        "democrat",
-        "gop",
-        "maga",
-        # Political topics
-        "politics",
-        "political",
-        "election",
-        "vote",
-        "voting",
-        "congress",
-        "senate",
-        "president",
-        "presidential",
-        "white house",
-        "capitol",
-        "impeach",
-    ]
-    
-    # Check for blocked political terms
-    for term in political_terms:
-        if term in user_input:
-            return True
-    
-    return False
+    return GUARDRAIL_MATCHER.matches("politics", user_input.lower())
 
 
 def check_input_topic(context: Optional[dict] = None) -> bool:
@@ -198,51 +108,30 @@ def check_input_topic(context: Optional[dict] = None) -> bool:
     if not user_input:
         return False
     
-    user_input = user_input.lower()
+    hits = GUARDRAIL_MATCHER.scan(user_input.lower(), ("topic", "off_topic"))
     
-    # Keywords that indicate the question is on topic
-    topic_keywords = [
-        "dynatrace",
-        "observability",
-        "monitoring",
-        "apm",
-        "application performance",
-        "tracing",
-        "logs",
-        "metrics",
-        "oneagent",
-        "activegate",
-        "davis",
-        "rum",
-        "synthetic",
-        "infrastructure",
-        "kubernetes",
-        "opentelemetry",
-        "grail",
-    ]
-    
-    # If any topic keyword is in the input, it's on-topic
-    if any(keyword in user_input for keyword in topic_keywords):
-        return False  # Not off-topic
+    # If any topic keyword is in the input, it's on-topic. Otherwise only
+    # block clearly off-topic input and default to allowing it.
+    return "topic" not in hits and "off_topic" in hits
+
+
+async def classify_input_topic(context: Optional[dict] = None) -> str:
+    """Classify the topic of user input with the embedding topic classifier.
     
-    # Check for clearly off-topic patterns
-    off_topic_patterns = [
-        r"\b(weather|temperature|forecast)\b",
-        r"\b(cook|recipe|food|restaurant)\b",
-        r"\b(sports|game|match|score)\b",
-        r"\b(movie|film|actor|actress)\b",
-        r"\b(music|song|album|artist)\b",
-        r"\b(news|politics|election)\b",
-        r"\b(car|vehicle|drive|engine)\b",
-        r"\b(health|medical|doctor|medicine)\b",
-    ]
+    Args:
+        context: Context dictionary containing user_input
+        
+    Returns:
+        "on_topic", "off_topic", or "uncertain"; only "uncertain" asks the topic control model
+    """
+    if not context:
+        return UNCERTAIN
     
-    for pattern in off_topic_patterns:
-        if re.search(pattern, user_input, re.IGNORECASE):
-            return True  # Off-topic detected
+    user_input = context.get("user_message", "") or context.get("last_user_message", "")
+    if not user_input:
+        return UNCERTAIN
     
-    # Default to allowing if not clearly off-topic
-    return False
+    return (await TOPIC_CLASSIFIER.classify(user_input)).label
 
 
 def check_output_relevance(context: Optional[dict] = None) -> bool:
@@ -262,32 +151,5 @@ def check_output_relevance(context: Optional[dict] = None) -> bool:
     if not bot_response:
         return False
         
-    bot_response = bot_response.lower()
-    
-    # Keywords that indicate relevance on topic
-    relevant_keywords = [
-        "dynatrace",
-        "observability",
-        "monitoring",
-        "apm",
-        "tracing",
-        "logs",
-        "metrics",
-        "oneagent",
-        "activegate",
-        "davis",
-        "kubernetes",
-        "opentelemetry",
-        "observability",
-        "debugging",
-        "evaluation",
-        "llm",
-        "agent",
-    ]
-    
-    # Check if any relevant keyword is in the response
-    has_relevant_content = any(keyword in bot_response for keyword in relevant_keywords)
-    
     # If no relevant content found, it's likely off-topic
-    return not has_relevant_content
-
+    return not GUARDRAIL_MATCHER.matches("relevance", bot_response.lower())
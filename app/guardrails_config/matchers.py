@@ -0,0 +1,247 @@
+"""Precompiled keyword and pattern matchers for the custom guardrail actions.
+
+All term lists are compiled once, at import. Keyword categories are compiled into
+prefix-trie regexes and share one combined regex, so a single pass over the text
+reports every keyword category that is hit. Pattern categories are compiled into one
+alternation regex per category.
+
+The actions lower-case their text, so everything here is lower-case and compiled
+without ``re.IGNORECASE``, which is what makes ``re`` slow on long inputs.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+# Jailbreak attempts (lower-case, matched against lower-cased text)
+JAILBREAK_PATTERNS = [
+    r"ignore\s+(all\s+)?(previous|prior|above)\s+instructions?",
+    r"disregard\s+(all\s+)?(previous|prior|above)",
+    r"forget\s+(all\s+)?(previous|prior|above)",
+    r"pretend\s+(you\s+are|to\s+be)",
+    r"roleplay\s+as",
+    r"act\s+as\s+(if\s+)?you",
+    r"simulate\s+(being|that\s+you)",
+    r"jailbreak",
+    r"dan\s+mode",
+    r"developer\s+mode",
+    r"bypass\s+(your\s+)?(safety|guidelines|rules|restrictions)",
+    r"override\s+(your\s+)?(safety|guidelines|rules|restrictions)",
+]
+
+# Blocked term categories - harmful/dangerous content
+BLOCKED_TERMS = [
+    # Cybersecurity threats
+    "hack",
+    "exploit",
+    "bypass",
+    "malware",
+    "virus",
+    # Weapons and violence
+    "bomb",
+    "explosive",
+    "weapon",
+    "gun",
+    "ammunition",
+    "grenade",
+    "missile",
+    # Violence and harm
+    "kill",
+    "murder",
+    "assassinate",
+    "torture",
+    "poison",
+    "suicide",
+    # Illegal activities
+    "illegal",
+    "smuggle",
+    "counterfeit",
+    "fraud",
+    "scam",
+    # Drugs
+    "cocaine",
+    "heroin",
+    "methamphetamine",
+    "fentanyl",
+]
+
+# Political terms and figures to block
+POLITICAL_TERMS = [
+    # US Political figures
+    "trump",
+    "donald trump",
+    "biden",
+    "joe biden",
+    "obama",
+    "clinton",
+    "hillary",
+    # Political parties
+    "republican",
+    "democrat",
+    "gop",
+    "maga",
+    # Political topics
+    "politics",
+    "political",
+    "election",
+    "vote",
+    "voting",
+    "congress",
+    "senate",
+    "president",
+    "presidential",
+    "white house",
+    "capitol",
+    "impeach",
+]
+
+# Keywords that indicate the question is on topic
+TOPIC_KEYWORDS = [
+    "dynatrace",
+    "observability",
+    "monitoring",
+    "apm",
+    "application performance",
+    "tracing",
+    "logs",
+    "metrics",
+    "oneagent",
+    "activegate",
+    "davis",
+    "rum",
+    "synthetic",
+    "infrastructure",
+    "kubernetes",
+    "opentelemetry",
+    "grail",
+]
+
+# Clearly off-topic questions
+OFF_TOPIC_PATTERNS = [
+    r"\b(weather|temperature|forecast)\b",
+    r"\b(cook|recipe|food|restaurant)\b",
+    r"\b(sports|game|match|score)\b",
+    r"\b(movie|film|actor|actress)\b",
+    r"\b(music|song|album|artist)\b",
+    r"\b(news|politics|election)\b",
+    r"\b(car|vehicle|drive|engine)\b",
+    r"\b(health|medical|doctor|medicine)\b",
+]
+
+# Keywords that indicate a bot response is relevant on topic
+RELEVANT_KEYWORDS = [
+    "dynatrace",
+    "observability",
+    "monitoring",
+    "apm",
+    "tracing",
+    "logs",
+    "metrics",
+    "oneagent",
+    "activegate",
+    "davis",
+    "kubernetes",
+    "opentelemetry",
+    "debugging",
+    "evaluation",
+    "llm",
+    "agent",
+]
+
+
+class GuardrailMatcher:
+    """Match text against named keyword and pattern categories.
+
+    Keyword categories are substring checks, like ``term in text``. Both keywords
+    and patterns are matched case-sensitively, so callers pass lower-cased text.
+    """
+
+    def __init__(self, keyword_categories: Dict[str, Iterable[str]], pattern_categories: Dict[str, Iterable[str]]):
+        categories_by_term: Dict[str, set] = {}
+        for category, terms in keyword_categories.items():
+            for term in terms:
+                categories_by_term.setdefault(term, set()).add(category)
+
+        # At any position the alternation below matches the longest term, and every
+        # shorter term matching at the same position is a prefix of it. Folding the
+        # categories of those prefixes into each term keeps overlapping hits of
+        # different categories visible in a single pass.
+        self._categories_by_term = {
+            term: frozenset().union(*(categories_by_term[prefix] for prefix in categories_by_term if term.startswith(prefix)))
+            for term in categories_by_term
+        }
+        self._keywords_re = re.compile("(?=(" + _trie_pattern(categories_by_term) + "))")
+
+        self._category_res = {
+            category: re.compile(_trie_pattern(terms)) for category, terms in keyword_categories.items()
+        }
+        self._pattern_categories = []
+        for category, patterns in pattern_categories.items():
+            compiled = re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+            self._category_res[category] = compiled
+            self._pattern_categories.append(category)
+        self._keyword_categories = frozenset(keyword_categories)
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._category_res)
+
+    def matches(self, category: str, text: str) -> bool:
+        """Return True if ``text`` hits ``category``, stopping at the first hit."""
+        return self._category_res[category].search(text) is not None
+
+    def scan(self, text: str, categories: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+        """Return every category hit by ``text``.
+
+        All keyword categories are found in one pass over the text, pattern
+        categories take one pass each.
+        """
+        wanted = frozenset(categories) if categories is not None else None
+        hits = set()
+        if wanted is None or wanted & self._keyword_categories:
+            for match in self._keywords_re.finditer(text):
+                hits |= self._categories_by_term[match.group(1)]
+        for category in self._pattern_categories:
+            if (wanted is None or category in wanted) and self._category_res[category].search(text):
+                hits.add(category)
+        return frozenset(hits if wanted is None else hits & wanted)
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Build a regex matching any of ``terms``, factored by common prefixes.
+
+    A flat ``a|b|c`` alternation makes ``re`` try every term at every position; the
+    trie only follows branches whose prefix matched. Longer terms are preferred, so
+    the match at a position is always the longest term starting there.
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # the term ending here is shorter than the branches, so it comes last
+            pattern = f"(?:{pattern})?"
+        return pattern
+
+    return build(trie)
+
+
+GUARDRAIL_MATCHER = GuardrailMatcher(
+    keyword_categories={
+        "blocked_terms": BLOCKED_TERMS,
+        "politics": POLITICAL_TERMS,
+        "topic": TOPIC_KEYWORDS,
+        "relevance": RELEVANT_KEYWORDS,
+    },
+    pattern_categories={
+        "jailbreak": JAILBREAK_PATTERNS,
+        "off_topic": OFF_TOPIC_PATTERNS,
+    },
+)
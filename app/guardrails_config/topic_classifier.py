@@ -0,0 +1,231 @@
+"""Embedding-similarity topic classifier for the guardrails topic control.
+
+Prompts are embedded with the ``nv-embedqa-e5-v5`` embedder of the NAT workflow config
+(the ``PromptEmbedder`` of prompt_embedder.py, shared with the response cache and bound
+by ``pipeline.load_guardrails``) and compared with the example prompts of the topic
+groups below. A prompt gets the label of its most similar example, but only when that
+example is similar enough and clearly more similar than the best example of the other
+label; otherwise the prediction is ``uncertain``:
+
+    on_topic    passes without asking the topic control model
+    off_topic   is refused without asking the topic control model
+    uncertain   is left to the NeMoGuard Topic Control model
+
+A prompt without text, a classifier without embedder and a failed embedding request
+are ``uncertain`` too, so the model decides and the check never fails open.
+
+The examples are embedded on first use. With TOPIC_CLASSIFIER_CACHE_DIR set their
+embeddings are cached in that directory, keyed by a hash of the examples and the
+embedder name, so editing the examples embeds them again. Once the prompt is embedded
+(one request, shared with the response cache lookup), a classification is a single
+matrix-vector product.
+"""
+
+# environment variables used:
+# - TOPIC_CLASSIFIER_CACHE_DIR: directory of the cached example embeddings (default: none, kept in memory)
+# - TOPIC_CLASSIFIER_MIN_SIMILARITY: similarity to the closest example below which a prompt is uncertain (default: 0.45)
+# - TOPIC_CLASSIFIER_MIN_MARGIN: lead of the closest example over the best one of the other label below which a prompt is uncertain (default: 0.1)
+
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+ON_TOPIC = "on_topic"
+OFF_TOPIC = "off_topic"
+UNCERTAIN = "uncertain"
+
+MIN_SIMILARITY = float(os.environ.get("TOPIC_CLASSIFIER_MIN_SIMILARITY", "0.45"))
+MIN_MARGIN = float(os.environ.get("TOPIC_CLASSIFIER_MIN_MARGIN", "0.1"))
+
+# topic group -> (allowed, example prompts)
+TOPIC_EXAMPLES: Dict[str, Tuple[bool, List[str]]] = {
+    "observability": (True, [
+        "How does Dynatrace help an SRE find the root cause of an outage?",
+        "What is the difference between logs, metrics and traces?",
+        "How do I monitor Kubernetes workloads with OneAgent?",
+        "Explain distributed tracing with OpenTelemetry",
+        "What does Davis AI do in Dynatrace?",
+        "How can I set up alerting on service response time?",
+        "What is application performance monitoring?",
+        "How do I query logs in Grail with DQL?",
+        "Which metrics should I watch for a slow database?",
+        "How does real user monitoring work?",
+        "What is an ActiveGate used for?",
+        "How do synthetic monitors check my website availability?",
+    ]),
+    "ai_agents": (True, [
+        "How do I observe an LLM agent in production?",
+        "What is the NVIDIA NeMo Agent Toolkit?",
+        "How do NeMo Guardrails block jailbreak prompts?",
+        "How can I trace token usage and latency of LLM calls?",
+        "What is a ReAct agent and how does it use tools?",
+        "How do I evaluate the answers of a RAG pipeline?",
+        "What are NVIDIA NIM microservices?",
+        "How do I reduce hallucinations of a language model?",
+        "Which GPU metrics matter for LLM inference?",
+        "How do embeddings and vector search work?",
+    ]),
+    "technology": (True, [
+        "How do I write a Python function that retries on errors?",
+        "What is the difference between TCP and UDP?",
+        "How do containers differ from virtual machines?",
+        "Explain how a CI/CD pipeline works",
+        "What is the latest version of Kubernetes?",
+        "How does a load balancer distribute traffic?",
+        "What is a REST API?",
+        "How do I debug a memory leak in a Java service?",
+        "What are the main cloud providers and their services?",
+        "How does HTTPS encryption work?",
+    ]),
+    "general_knowledge": (True, [
+        "What is the capital of Australia?",
+        "Who invented the telephone?",
+        "How far is the moon from the earth?",
+        "What is photosynthesis?",
+        "When was the first computer built?",
+        "What is the population of Tokyo?",
+        "What is today's date?",
+        "Hello, how are you today?",
+        "Thanks, that was helpful!",
+        "Can you summarize the history of the internet?",
+    ]),
+    "weather": (False, [
+        "What is the weather forecast for tomorrow?",
+        "Will it rain this weekend in Paris?",
+        "What is the temperature outside right now?",
+        "Is there a storm coming to Florida?",
+    ]),
+    "food": (False, [
+        "Give me a recipe for chocolate cake",
+        "What should I cook for dinner tonight?",
+        "Which restaurant serves the best sushi near me?",
+        "How long do I boil an egg?",
+    ]),
+    "sports": (False, [
+        "Who won the football match last night?",
+        "What was the score of the basketball game?",
+        "When is the next Formula 1 race?",
+        "Which team is leading the league this season?",
+    ]),
+    "entertainment": (False, [
+        "Recommend a good movie to watch tonight",
+        "Who is the actor in the new Batman film?",
+        "What is the best song of the year?",
+        "When does the singer release her new album?",
+    ]),
+    "politics": (False, [
+        "Who should I vote for in the next election?",
+        "What do you think about the president?",
+        "Which political party is better, Republicans or Democrats?",
+        "What is your opinion on the new tax legislation in Congress?",
+    ]),
+    "health": (False, [
+        "What medicine should I take for a headache?",
+        "Do I need to see a doctor for back pain?",
+        "What are the symptoms of the flu?",
+        "How can I lose weight quickly?",
+    ]),
+    "vehicles": (False, [
+        "Which car should I buy for my family?",
+        "How often should I change the engine oil?",
+        "What is the best electric vehicle to drive?",
+        "Why does my car make a noise when braking?",
+    ]),
+}
+
+class TopicPrediction(NamedTuple):
+    label: str
+    confidence: float
+    group: str
+
+
+class EmbeddingTopicClassifier:
+    """Nearest-example classifier over the topic groups of ``TOPIC_EXAMPLES``.
+
+    ``embedder`` has an async ``embed(text)`` returning a unit-length vector, an async
+    ``embed_texts(texts)`` returning them as matrix rows, and an ``embedder_name``.
+    """
+
+    def __init__(self, examples=TOPIC_EXAMPLES, min_similarity=MIN_SIMILARITY, min_margin=MIN_MARGIN,
+                 cache_dir=None, embedder=None):
+        self.examples = examples
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.cache_dir = cache_dir
+        self.embedder = embedder
+        # one row per example prompt, with its group and label
+        self.groups = [group for group, (_, texts) in examples.items() for _ in texts]
+        self.allowed = np.array([examples[group][0] for group in self.groups])
+        self._vectors = None
+        self._vectors_lock = None
+
+    def bind(self, embedder):
+        """Embed the prompts and examples with ``embedder`` from now on."""
+        self.embedder = embedder
+        self._vectors = None
+
+    def _cache_path(self):
+        if not self.cache_dir:
+            return None
+        settings = [self.examples, self.embedder.embedder_name]
+        key = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:32]
+        return Path(self.cache_dir).expanduser() / f"topic-examples-{key}.npy"
+
+    async def example_vectors(self):
+        """Return the embeddings of the example prompts, embedding them on the first call."""
+        if self._vectors is not None:
+            return self._vectors
+        if self._vectors_lock is None:
+            self._vectors_lock = asyncio.Lock()
+        async with self._vectors_lock:
+            if self._vectors is None:
+                cache_path = self._cache_path()
+                vectors = None
+                if cache_path is not None and cache_path.exists():
+                    try:
+                        vectors = np.load(cache_path)
+                    except (OSError, ValueError):
+                        vectors = None
+                if vectors is None or len(vectors) != len(self.groups):
+                    texts = [text for _, texts in self.examples.values() for text in texts]
+                    vectors = (await self.embedder.embed_texts(texts)).astype(np.float32)
+                    if cache_path is not None:
+                        cache_path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp = cache_path.with_name(f".{os.getpid()}.tmp.{cache_path.name}")
+                        np.save(tmp, vectors, allow_pickle=False)
+                        os.replace(tmp, cache_path)
+                self._vectors = vectors
+        return self._vectors
+
+    def classify_vector(self, vector, example_vectors) -> TopicPrediction:
+        """Return the topic label of a unit-length prompt embedding, with the similarity margin as confidence."""
+        similarities = example_vectors @ vector
+        best = int(np.argmax(similarities))
+        other = similarities[self.allowed != self.allowed[best]]
+        margin = float(similarities[best] - (other.max() if other.size else 0.0))
+        label = ON_TOPIC if self.allowed[best] else OFF_TOPIC
+        if similarities[best] < self.min_similarity or margin < self.min_margin:
+            label = UNCERTAIN
+        return TopicPrediction(label, margin, self.groups[best])
+
+    async def classify(self, text: str) -> TopicPrediction:
+        """Return the topic label of ``text``; ``uncertain`` if it cannot be embedded."""
+        if not text or not text.strip() or self.embedder is None:
+            return TopicPrediction(UNCERTAIN, 0.0, "")
+        try:
+            example_vectors = await self.example_vectors()
+            vector = await self.embedder.embed(text)
+        except Exception as e:
+            print(f"⚠️ Topic classifier could not embed the prompt, leaving it to the model: {e}")
+            return TopicPrediction(UNCERTAIN, 0.0, "")
+        return self.classify_vector(vector, example_vectors)
+
+
+# bound to the prompt embedder by pipeline.load_guardrails(); nothing is written to
+# disk unless a cache directory is configured
+TOPIC_CLASSIFIER = EmbeddingTopicClassifier(cache_dir=os.environ.get("TOPIC_CLASSIFIER_CACHE_DIR") or None)
@@ -0,0 +1,206 @@
+"""Shared, pooled HTTP connections of the NVIDIA AI endpoint clients.
+
+The NIM clients of the guardrails models, the NAT LLM and the embedders
+(langchain_nvidia_ai_endpoints) open a new aiohttp session with its own connector for
+every request and close it afterwards, so every model call pays a new TCP (and TLS)
+handshake. ``HttpPool`` replaces their session factories with sessions on one
+long-lived connector per endpoint and event loop:
+
+- keep-alive: idle connections stay open for ``keepalive_seconds`` and are reused
+- per-endpoint limit: at most ``max_connections_per_host`` requests run against an
+  endpoint at once, further requests wait for a free connection
+- the few synchronous calls (model listing) share one requests.Session per endpoint
+
+The settings come from the ``http_pool`` section of the guardrails config.yml written
+by update_config.py. Per-endpoint limits are keyed by the endpoint URL; the brev
+template uses the NVIDIA_MODEL_ENDPOINT_800x placeholders, so they follow the endpoints.
+
+The clients speak HTTP/1.1 through aiohttp, which has no HTTP/2 support; one request
+runs per connection, so the connection limit is also the concurrency limit.
+
+Metrics, with the endpoint in ``server.address``:
+
+    http_pool.connections.in_use   connections serving a request
+    http_pool.connections.idle     kept-alive connections waiting for the next request
+    http_pool.connections.created  connections opened
+    http_pool.connections.reused   requests sent on a kept-alive connection
+    http_pool.wait.duration        time (ms) a request waited for a free connection
+"""
+
+import asyncio
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from opentelemetry import metrics
+from opentelemetry.metrics import Observation
+
+meter = metrics.get_meter(__name__)
+connections_created = meter.create_counter(
+    "http_pool.connections.created", description="Connections opened to a model endpoint")
+connections_reused = meter.create_counter(
+    "http_pool.connections.reused", description="Requests sent on a kept-alive connection to a model endpoint")
+wait_duration = meter.create_histogram(
+    "http_pool.wait.duration", unit="ms", description="Time a request waited for a free connection to its endpoint")
+
+# pool whose connectors the gauges report, set by HttpPool.install()
+_installed_pool = None
+
+
+def endpoint_key(url):
+    """``scheme://host:port`` of a URL, the unit connections are pooled and limited by."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else url
+
+
+class HttpPool:
+    """Long-lived connection pools per model endpoint, shared by all NVIDIA AI endpoint clients."""
+
+    def __init__(self, max_connections_per_host=16, keepalive_seconds=60.0, endpoints=None):
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_seconds = keepalive_seconds
+        # endpoint key -> connection limit of the endpoints with their own limit
+        self.endpoint_limits = {
+            endpoint_key(url): int((settings or {}).get("max_connections_per_host", max_connections_per_host))
+            for url, settings in (endpoints or {}).items()
+        }
+        # event loop -> {endpoint key: connector}, aiohttp connectors are bound to their loop
+        self._connectors = weakref.WeakKeyDictionary()
+        # (endpoint key, verify) -> requests.Session
+        self._sync_sessions = {}
+        self._trace_config = None
+
+    @classmethod
+    def from_config(cls, settings):
+        """Create the pool from the ``http_pool`` section of a config file (a dict, may be empty)."""
+        settings = settings or {}
+        return cls(
+            max_connections_per_host=int(settings.get("max_connections_per_host", 16)),
+            keepalive_seconds=float(settings.get("keepalive_seconds", 60)),
+            endpoints=settings.get("endpoints"),
+        )
+
+    def limit(self, url):
+        return self.endpoint_limits.get(endpoint_key(url), self.max_connections_per_host)
+
+    def connector(self, url, ssl=True):
+        """Return the connector of the endpoint of ``url`` on the running event loop."""
+        import aiohttp
+
+        connectors = self._connectors.setdefault(asyncio.get_running_loop(), {})
+        key = endpoint_key(url)
+        if key not in connectors:
+            connectors[key] = aiohttp.TCPConnector(limit=self.limit(url), keepalive_timeout=self.keepalive_seconds,
+                                                   ssl=ssl)
+        return connectors[key]
+
+    def session(self, url, ssl=True):
+        """Return an aiohttp session on the shared connector; closing it leaves the connections open."""
+        import aiohttp
+
+        if self._trace_config is None:
+            self._trace_config = _create_trace_config()
+        return aiohttp.ClientSession(connector=self.connector(url, ssl), connector_owner=False,
+                                     trace_configs=[self._trace_config])
+
+    def sync_session(self, url, verify=True):
+        """Return the requests.Session of the endpoint of ``url``, blocking when its connections are in use."""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        key = (endpoint_key(url), verify)
+        if key not in self._sync_sessions:
+            session = requests.Session()
+            session.verify = verify
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.limit(url), pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sync_sessions[key] = session
+        return self._sync_sessions[key]
+
+    def install(self):
+        """Route the sessions of every NVIDIA AI endpoint client created from now on through this pool.
+
+        Clients created before keep their own sessions, so install the pool before the
+        guardrails and the NAT workflow are built. Returns False if the client library is
+        not installed or does not have the expected session factories.
+        """
+        global _installed_pool
+        try:
+            from langchain_nvidia_ai_endpoints._common import _NVIDIAClient
+        except ImportError:
+            print("⚠️ langchain_nvidia_ai_endpoints not found, HTTP connection pool not installed")
+            return False
+        if not hasattr(_NVIDIAClient, "_create_async_session") or not hasattr(_NVIDIAClient, "_create_session"):
+            print("⚠️ Unsupported langchain_nvidia_ai_endpoints version, HTTP connection pool not installed")
+            return False
+
+        pool = self
+        _NVIDIAClient._create_async_session = lambda client: pool.session(client.base_url, client._build_ssl_context())
+        _NVIDIAClient._create_session = lambda client: pool.sync_session(client.base_url, client.verify_ssl)
+        _installed_pool = self
+        print(f"✓ HTTP connection pool installed: {self.max_connections_per_host} connections per endpoint, "
+              f"keep-alive {self.keepalive_seconds:.0f} seconds" +
+              "".join(f", {key} {limit}" for key, limit in self.endpoint_limits.items()))
+        return True
+
+    def connection_counts(self):
+        """Return {endpoint key: (in use, idle)} over the connectors of all event loops."""
+        counts = {}
+        for connectors in list(self._connectors.values()):
+            for key, connector in list(connectors.items()):
+                # aiohttp keeps no public counters, the acquired and idle connections are in these
+                in_use = len(getattr(connector, "_acquired", ()))
+                idle = sum(len(conns) for conns in list(getattr(connector, "_conns", {}).values()))
+                previous_in_use, previous_idle = counts.get(key, (0, 0))
+                counts[key] = (previous_in_use + in_use, previous_idle + idle)
+        return counts
+
+    async def aclose(self):
+        """Close the connectors of the running event loop."""
+        connectors = self._connectors.pop(asyncio.get_running_loop(), {})
+        for connector in connectors.values():
+            await connector.close()
+
+
+def _create_trace_config():
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.endpoint = endpoint_key(str(params.url))
+
+    async def on_connection_queued_start(session, context, params):
+        context.queued_at = time.perf_counter()
+
+    async def on_connection_queued_end(session, context, params):
+        wait_duration.record((time.perf_counter() - context.queued_at) * 1000,
+                             {"server.address": context.endpoint})
+
+    async def on_connection_create_end(session, context, params):
+        connections_created.add(1, {"server.address": context.endpoint})
+
+    async def on_connection_reuseconn(session, context, params):
+        connections_reused.add(1, {"server.address": context.endpoint})
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
+
+
+def _observe_connections(index):
+    def callback(options):
+        if _installed_pool is None:
+            return []
+        return [Observation(counts[index], {"server.address": key})
+                for key, counts in _installed_pool.connection_counts().items()]
+    return callback
+
+
+meter.create_observable_gauge("http_pool.connections.in_use", callbacks=[_observe_connections(0)],
+                              description="Connections to a model endpoint serving a request")
+meter.create_observable_gauge("http_pool.connections.idle", callbacks=[_observe_connections(1)],
+                              description="Kept-alive connections to a model endpoint waiting for a request")
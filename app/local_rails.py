@@ -0,0 +1,88 @@
+"""In-process evaluation of the pure-Python input rails.
+
+The custom actions in ``guardrails_config/actions.py`` are plain functions, so they can
+reject a prompt in microseconds without going through ``LLMRails.generate_async`` and the
+model-backed rails. The refusal messages come from ``flows.co`` so the pre-filter answers
+exactly like the NeMo flow would.
+"""
+
+import re
+import time
+from pathlib import Path
+
+_FLOW_RE = re.compile(r"^define flow (?P<name>.+?)\s*$")
+_BOT_RE = re.compile(r"^define bot (?P<name>.+?)\s*$")
+_EXECUTE_RE = re.compile(r"\bexecute\s+(?P<action>\w+)")
+_BOT_CALL_RE = re.compile(r"^\s+bot\s+(?P<intent>.+?)\s*$")
+_MESSAGE_RE = re.compile(r'^\s+"(?P<message>.*)"\s*$')
+
+
+def parse_flows(flows_path):
+    """Parse a Colang 1.0 file into ``{flow: (action, bot intent)}`` and ``{bot intent: message}``.
+
+    The action is None for a flow that executes more than one action, such a flow
+    is not a single local check.
+    """
+    flows = {}
+    messages = {}
+    current_flow = None
+    current_bot = None
+    for line in Path(flows_path).read_text().splitlines():
+        if match := _FLOW_RE.match(line):
+            current_flow, current_bot = match["name"], None
+            flows[current_flow] = [[], None]
+        elif match := _BOT_RE.match(line):
+            current_flow, current_bot = None, match["name"]
+        elif current_bot and (match := _MESSAGE_RE.match(line)):
+            # the first message of a bot definition is the one NeMo uses by default
+            messages.setdefault(current_bot, match["message"])
+        elif current_flow and (match := _EXECUTE_RE.search(line)):
+            flows[current_flow][0].append(match["action"])
+        elif current_flow and (match := _BOT_CALL_RE.match(line)):
+            flows[current_flow][1] = flows[current_flow][1] or match["intent"]
+    return {
+        name: (actions[0] if len(actions) == 1 else None, intent) for name, (actions, intent) in flows.items()
+    }, messages
+
+
+class LocalInputRails:
+    """Run the local input rails of a guardrails config directly, in flow order."""
+
+    def __init__(self, checks):
+        # list of (flow name, action function, refusal message)
+        self.checks = checks
+
+    @classmethod
+    def from_config(cls, input_flows, flows_path, actions):
+        """Pick the input flows that only execute a local action from ``actions``.
+
+        Args:
+            input_flows: ``rails.input.flows`` of the guardrails config, in order
+            flows_path: path to the ``flows.co`` file defining the flows
+            actions: mapping of action name to the action function
+        """
+        flows, messages = parse_flows(flows_path)
+        checks = []
+        for flow_name in input_flows:
+            action_name, intent = flows.get(flow_name, (None, None))
+            if action_name in actions and intent in messages:
+                checks.append((flow_name, actions[action_name], messages[intent]))
+        return cls(checks)
+
+    @property
+    def flow_names(self):
+        return [flow_name for flow_name, _, _ in self.checks]
+
+    def check(self, user_input):
+        """Apply the local input rails and return (is_safe, message)."""
+        start_time = time.perf_counter()
+        context = {"user_message": user_input}
+        try:
+            for flow_name, action, message in self.checks:
+                if action(context=context):
+                    print(f"🚫 Input blocked by local rail: {flow_name}")
+                    return False, message
+            return True, "Input passed local guardrails"
+        finally:
+            duration = time.perf_counter() - start_time
+            print(f"⏱️  Local input guardrail execution time: {duration * 1000:.2f} ms")
@@ -0,0 +1,88 @@
+"""Concurrent execution of the input rails of a guardrails config.
+
+NeMo Guardrails runs the input flows one after another, so the input check takes the
+sum of the model-backed checks (content safety, topic control) plus the local ones.
+None of the flows depends on another, so here every model-backed flow gets its own
+``LLMRails`` built from a copy of the config that only lists that flow, and all of
+them run at once. The flows of the local actions are left to ``LocalInputRails``,
+which answers in microseconds before the model requests go out. The first rail that
+blocks decides the verdict and the checks still running are cancelled, so the wall
+time is that of the slowest single check, or less when a check blocks.
+"""
+
+import asyncio
+import time
+
+from rail_verdicts import INPUT_RAILS_OPTIONS, rails_verdict
+
+
+class ParallelInputRails:
+    """Run the model-backed input rails concurrently, first block wins."""
+
+    def __init__(self, model_rails, refusal_messages):
+        # list of (flow name, LLMRails running only that flow)
+        self.model_rails = model_rails
+        self.refusal_messages = refusal_messages
+
+    @classmethod
+    def from_config(cls, guardrails_path, input_flows, local_flows, refusal_messages, actions=None):
+        """Build one single-flow LLMRails per input flow that is not a local flow.
+
+        Args:
+            guardrails_path: directory of the guardrails config
+            input_flows: ``rails.input.flows`` of the guardrails config
+            local_flows: flow names checked in-process by LocalInputRails
+            refusal_messages: refusal messages from ``load_refusal_messages``
+            actions: mapping of action name to the custom action function, registered on every LLMRails
+        """
+        from nemoguardrails import LLMRails, RailsConfig
+
+        model_rails = []
+        for flow_name in input_flows:
+            if flow_name in local_flows:
+                continue
+            rails_config = RailsConfig.from_path(str(guardrails_path))
+            rails_config.rails.input.flows = [flow_name]
+            rails_config.rails.output.flows = []
+            rails = LLMRails(rails_config)
+            for action_name, action in (actions or {}).items():
+                rails.register_action(action, action_name)
+            model_rails.append((flow_name, rails))
+        return cls(model_rails, refusal_messages)
+
+    @property
+    def flow_names(self):
+        return [flow_name for flow_name, _ in self.model_rails]
+
+    async def _check_model_rail(self, flow_name, rails, user_input):
+        start_time = time.perf_counter()
+        response = await rails.generate_async(
+            messages=[{"role": "user", "content": user_input}],
+            options=INPUT_RAILS_OPTIONS
+        )
+        is_blocked, _, content = rails_verdict(response, "input", self.refusal_messages)
+        print(f"⏱️  Input rail '{flow_name}' execution time: {time.perf_counter() - start_time:.2f} seconds")
+        return flow_name, is_blocked, content
+
+    async def check(self, user_input):
+        """Apply the model-backed input rails concurrently and return (is_safe, message)."""
+        start_time = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._check_model_rail(flow_name, rails, user_input))
+            for flow_name, rails in self.model_rails
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                flow_name, is_blocked, content = await next_done
+                if is_blocked:
+                    print(f"🚫 Input blocked by {flow_name}")
+                    return False, content
+            return True, "Input passed guardrails"
+        except Exception as e:
+            return False, f"Error checking input: {str(e)}"
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            duration = time.perf_counter() - start_time
+            print(f"⏱️  Parallel input guardrail execution time: {duration:.2f} seconds")
@@ -0,0 +1,824 @@
+"""Guarded query pipeline shared by the Streamlit app and the headless HTTP server.
+
+The pipeline runs the input guardrails, the NAT workflow and the output guardrails for
+one prompt. It has no UI dependencies; app.py and server.py wrap it.
+"""
+
+# environment variables used:
+# - OTEL_OTLP_ENDPOINT: OpenTelemetry OTLP exporter endpoint (default: http://localhost:4318)
+# - INPUT_RAILS_MODE: 'parallel' or 'sequential' model-backed input rails (default: parallel)
+# - TELEMETRY_PROFILE: 'production' (batched span export) or 'development' (default: production)
+# - PIPELINE_EXECUTION_MODE: 'sequential' or 'speculative' (default: sequential)
+# - RESPONSE_CACHE_ENABLED: serve near-identical prompts from the semantic response cache (default: true)
+# - RESPONSE_CACHE_THRESHOLD: minimum cosine similarity of a cache hit (default: 0.95)
+# - RESPONSE_CACHE_TTL_SECONDS: how long a cached answer is served (default: 3600)
+# - RESPONSE_CACHE_MAX_ENTRIES: answers kept per guardrail mode (default: 1024)
+
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import yaml
+
+APP_DIR = Path(__file__).resolve().parent
+REPO_ROOT = APP_DIR.parent
+GUARDRAILS_CONFIG_PATH = APP_DIR / "guardrails_config" / "config.yml"
+NAT_CONFIG_PATH = APP_DIR / "src" / "nat_simple_web_query" / "configs" / "config.yml"
+GUARDRAILS_DIR = APP_DIR / "guardrails_config"
+FLOWS_PATH = GUARDRAILS_DIR / "flows.co"
+# custom actions of guardrails_config/actions.py, registered on every LLMRails
+CUSTOM_ACTIONS = (
+    "check_jailbreak",
+    "check_input_topic",
+    "check_output_relevance",
+    "check_blocked_terms",
+    "check_input_length",
+    "check_politics",
+    "classify_input_topic",
+)
+
+# Suppress Pydantic warnings BEFORE importing libraries that use Pydantic
+warnings.filterwarnings("ignore", message=".*validate_default.*", module="pydantic")
+
+# NeMo Guardrails and the Traceloop SDK take seconds to import, they are imported by
+# load_guardrails() and init_traceloop() so the app can render before they are loaded
+
+# for OpenTelemetry and Dynatrace Traceloop
+from opentelemetry import metrics, trace
+from telemetry import create_span_processor, telemetry_profile
+
+# for the shared, warm NAT workflows
+from workflow_pool import workflow_pool
+
+# for the in-process pre-filter of the local input rails
+from local_rails import LocalInputRails
+
+# for running the model-backed input rails concurrently
+from parallel_rails import ParallelInputRails
+
+# for the block / pass verdicts of the guardrails responses
+from rail_verdicts import INPUT_RAILS_OPTIONS, OUTPUT_RAILS_OPTIONS, load_refusal_messages, rails_verdict
+
+# for answering near-identical prompts without guardrails and workflow runs
+from response_cache import SemanticResponseCache
+
+# for the prompt embeddings shared by the response cache and the topic classifier
+from prompt_embedder import PromptEmbedder
+
+# for the per-stage latency histograms and spans
+from opentelemetry import context as otel_context
+from stage_metrics import (
+    OUTCOME_BLOCKED, OUTCOME_ERROR, OUTCOME_OK, STAGE_INPUT_RAILS, STAGE_NAT_WORKFLOW, STAGE_OUTPUT_RAILS, STAGE_RESPONSE_CACHE,
+    pipeline_stage,
+)
+from update_config import read_config_type
+
+# for the shared, kept-alive connections to the model endpoints
+from http_pool import HttpPool
+
+# ------------------------------------------------------------------------------
+# constants
+# ------------------------------------------------------------------------------
+# name used in tracing
+SERVICE_NAME = "nvidia-example" + ("-" + os.getenv("GITHUB_USER", "") if os.getenv("GITHUB_USER", "") else "")
+# guardrail modes, also used in the UI selectbox
+OPTION_WITH_GUARDRAILS = "With NeMo Guardrails"
+OPTION_WITHOUT_GUARDRAILS = "Without NeMo Guardrails"
+# execution modes: sequential runs the NAT workflow after the input guardrails passed,
+# speculative starts it alongside them and throws its result away if they block
+EXECUTION_MODE_SEQUENTIAL = "sequential"
+EXECUTION_MODE_SPECULATIVE = "speculative"
+EXECUTION_MODE = os.environ.get("PIPELINE_EXECUTION_MODE", EXECUTION_MODE_SEQUENTIAL)
+
+meter = metrics.get_meter(__name__)
+speculative_runs = meter.create_counter(
+    "pipeline.speculative.runs", description="NAT workflows started before the input guardrails finished")
+speculative_wasted_runs = meter.create_counter(
+    "pipeline.speculative.wasted_runs", description="Speculative NAT workflows discarded because the input was blocked")
+speculative_wasted_seconds = meter.create_histogram(
+    "pipeline.speculative.wasted_seconds", unit="s",
+    description="Time a discarded speculative NAT workflow ran before it was cancelled")
+
+# ------------------------------------------------------------------------------
+# traceloop-sdk setup for intrumentation and Dynatrace OTLP ingestion
+# ------------------------------------------------------------------------------
+
+# disable SDK collects anonymous telemetry data
+os.environ['TRACELOOP_TELEMETRY'] = "false"
+# set metrics preference to delta since this is what Dynatrace API expects
+os.environ['OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE'] = "delta"
+
+def init_traceloop(app_name=SERVICE_NAME):
+    """Initialize the Traceloop SDK, call once per process.
+
+    The TELEMETRY_PROFILE environment variable selects batched ('production') or
+    synchronous ('development') span export, see telemetry.py.
+    """
+    from traceloop.sdk import Traceloop
+
+    print("✓ Initializing Traceloop SDK...")
+    api_endpoint = os.environ.get('OTEL_OTLP_ENDPOINT', 'http://localhost:4318')
+    span_processor = create_span_processor(api_endpoint)
+    Traceloop.init(
+        app_name=app_name,
+        api_endpoint=api_endpoint,
+        # synchronous export in the development profile, otherwise the bounded batch processor
+        disable_batch=span_processor is None,
+        processor=span_processor,
+        should_enrich_metrics=True,
+    )
+    print("✓ Traceloop SDK initialized with: "+ api_endpoint + f" ({telemetry_profile()} telemetry profile)")
+
+# ------------------------------------------------------------------------------
+# Suppress verbose NAT agent logging and warnings
+# ------------------------------------------------------------------------------
+def configure_logging():
+    """Configure logging levels of the NAT, LangChain and guardrails libraries."""
+    print("✓ Configuring logging levels...")
+    logging.getLogger("nat.agent").setLevel(logging.CRITICAL)
+    logging.getLogger("nat").setLevel(logging.CRITICAL)
+    logging.getLogger("langchain_community").setLevel(logging.ERROR)
+    logging.getLogger("nemoguardrails.actions.action_dispatcher").setLevel(logging.ERROR)
+    warnings.filterwarnings("ignore")
+    return True
+
+# ------------------------------------------------------------------------------
+# Config file validation
+# ------------------------------------------------------------------------------
+def find_missing_config_files(config_paths=(GUARDRAILS_CONFIG_PATH, NAT_CONFIG_PATH)):
+    """Return the required config files that do not exist."""
+    return [str(config_path) for config_path in config_paths if not config_path.exists()]
+
+# ------------------------------------------------------------------------------
+# HTTP connection pool of the model clients
+# ------------------------------------------------------------------------------
+def load_http_pool(config_path=GUARDRAILS_CONFIG_PATH):
+    """Install the shared HTTP connection pool configured in the http_pool section of the guardrails config.
+
+    Must run before the guardrails and the NAT workflow create their model clients.
+    Returns None if the client library has no pool to install; raises on an invalid config.
+    """
+    settings = yaml.safe_load(config_path.read_text()).get("http_pool") if config_path.exists() else None
+    http_pool = HttpPool.from_config(settings)
+    return http_pool if http_pool.install() else None
+
+# ------------------------------------------------------------------------------
+# guardrail functions
+# ------------------------------------------------------------------------------
+def load_guardrails(guardrails_path=GUARDRAILS_DIR, nat_config_path=NAT_CONFIG_PATH):
+    """Load the guardrails configuration and register the custom actions.
+
+    The topic classifier of the custom actions embeds the prompts with the prompt
+    embedder of ``nat_config_path``. Returns None without a guardrails config and raises
+    if it cannot be loaded, so the start-up retries it.
+    """
+    print("✓ Initializing guardrails configuration...")
+    if not guardrails_path.exists():
+        print(f"⚠️ Guardrails config not found at: {guardrails_path}")
+        return None
+    
+    from nemoguardrails import LLMRails, RailsConfig
+
+    rails_config = RailsConfig.from_path(str(guardrails_path))
+    rails = LLMRails(rails_config)
+    
+    # Register custom guardrails actions
+    sys.path.insert(0, str(guardrails_path))
+    for action_name, action in load_custom_actions().items():
+        rails.register_action(action, action_name)
+    # imported with the actions
+    from topic_classifier import TOPIC_CLASSIFIER
+    TOPIC_CLASSIFIER.bind(prompt_embedder(nat_config_path))
+    
+    print("✓ Guardrails initialized successfully")
+    return rails
+
+def load_custom_actions():
+    """Return the custom actions of guardrails_config/actions.py by name."""
+    # guardrails_config is put on sys.path by load_guardrails()
+    import actions
+
+    return {action_name: getattr(actions, action_name) for action_name in CUSTOM_ACTIONS}
+
+def load_local_input_rails(rails, guardrails_path=GUARDRAILS_DIR):
+    """Build the local input rails pre-filter from the guardrails config and flows.co."""
+    print("✓ Initializing local input rails...")
+    # guardrails_config is put on sys.path by load_guardrails()
+    import actions
+
+    local_rails = LocalInputRails.from_config(
+        rails.config.rails.input.flows,
+        guardrails_path / "flows.co",
+        vars(actions),
+    )
+    print(f"✓ Local input rails initialized: {', '.join(local_rails.flow_names)}")
+    return local_rails
+
+def load_parallel_input_rails(rails, local_rails, guardrails_path=GUARDRAILS_DIR):
+    """Build the concurrent executor of the model-backed input rails, or None for sequential rails."""
+    # the local flows are only registered as actions on the main LLMRails
+    if os.environ.get("INPUT_RAILS_MODE", "parallel").lower() != "parallel" or not local_rails:
+        print("✓ Input rails run sequentially")
+        return None
+    print("✓ Initializing parallel input rails...")
+    parallel_rails = ParallelInputRails.from_config(
+        guardrails_path,
+        rails.config.rails.input.flows,
+        local_rails.flow_names,
+        load_refusal_messages(FLOWS_PATH),
+        load_custom_actions(),
+    )
+    print(f"✓ Parallel input rails initialized: {', '.join(parallel_rails.flow_names)}")
+    return parallel_rails
+
+async def check_input_guardrails(rails, user_input):
+    """Apply input guardrails and return (is_safe, message)."""
+    try:
+        start_time = time.perf_counter()
+        # only the input rails run, the verdict comes from the activated rails log
+        input_result = await rails.generate_async(
+            messages=[{"role": "user", "content": user_input}],
+            options=INPUT_RAILS_OPTIONS
+        )
+        end_time = time.perf_counter()
+        duration = end_time - start_time
+        print(f"⏱️  Input guardrail execution time: {duration:.2f} seconds")
+
+        is_blocked, rail_name, content = rails_verdict(input_result, "input", load_refusal_messages(FLOWS_PATH))
+        if is_blocked:
+            print(f"🚫 Input blocked by {rail_name or 'a refusal message'}")
+            return False, content
+        return True, "Input passed guardrails"
+    except Exception as e:
+        return False, f"Error checking input: {str(e)}"
+
+async def check_output_guardrails(rails, user_input, workflow_result):
+    """Apply output guardrails and return (is_safe, message)."""
+    try:
+        start_time = time.perf_counter()
+        # only the output rails run on the workflow answer, no new generation
+        output_result = await rails.generate_async(
+            messages=[
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": workflow_result}
+            ],
+            options=OUTPUT_RAILS_OPTIONS
+        )
+        end_time = time.perf_counter()
+        duration = end_time - start_time
+        print(f"⏱️  Output guardrail execution time: {duration:.2f} seconds")
+
+        is_blocked, rail_name, content = rails_verdict(output_result, "output", load_refusal_messages(FLOWS_PATH))
+        if is_blocked:
+            print(f"🚫 Output blocked by {rail_name or 'a refusal message'}")
+            return False, content
+        return True, "Output passed guardrails"
+    except Exception as e:
+        return False, f"Error checking output: {str(e)}"
+
+# ------------------------------------------------------------------------------
+# prompt embeddings and semantic response cache
+# ------------------------------------------------------------------------------
+_prompt_embedders = {}
+
+def prompt_embedder(nat_config_path=NAT_CONFIG_PATH):
+    """Return the prompt embedder of the NAT config, one per config so a prompt is embedded once."""
+    key = str(nat_config_path)
+    if key not in _prompt_embedders:
+        _prompt_embedders[key] = PromptEmbedder(nat_config_path)
+    return _prompt_embedders[key]
+
+def load_response_cache(nat_config_path=NAT_CONFIG_PATH):
+    """Create the semantic response cache, or return None if it is disabled."""
+    if os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        print("✓ Response cache disabled")
+        return None
+    response_cache = SemanticResponseCache(
+        nat_config_path,
+        embedder=prompt_embedder(nat_config_path),
+        threshold=float(os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.95")),
+        ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+    )
+    print(f"✓ Response cache enabled with similarity threshold {response_cache.threshold}")
+    return response_cache
+
+def exact_cached_answer(response_cache, user_input, user_option_guardrail, context=None):
+    """Return the answer cached for exactly this prompt and tag the prompt span, or None.
+
+    Needs no embedding request, so it runs before the input rails. The prompt span is
+    the span of ``context``, by default the current one.
+    """
+    if response_cache is None:
+        return None
+    cached = response_cache.lookup_exact(user_input, _guardrail_mode(user_option_guardrail))
+    if cached is not None:
+        _tag_cache_hit(trace.get_current_span(context), cached)
+    return cached
+
+def start_cache_lookup(response_cache, user_input, user_option_guardrail, stage_attributes, context=None):
+    """Start the similarity lookup of the response cache in a task, or return None without a cache.
+
+    The lookup waits for an embedding request; it runs alongside the input rails instead
+    of in front of them, and its result is only used once they passed.
+    """
+    if response_cache is None:
+        return None
+    return asyncio.ensure_future(
+        lookup_cached_answer(response_cache, user_input, user_option_guardrail, stage_attributes, context))
+
+async def finish_cache_lookup(cache_lookup):
+    """Return (answer, embedding) of a lookup started by start_cache_lookup."""
+    if cache_lookup is None:
+        return None, None
+    return await cache_lookup
+
+def cancel_cache_lookup(cache_lookup):
+    """Stop waiting for a lookup whose prompt was blocked; the embedding request still completes."""
+    if cache_lookup is not None:
+        cache_lookup.cancel()
+
+async def lookup_cached_answer(response_cache, user_input, user_option_guardrail, stage_attributes, context=None):
+    """Look the prompt up in the response cache and tag the prompt span, return (answer, embedding).
+
+    The prompt span is the span of ``context``, by default the current one.
+    """
+    if response_cache is None:
+        return None, None
+    span = trace.get_current_span(context)
+    with pipeline_stage(STAGE_RESPONSE_CACHE, *stage_attributes, context=context) as stage:
+        try:
+            cached, prompt_vector = await response_cache.lookup(user_input, _guardrail_mode(user_option_guardrail))
+        except Exception as e:
+            stage.value = OUTCOME_ERROR
+            print(f"⚠️ Response cache lookup failed: {e}")
+            return None, None
+
+    span.set_attribute("response_cache.hit", cached is not None)
+    if cached is not None:
+        _tag_cache_hit(span, cached)
+    return cached, prompt_vector
+
+def _tag_cache_hit(span, cached):
+    span.set_attribute("response_cache.hit", True)
+    span.set_attribute("response_cache.similarity", cached.similarity)
+    span.set_attribute("response_cache.latency_saved_seconds", cached.latency_seconds)
+    print(f"⚡ Response cache hit (similarity {cached.similarity:.3f}), "
+          f"saved about {cached.latency_seconds:.2f} seconds")
+
+async def store_cached_answer(response_cache, user_input, user_option_guardrail, results, start_time, prompt_vector):
+    """Store an answer that passed the output guardrails (or ran without them) in the response cache."""
+    if response_cache is None or not results["final_result"] or not results["output_safe"]:
+        return
+    try:
+        await response_cache.store(user_input, _guardrail_mode(user_option_guardrail), results["final_result"],
+                                   time.perf_counter() - start_time, prompt_vector)
+    except Exception as e:
+        print(f"⚠️ Response cache store failed: {e}")
+
+def cached_results(cached):
+    """Pipeline results for an answer served from the response cache."""
+    return {
+        "input_safe": True,
+        "input_message": "Served from the response cache",
+        "workflow_success": True,
+        "workflow_result": cached.answer,
+        "output_safe": True,
+        "output_message": "Served from the response cache",
+        "final_result": cached.answer,
+        "cached": True
+    }
+
+def _guardrail_mode(user_option_guardrail):
+    return "guardrails" if user_option_guardrail == OPTION_WITH_GUARDRAILS else "no_guardrails"
+
+def _stage_attributes(user_option_guardrail, nat_config_path):
+    """(guardrail mode, config type) of the stage metrics of a query."""
+    return _guardrail_mode(user_option_guardrail), read_config_type(nat_config_path)
+
+# ------------------------------------------------------------------------------
+# NAT functions
+# ------------------------------------------------------------------------------
+async def run_nat_workflow(user_input, nat_config_path):
+    """Execute the NAT workflow on a warm, shared workflow from the pool."""
+    stderr_capture = io.StringIO()
+    
+    try:
+        with contextlib.redirect_stderr(stderr_capture):
+            async with workflow_pool.acquire(nat_config_path) as workflow:
+                start_time = time.perf_counter()
+                async with workflow.run(user_input) as runner:
+                    workflow_result = await runner.result(to_type=str)
+                end_time = time.perf_counter()
+                duration = end_time - start_time
+                print(f"⏱️  NAT workflow execution time: {duration:.2f} seconds")
+        pool_stats = workflow_pool.stats()
+        print(f"✓ NAT workflow pool: {pool_stats['warm_hits']} warm hits, {pool_stats['cold_builds']} cold builds, "
+              f"last build {pool_stats['last_build_seconds']:.2f} seconds")
+        return True, str(workflow_result)
+    except Exception as e:
+        return False, workflow_error_message(e)
+
+async def warm_nat_workflow(nat_config_path=NAT_CONFIG_PATH):
+    """Build the pooled NAT workflow on the running event loop ahead of the first query."""
+    async with workflow_pool.acquire(nat_config_path):
+        pass
+    return workflow_pool.stats()
+
+async def stream_nat_workflow(user_input, nat_config_path):
+    """Execute the NAT workflow on a warm, shared workflow and yield its output as it is produced."""
+    stderr_capture = io.StringIO()
+
+    with contextlib.redirect_stderr(stderr_capture):
+        async with workflow_pool.acquire(nat_config_path) as workflow:
+            start_time = time.perf_counter()
+            first_token_time = None
+            async with workflow.run(user_input) as runner:
+                async for chunk in runner.result_stream(to_type=str):
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                        print(f"⏱️  NAT workflow time to first token: {first_token_time - start_time:.2f} seconds")
+                    yield str(chunk)
+            end_time = time.perf_counter()
+            duration = end_time - start_time
+            print(f"⏱️  NAT workflow execution time: {duration:.2f} seconds")
+
+def workflow_error_message(error):
+    """Map an exception raised by the NAT workflow to the message shown to the user."""
+    error_msg = str(error)
+    if "list index out of range" in error_msg or "Failed to parse" in error_msg:
+        return "Request was refused by the AI model for safety reasons"
+    #if "match any of the expected tags" in error_msg:
+    #    return "Request was refused by the AI model for safety reasons"
+    return f"Error: {error_msg}"
+
+def is_format_refusal(workflow_result):
+    """Return True if the NAT agent answered with a safety refusal instead of a result."""
+    return "Invalid Format" in workflow_result and (
+        "can't" in workflow_result.lower() or
+        "illegal" in workflow_result.lower()
+    )
+
+async def run_nat_workflow_stage(user_input, nat_config_path, stage_attributes, context=None):
+    """run_nat_workflow timed as the NAT workflow stage, return (success, result)."""
+    with pipeline_stage(STAGE_NAT_WORKFLOW, *stage_attributes, context=context) as stage:
+        workflow_success, workflow_result = await run_nat_workflow(user_input, nat_config_path)
+        if not workflow_success:
+            stage.value = OUTCOME_ERROR
+        elif is_format_refusal(workflow_result):
+            stage.value = OUTCOME_BLOCKED
+        return workflow_success, workflow_result
+
+def _rails_outcome(is_safe, message):
+    """Stage outcome of an input or output rails check."""
+    if is_safe:
+        return OUTCOME_OK
+    return OUTCOME_ERROR if message.startswith(("Error checking input", "Error checking output")) else OUTCOME_BLOCKED
+
+# ------------------------------------------------------------------------------
+# Main functions
+# ------------------------------------------------------------------------------
+async def run_input_rails(rails, user_input, status_text, local_rails=None, parallel_rails=None):
+    """Run the local pre-filter and the input guardrails, return (is_safe, message)."""
+    # Local input rails, rejects obvious abuse without a model round trip
+    if local_rails:
+        status_text.text("⚡ Running local input guardrails...")
+        is_safe, message = local_rails.check(user_input)
+        if not is_safe:
+            return is_safe, message
+
+    status_text.text("⚡ Running input guardrails...")
+    return await check_model_input_rails(rails, user_input, parallel_rails)
+
+async def check_model_input_rails(rails, user_input, parallel_rails=None):
+    """Apply the model-backed input rails, concurrently when a parallel executor is given."""
+    if parallel_rails:
+        return await parallel_rails.check(user_input)
+    return await check_input_guardrails(rails, user_input)
+
+async def run_input_rails_speculatively(rails, user_input, status_text, local_rails, workflow, parallel_rails=None):
+    """Run the input rails while the ``workflow`` coroutine already runs in a task.
+
+    Returns (is_safe, message, workflow_task). When the input is blocked the task is
+    cancelled, awaited and None is returned in its place, so its result never reaches
+    the caller. The local pre-filter answers in well under a millisecond and runs
+    before the workflow is started, obvious abuse does not cost a speculative run.
+    """
+    if local_rails:
+        status_text.text("⚡ Running local input guardrails...")
+        is_safe, message = local_rails.check(user_input)
+        if not is_safe:
+            workflow.close()
+            return is_safe, message, None
+
+    status_text.text("⚡ Running input guardrails and NAT workflow...")
+    start_time = time.perf_counter()
+    workflow_task = asyncio.create_task(workflow)
+    speculative_runs.add(1)
+    try:
+        is_safe, message = await check_model_input_rails(rails, user_input, parallel_rails)
+    except BaseException:
+        workflow_task.cancel()
+        raise
+    if is_safe:
+        return is_safe, message, workflow_task
+
+    await discard_speculative_run(workflow_task, start_time)
+    return is_safe, message, None
+
+async def discard_speculative_run(workflow_task, start_time):
+    """Cancel a speculative NAT workflow whose input was blocked (or answered from the cache), record the wasted work."""
+    completed = workflow_task.done()
+    workflow_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await workflow_task
+    wasted_seconds = time.perf_counter() - start_time
+    speculative_wasted_runs.add(1, {"completed": completed})
+    speculative_wasted_seconds.record(wasted_seconds, {"completed": completed})
+    trace.get_current_span().set_attribute("pipeline.speculative.wasted_seconds", wasted_seconds)
+    print(f"⏱️  Speculative NAT workflow discarded after {wasted_seconds:.2f} seconds")
+
+async def process_query(user_input, user_option_guardrail, rails, nat_config_path, status_text=None, local_rails=None,
+                        execution_mode=None, response_cache=None, parallel_rails=None):
+    """Main processing function that coordinates all steps.
+
+    status_text is anything with a ``text(message)`` method, e.g. a Streamlit placeholder.
+    execution_mode is EXECUTION_MODE_SEQUENTIAL or EXECUTION_MODE_SPECULATIVE, by
+    default the PIPELINE_EXECUTION_MODE environment variable. With a response_cache,
+    a hit skips the NAT workflow and the output guardrails: a prompt cached exactly
+    like this is answered right away, a similar one once the input guardrails passed.
+    """
+    execution_mode = execution_mode or EXECUTION_MODE
+    print("Processing", user_option_guardrail, "query in", execution_mode, "mode:", user_input)
+    status_text = status_text or _NoStatus()
+    results = {
+        "input_safe": False,
+        "input_message": "",
+        "workflow_success": False,
+        "workflow_result": "",
+        "output_safe": False,
+        "output_message": "",
+        "final_result": "",
+        "cached": False
+    }
+    
+    stage_attributes = _stage_attributes(user_option_guardrail, nat_config_path)
+
+    # Step 0: Semantic response cache, an exact match is answered right away; the
+    # similarity lookup (an embedding request) runs alongside the input guardrails
+    start_time = time.perf_counter()
+    cached = exact_cached_answer(response_cache, user_input, user_option_guardrail)
+    if cached is not None:
+        return cached_results(cached)
+    cache_lookup = start_cache_lookup(response_cache, user_input, user_option_guardrail, stage_attributes)
+
+    if user_option_guardrail == OPTION_WITH_GUARDRAILS and execution_mode == EXECUTION_MODE_SPECULATIVE:
+        # Step 1 and 2: Input guardrails with the NAT workflow already running, whose
+        # stage span is a sibling of the input rails span under the prompt span
+        workflow = run_nat_workflow_stage(user_input, nat_config_path, stage_attributes, otel_context.get_current())
+        with pipeline_stage(STAGE_INPUT_RAILS, *stage_attributes) as stage:
+            speculation = await run_input_rails_speculatively(
+                rails, user_input, status_text, local_rails, workflow, parallel_rails
+            )
+            results["input_safe"], results["input_message"], workflow_task = speculation
+            stage.value = _rails_outcome(results["input_safe"], results["input_message"])
+        if not results["input_safe"]:
+            cancel_cache_lookup(cache_lookup)
+            return results
+        cached, prompt_vector = await finish_cache_lookup(cache_lookup)
+        if cached is not None:
+            await discard_speculative_run(workflow_task, start_time)
+            return cached_results(cached)
+        status_text.text("⚡ Running NAT workflow...")
+        results["workflow_success"], results["workflow_result"] = await workflow_task
+    else:
+        # Step 1: Input guardrails
+        if user_option_guardrail == OPTION_WITH_GUARDRAILS:
+            with pipeline_stage(STAGE_INPUT_RAILS, *stage_attributes) as stage:
+                results["input_safe"], results["input_message"] = await run_input_rails(
+                    rails, user_input, status_text, local_rails, parallel_rails
+                )
+                stage.value = _rails_outcome(results["input_safe"], results["input_message"])
+            if not results["input_safe"]:
+                cancel_cache_lookup(cache_lookup)
+                return results
+        else:
+            results["input_safe"] = True
+        cached, prompt_vector = await finish_cache_lookup(cache_lookup)
+        if cached is not None:
+            return cached_results(cached)
+
+        # Step 2: Run NAT workflow
+        status_text.text("⚡ Running NAT workflow...")
+        results["workflow_success"], results["workflow_result"] = await run_nat_workflow_stage(
+            user_input, nat_config_path, stage_attributes
+        )
+    if not results["workflow_success"]:
+        return results
+    
+    # Check for safety refusal in NAT workflow result
+    if is_format_refusal(results["workflow_result"]):
+        results["workflow_success"] = False
+        results["workflow_result"] = "(NAT workflow) Request was refused by the AI model for safety reasons. Details: " + results["workflow_result"]
+        return results
+    
+    # Step 3: Output guardrails
+    if user_option_guardrail == OPTION_WITH_GUARDRAILS:
+        status_text.text("⚡ Running Output guardrails...")
+        with pipeline_stage(STAGE_OUTPUT_RAILS, *stage_attributes) as stage:
+            results["output_safe"], results["output_message"] = await check_output_guardrails(
+                rails, user_input, results["workflow_result"]
+            )
+            stage.value = _rails_outcome(results["output_safe"], results["output_message"])
+        if results["output_safe"]:
+            results["final_result"] = results["workflow_result"]
+    else:
+        # Output guardrails disabled - set as safe and use workflow result
+        results["output_safe"] = True
+        results["final_result"] = results["workflow_result"]
+
+    await store_cached_answer(response_cache, user_input, user_option_guardrail, results, start_time, prompt_vector)
+    return results
+
+async def stream_query(user_input, user_option_guardrail, rails, nat_config_path, status_text=None, local_rails=None,
+                       execution_mode=None, response_cache=None, parallel_rails=None, context=None):
+    """Streaming variant of process_query.
+
+    Yields ``{"type": "token", "text": ...}`` events as soon as the NAT workflow produces
+    them. With guardrails, the tokens first pass the chunked output rails configured in
+    ``rails.output.streaming`` of the guardrails config. When a chunk is blocked after
+    earlier ones were already sent, a ``{"type": "retract", "message": ...}`` event
+    follows and the client must discard the partial answer. The last event is always
+    ``{"type": "result", "results": ...}`` with the same fields process_query returns.
+
+    In speculative mode the workflow starts alongside the input guardrails and its
+    tokens are buffered until they pass. A response cache hit is sent as one token,
+    right away for an exact match and once the input guardrails passed for a similar one.
+
+    The stage spans are children of the span of ``context``, by default of the span that
+    is current when the generator starts. Pass the context of the caller's span instead
+    of making it current around the iteration: a context attached in an async generator
+    leaks into whatever runs between its yields.
+    """
+    context = context if context is not None else otel_context.get_current()
+    execution_mode = execution_mode or EXECUTION_MODE
+    print("Streaming", user_option_guardrail, "query in", execution_mode, "mode:", user_input)
+    status_text = status_text or _NoStatus()
+    results = {
+        "input_safe": False,
+        "input_message": "",
+        "workflow_success": False,
+        "workflow_result": "",
+        "output_safe": False,
+        "output_message": "",
+        "final_result": "",
+        "cached": False
+    }
+    with_guardrails = user_option_guardrail == OPTION_WITH_GUARDRAILS
+    stage_attributes = _stage_attributes(user_option_guardrail, nat_config_path)
+
+    # Step 0: Semantic response cache, an exact match is answered right away; the
+    # similarity lookup (an embedding request) runs alongside the input guardrails
+    start_time = time.perf_counter()
+    cached = exact_cached_answer(response_cache, user_input, user_option_guardrail, context)
+    if cached is not None:
+        yield {"type": "token", "text": cached.answer}
+        yield {"type": "result", "results": cached_results(cached)}
+        return
+    cache_lookup = start_cache_lookup(response_cache, user_input, user_option_guardrail, stage_attributes, context)
+
+    workflow_errors = []
+
+    async def workflow_tokens():
+        try:
+            async for token in stream_nat_workflow(user_input, nat_config_path):
+                yield token
+        except Exception as e:
+            # recorded instead of raised, so the output rails stream ends cleanly
+            workflow_errors.append(e)
+
+    workflow_stream = workflow_tokens()
+    tokens = workflow_stream
+    fill_task = None
+
+    # Step 1: Input guardrails, nothing is streamed before they pass
+    if with_guardrails and execution_mode == EXECUTION_MODE_SPECULATIVE:
+        buffered = _BufferedStream(workflow_stream)
+        with pipeline_stage(STAGE_INPUT_RAILS, *stage_attributes, context=context) as stage:
+            results["input_safe"], results["input_message"], fill_task = await run_input_rails_speculatively(
+                rails, user_input, status_text, local_rails, buffered.fill(), parallel_rails
+            )
+            stage.value = _rails_outcome(results["input_safe"], results["input_message"])
+        tokens = buffered.items()
+    elif with_guardrails:
+        with pipeline_stage(STAGE_INPUT_RAILS, *stage_attributes, context=context) as stage:
+            results["input_safe"], results["input_message"] = await run_input_rails(
+                rails, user_input, status_text, local_rails, parallel_rails
+            )
+            stage.value = _rails_outcome(results["input_safe"], results["input_message"])
+    else:
+        results["input_safe"] = True
+    if not results["input_safe"]:
+        cancel_cache_lookup(cache_lookup)
+        await workflow_stream.aclose()
+        yield {"type": "result", "results": results}
+        return
+    cached, prompt_vector = await finish_cache_lookup(cache_lookup)
+    if cached is not None:
+        if fill_task is not None:
+            await discard_speculative_run(fill_task, start_time)
+        await workflow_stream.aclose()
+        yield {"type": "token", "text": cached.answer}
+        yield {"type": "result", "results": cached_results(cached)}
+        return
+
+    # Step 2 and 3: NAT workflow tokens, passed through the output rails chunk by chunk
+    status_text.text("⚡ Streaming NAT workflow...")
+    if with_guardrails:
+        tokens = rails.stream_async(messages=[{"role": "user", "content": user_input}], generator=tokens)
+
+    stream_start_time = time.perf_counter()
+    sent = []
+    violation = None
+    # the stage covers the chunked output rails too; its span is not made current
+    # because the context of the generator may change between yields
+    with pipeline_stage(STAGE_NAT_WORKFLOW, *stage_attributes, context=context, current=False) as stage:
+        async for chunk in tokens:
+            violation = violation or output_rail_violation(chunk)
+            if violation is None:
+                sent.append(chunk)
+                yield {"type": "token", "text": chunk}
+        # the output rails stop reading after a blocked chunk, release the workflow right away
+        if fill_task is not None:
+            fill_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await fill_task
+        await workflow_stream.aclose()
+        if workflow_errors:
+            stage.value = OUTCOME_ERROR
+        elif violation is not None or is_format_refusal("".join(sent)):
+            stage.value = OUTCOME_BLOCKED
+    print(f"⏱️  Streamed response time: {time.perf_counter() - stream_start_time:.2f} seconds")
+
+    results["workflow_result"] = "".join(sent)
+    if workflow_errors:
+        results["workflow_result"] = workflow_error_message(workflow_errors[0])
+        yield {"type": "retract", "message": results["workflow_result"]}
+    elif is_format_refusal(results["workflow_result"]):
+        results["workflow_result"] = "(NAT workflow) Request was refused by the AI model for safety reasons. Details: " + results["workflow_result"]
+        yield {"type": "retract", "message": results["workflow_result"]}
+    else:
+        results["workflow_success"] = True
+        if violation is not None:
+            results["output_message"] = violation.get("message", "Output blocked by guardrails")
+            yield {"type": "retract", "message": results["output_message"]}
+        else:
+            results["output_safe"] = True
+            results["output_message"] = "Output passed guardrails" if with_guardrails else ""
+            results["final_result"] = results["workflow_result"]
+
+    await store_cached_answer(response_cache, user_input, user_option_guardrail, results, start_time, prompt_vector)
+    yield {"type": "result", "results": results}
+
+def output_rail_violation(chunk):
+    """Return the error NeMo Guardrails streams in place of a blocked chunk, or None."""
+    if not chunk.lstrip().startswith('{"error"'):
+        return None
+    try:
+        error = json.loads(chunk)["error"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return error if isinstance(error, dict) and error.get("type") == "guardrails_violation" else None
+
+class _BufferedStream:
+    """Reads an async generator into a queue, so it can run ahead of its consumer."""
+
+    _END = object()
+
+    def __init__(self, agen):
+        self._agen = agen
+        self._items = asyncio.Queue()
+
+    async def fill(self):
+        try:
+            async for item in self._agen:
+                self._items.put_nowait(item)
+        finally:
+            self._items.put_nowait(self._END)
+
+    async def items(self):
+        while (item := await self._items.get()) is not self._END:
+            yield item
+
+class _NoStatus:
+    """Status sink used when the caller does not display progress."""
+
+    def text(self, message):
+        pass
@@ -0,0 +1,108 @@
+"""Embeddings of the prompts, shared by the response cache and the topic classifier.
+
+Both embed the prompt with the ``nv-embedqa-e5-v5`` embedder defined in the NAT
+workflow config. ``PromptEmbedder`` builds that embedder once through the NAT builder,
+so it uses the same settings and credentials as the workflow, and keeps the unit-length
+embeddings of the last prompts: the second user of a prompt, or a concurrent one, does
+not pay another round trip to the embedder.
+
+The embedder holds async clients and is built lazily on the event loop of the first
+call; like the workflow pool, an instance is meant to be used from one loop.
+"""
+
+import asyncio
+import contextlib
+import functools
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Normalize a prompt so trivially different phrasings share an embedding and a cache key."""
+    return _WHITESPACE_RE.sub(" ", prompt.casefold()).strip().rstrip("?!. ")
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class PromptEmbedder:
+    """Lazily built embedder of the NAT config with a small LRU of prompt embeddings."""
+
+    def __init__(self, nat_config_path, embedder_name="nv-embedqa-e5-v5", max_entries=256):
+        self.nat_config_path = nat_config_path
+        self.embedder_name = embedder_name
+        self.max_entries = max_entries
+        self._vectors = OrderedDict()
+        # normalized prompt -> task of the embedding request running for it
+        self._in_flight = {}
+        self._embedder = None
+        self._embedder_lock = None
+        self._exit_stack = contextlib.AsyncExitStack()
+
+    async def get_embedder(self):
+        """Return the LangChain embedder, building it on the first call."""
+        if self._embedder is not None:
+            return self._embedder
+        if self._embedder_lock is None:
+            self._embedder_lock = asyncio.Lock()
+        async with self._embedder_lock:
+            if self._embedder is None:
+                from nat.builder.framework_enum import LLMFrameworkEnum
+                from nat.builder.workflow_builder import WorkflowBuilder
+                from nat.runtime.loader import load_config
+
+                config = load_config(self.nat_config_path)
+                # no general config: the workflow already exports the telemetry of this process
+                builder = await self._exit_stack.enter_async_context(WorkflowBuilder())
+                await builder.add_embedder(self.embedder_name, config.embedders[self.embedder_name])
+                self._embedder = await builder.get_embedder(self.embedder_name,
+                                                            wrapper_type=LLMFrameworkEnum.LANGCHAIN)
+                print(f"✓ Prompt embedder '{self.embedder_name}' initialized")
+        return self._embedder
+
+    async def embed(self, prompt):
+        """Return the unit-length embedding of the normalized prompt."""
+        key = normalize_prompt(prompt)
+        vector = self._vectors.get(key)
+        if vector is not None:
+            self._vectors.move_to_end(key)
+            return vector
+        running = self._in_flight.get(key)
+        if running is None:
+            running = asyncio.ensure_future(self._embed(key))
+            self._in_flight[key] = running
+            running.add_done_callback(functools.partial(self._embed_done, key))
+        # a cancelled caller stops waiting, the request goes on for the others
+        return await asyncio.shield(running)
+
+    async def embed_texts(self, texts):
+        """Return the unit-length query embeddings of ``texts`` as rows of a matrix, not cached."""
+        embedder = await self.get_embedder()
+        vectors = await asyncio.gather(*[embedder.aembed_query(text) for text in texts])
+        return np.vstack([_unit(vector) for vector in vectors])
+
+    async def _embed(self, key):
+        embedder = await self.get_embedder()
+        vector = _unit(await embedder.aembed_query(key))
+        self._vectors[key] = vector
+        while len(self._vectors) > self.max_entries:
+            self._vectors.popitem(last=False)
+        return vector
+
+    def _embed_done(self, key, running):
+        if self._in_flight.get(key) is running:
+            del self._in_flight[key]
+        if not running.cancelled():
+            # retrieved here, so a failure no one waited for any more is not logged
+            running.exception()
+
+    async def aclose(self):
+        """Close the embedder clients."""
+        await self._exit_stack.aclose()
+        self._embedder = None
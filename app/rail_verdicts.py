@@ -0,0 +1,59 @@
+"""Structured verdicts for NeMo Guardrails responses.
+
+A rails-only ``generate_async`` call with ``options={"log": {"activated_rails": True}}``
+returns the rails that ran, and a rail that blocked has ``stop`` set. That flag is
+the verdict; the response text is only the message shown to the user.
+
+When a response carries no rails log (older NeMo versions, a custom LLMRails), the
+response text is looked up in the set of refusal messages defined in ``flows.co``.
+Every blocking flow answers with one of them, so a block is an exact set lookup
+instead of a phrase scan that also matches answers saying "I cannot".
+"""
+
+from functools import lru_cache
+
+from local_rails import parse_flows
+
+# options of a generate_async call that only runs one kind of rails and logs them
+INPUT_RAILS_OPTIONS = {"rails": ["input"], "log": {"activated_rails": True}}
+OUTPUT_RAILS_OPTIONS = {"rails": ["output"], "log": {"activated_rails": True}}
+
+
+@lru_cache(maxsize=None)
+def load_refusal_messages(flows_path):
+    """Return the refusal messages of the bot definitions in ``flows_path``."""
+    _, messages = parse_flows(flows_path)
+    return frozenset(message.strip() for message in messages.values())
+
+
+def response_content(response):
+    """Return the text of the last message of a guardrails response."""
+    messages = getattr(response, "response", response)
+    if isinstance(messages, list):
+        messages = messages[-1] if messages else {}
+    if isinstance(messages, dict):
+        return messages.get("content", "") or ""
+    return messages if isinstance(messages, str) else ""
+
+
+def rails_verdict(response, rail_type, refusal_messages):
+    """Return ``(is_blocked, rail name or None, message)`` for a guardrails response.
+
+    Args:
+        response: ``GenerationResponse`` (or message dict) from ``generate_async``
+        rail_type: ``"input"`` or ``"output"``, the kind of rails whose verdict counts
+        refusal_messages: refusal messages from ``load_refusal_messages``
+    """
+    content = response_content(response)
+    log = getattr(response, "log", None)
+    activated_rails = getattr(log, "activated_rails", None)
+    if activated_rails is not None:
+        for rail in activated_rails:
+            if rail.type == rail_type and rail.stop:
+                return True, rail.name, content
+        return False, None, content
+
+    # no rails log: every blocking flow answers with one of its refusal messages
+    if content.strip() in refusal_messages:
+        return True, None, content
+    return False, None, content
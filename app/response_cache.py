@@ -0,0 +1,175 @@
+"""Semantic cache of guarded answers, keyed on the embedding of the prompt.
+
+Near-identical questions ("how does dynatrace help an SRE?" and "How does Dynatrace
+help SREs") map to embeddings with a cosine similarity close to 1. A hit returns the
+stored answer without running the guardrails or the NAT workflow. Prompts are embedded
+with the ``nv-embedqa-e5-v5`` embedder defined in the NAT workflow config, through the
+``PromptEmbedder`` the topic classifier of the guardrails shares (prompt_embedder.py).
+
+Answers with and without guardrails live in separate namespaces: an answer that was
+never checked by the output rails is never served to a guarded query.
+"""
+
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from opentelemetry import metrics
+
+from prompt_embedder import PromptEmbedder, normalize_prompt
+
+meter = metrics.get_meter(__name__)
+cache_lookups = meter.create_counter("response_cache.lookups", description="Prompts looked up in the response cache")
+cache_hits = meter.create_counter("response_cache.hits", description="Prompts answered from the response cache")
+cache_latency_saved = meter.create_histogram(
+    "response_cache.latency_saved", unit="s",
+    description="Pipeline time the original answer took minus the time of the cache lookup")
+
+class CachedAnswer:
+    """A stored answer and how long the pipeline took to produce it."""
+
+    def __init__(self, prompt, answer, latency_seconds, stored_at, similarity=1.0):
+        self.prompt = prompt
+        self.answer = answer
+        self.latency_seconds = latency_seconds
+        self.stored_at = stored_at
+        self.similarity = similarity
+
+
+class _Namespace:
+    """LRU-ordered answers of one namespace and the matrix of their unit-length prompt embeddings.
+
+    The matrix is updated in place: a new prompt fills the next free row (the matrix
+    doubles when it is full), a dropped one is overwritten by the last row.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        # row of the matrix -> key, and back
+        self._keys = []
+        self._rows = {}
+        self._matrix = None
+
+    def matrix(self):
+        if not self._keys:
+            return self._keys, None
+        return self._keys, self._matrix[:len(self._keys)]
+
+    def put(self, key, vector, answer):
+        self.entries[key] = (vector, answer)
+        self.entries.move_to_end(key)
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            if self._matrix is None or row == len(self._matrix):
+                matrix = np.empty((max(2 * row, 16), len(vector)), dtype=np.float32)
+                if row:
+                    matrix[:row] = self._matrix
+                self._matrix = matrix
+            self._rows[key] = row
+            self._keys.append(key)
+        self._matrix[row] = vector
+
+    def pop(self, key):
+        if self.entries.pop(key, None) is None:
+            return
+        row = self._rows.pop(key)
+        last_key = self._keys.pop()
+        if last_key != key:
+            self._keys[row] = last_key
+            self._rows[last_key] = row
+            self._matrix[row] = self._matrix[len(self._keys)]
+
+
+class SemanticResponseCache:
+    """TTL + LRU cache of answers, looked up by exact prompt or by embedding similarity.
+
+    The embedder (a ``PromptEmbedder``, by default one of its own) holds async clients
+    and is built lazily on the event loop of the first lookup; like the workflow pool,
+    an instance is meant to be used from one loop.
+    """
+
+    def __init__(self, nat_config_path, embedder_name="nv-embedqa-e5-v5", threshold=0.95,
+                 ttl_seconds=3600.0, max_entries=1024, embedder=None):
+        self.nat_config_path = Path(nat_config_path)
+        self.embedder = embedder or PromptEmbedder(self.nat_config_path, embedder_name)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._namespaces = {}
+
+    async def embed(self, prompt):
+        """Return the unit-length embedding of the normalized prompt."""
+        return await self.embedder.embed(prompt)
+
+    def lookup_exact(self, prompt, namespace):
+        """Return the ``CachedAnswer`` stored for exactly this (normalized) prompt, or None.
+
+        Needs no embedding, so it can answer before anything else runs; a miss is not
+        counted, the following ``lookup`` counts it.
+        """
+        hit = self._fresh(self._namespaces.setdefault(namespace, _Namespace()), normalize_prompt(prompt))
+        if hit is not None:
+            self._record(namespace, hit, time.time())
+        return hit
+
+    async def lookup(self, prompt, namespace):
+        """Return ``(CachedAnswer or None, embedding)`` for ``prompt`` in ``namespace``.
+
+        The embedding is returned so a following ``store`` does not compute it again; it
+        is None when the prompt matched exactly or the namespace is empty and no
+        embedding was needed.
+        """
+        start_time = time.time()
+        entries = self._namespaces.setdefault(namespace, _Namespace())
+        key = normalize_prompt(prompt)
+        vector = None
+        hit = self._fresh(entries, key)
+        if hit is None and entries.entries:
+            vector = await self.embed(prompt)
+            keys, matrix = entries.matrix()
+            similarities = matrix @ vector
+            # collected first, dropping an expired entry moves the rows
+            candidates = []
+            for index in np.argsort(similarities)[::-1]:
+                if similarities[index] < self.threshold:
+                    break
+                candidates.append((keys[index], float(similarities[index])))
+            for candidate, similarity in candidates:
+                hit = self._fresh(entries, candidate, similarity)
+                if hit is not None:
+                    break
+        self._record(namespace, hit, start_time)
+        return hit, vector
+
+    def _record(self, namespace, hit, start_time):
+        attributes = {"namespace": namespace}
+        cache_lookups.add(1, {**attributes, "hit": hit is not None})
+        if hit is not None:
+            cache_hits.add(1, attributes)
+            cache_latency_saved.record(max(hit.latency_seconds - (time.time() - start_time), 0.0), attributes)
+
+    async def store(self, prompt, namespace, answer, latency_seconds, vector=None):
+        """Store the answer the pipeline produced for ``prompt`` in ``namespace``."""
+        if vector is None:
+            vector = await self.embed(prompt)
+        entries = self._namespaces.setdefault(namespace, _Namespace())
+        entries.put(normalize_prompt(prompt), vector, CachedAnswer(prompt, answer, latency_seconds, time.time()))
+        while len(entries.entries) > self.max_entries:
+            entries.pop(next(iter(entries.entries)))
+
+    def _fresh(self, entries, key, similarity=1.0):
+        entry = entries.entries.get(key)
+        if entry is None:
+            return None
+        answer = entry[1]
+        if time.time() - answer.stored_at > self.ttl_seconds:
+            entries.pop(key)
+            return None
+        entries.entries.move_to_end(key)
+        return CachedAnswer(answer.prompt, answer.answer, answer.latency_seconds, answer.stored_at, similarity)
+
+    async def aclose(self):
+        """Close the embedder clients."""
+        await self.embedder.aclose()
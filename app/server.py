@@ -0,0 +1,215 @@
+"""Headless HTTP/JSON serving mode for the guarded query pipeline.
+
+Exposes the same pipeline as the Streamlit app (input rails, NAT workflow, output
+rails) as ``POST /v1/query``, and token by token as ``POST /v1/query/stream``. All
+requests share one event loop, one warm NAT workflow and one LLMRails instance; a
+semaphore bounds how many run at once and the rest wait in a queue whose depth is
+exported as a metric.
+
+The components are built and warmed up with one synthetic query (see warmup.py) in
+the background after the server started. ``GET /healthz`` answers right away,
+``GET /readyz`` answers 503 with the start-up progress until the replica is warm, and
+queries get a 503 until then, so orchestrators only route traffic to hot replicas. A
+failed start-up step is retried with backoff (see startup.py); once it failed for good
+``GET /healthz`` answers 503 too, so the orchestrator restarts the replica. A failed
+warm-up query does not: it is only reported under ``warnings`` in ``GET /readyz``.
+
+Usage:
+    python app/server.py
+    uvicorn server:app --app-dir app --host 0.0.0.0 --port 8000
+
+Environment variables:
+    - SERVER_MAX_CONCURRENCY: queries processed at the same time (default: 16)
+    - SERVER_MAX_QUEUE: queries allowed to wait for a slot before getting a 503 (default: 256)
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from opentelemetry import metrics, trace
+from pydantic import BaseModel
+
+from pipeline import (
+    NAT_CONFIG_PATH,
+    OPTION_WITH_GUARDRAILS,
+    OPTION_WITHOUT_GUARDRAILS,
+    SERVICE_NAME,
+    find_missing_config_files,
+    process_query,
+    stream_query,
+)
+from async_runtime import RunningLoop
+from startup import Startup, pipeline_steps
+
+MAX_CONCURRENCY = int(os.environ.get("SERVER_MAX_CONCURRENCY", "16"))
+MAX_QUEUE = int(os.environ.get("SERVER_MAX_QUEUE", "256"))
+
+meter = metrics.get_meter(__name__)
+queue_depth = meter.create_up_down_counter("query_server.queue.depth",
+                                           description="Queries waiting for a free processing slot")
+in_flight = meter.create_up_down_counter("query_server.in_flight",
+                                         description="Queries being processed")
+
+
+class QueryRequest(BaseModel):
+    prompt: str
+    guardrails: bool = True
+    # EXECUTION_MODE_SEQUENTIAL or EXECUTION_MODE_SPECULATIVE of pipeline.py, None uses
+    # the PIPELINE_EXECUTION_MODE of the server
+    execution_mode: Literal["sequential", "speculative"] | None = None
+
+
+class QueryResponse(BaseModel):
+    input_safe: bool
+    input_message: str
+    workflow_success: bool
+    workflow_result: str
+    output_safe: bool
+    output_message: str
+    final_result: str
+    cached: bool = False
+
+
+class QueryService:
+    """Pipeline state shared by all requests of this process."""
+
+    def __init__(self, max_concurrency, max_queue):
+        self.startup = None
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def start(self):
+        """Start building and warming up the components on the running event loop in the background."""
+        missing_files = find_missing_config_files()
+        if missing_files:
+            raise RuntimeError(f"Config files not found: {', '.join(missing_files)}. "
+                               "Run 'python app/update_config.py <config_type>' to generate them.")
+        # the NAT workflow and the rails clients are bound to the loop the queries run on
+        event_loop = RunningLoop(asyncio.get_running_loop())
+        self.startup = Startup(pipeline_steps(SERVICE_NAME, event_loop=event_loop), name="pipeline-startup").start()
+
+    @property
+    def rails(self):
+        return self.startup.components.get("guardrails")
+
+    @property
+    def local_rails(self):
+        return self.startup.components.get("local_input_rails")
+
+    @property
+    def parallel_rails(self):
+        return self.startup.components.get("parallel_input_rails")
+
+    @property
+    def response_cache(self):
+        return self.startup.components.get("response_cache")
+
+    def check_admission(self, request: QueryRequest):
+        """Reject the request with a 503 if it cannot be served or queued right now."""
+        if not self.startup.ready:
+            raise HTTPException(status_code=503, detail=f"Not ready, start-up {self.startup.status()['state']}")
+        if request.guardrails and not self.rails:
+            raise HTTPException(status_code=503, detail="Guardrails not initialized")
+        if self.waiting >= self.max_queue:
+            raise HTTPException(status_code=503, detail="Too many queued queries")
+
+    @asynccontextmanager
+    async def _slot(self):
+        self.waiting += 1
+        queue_depth.add(1)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            queue_depth.add(-1)
+
+        in_flight.add(1)
+        try:
+            yield
+        finally:
+            in_flight.add(-1)
+            self._slots.release()
+
+    async def query(self, request: QueryRequest):
+        self.check_admission(request)
+        async with self._slot():
+            with trace.get_tracer(SERVICE_NAME).start_as_current_span(name="prompt", kind=trace.SpanKind.SERVER):
+                option = OPTION_WITH_GUARDRAILS if request.guardrails else OPTION_WITHOUT_GUARDRAILS
+                return await process_query(request.prompt, option, self.rails, NAT_CONFIG_PATH,
+                                           local_rails=self.local_rails, execution_mode=request.execution_mode,
+                                           response_cache=self.response_cache, parallel_rails=self.parallel_rails)
+
+    async def stream(self, request: QueryRequest, span):
+        """Yield the events of stream_query() as NDJSON lines under ``span``, which ends with the stream."""
+        try:
+            async with self._slot():
+                option = OPTION_WITH_GUARDRAILS if request.guardrails else OPTION_WITHOUT_GUARDRAILS
+                async for event in stream_query(request.prompt, option, self.rails, NAT_CONFIG_PATH,
+                                                local_rails=self.local_rails, execution_mode=request.execution_mode,
+                                                response_cache=self.response_cache, parallel_rails=self.parallel_rails,
+                                                context=trace.set_span_in_context(span)):
+                    yield json.dumps(event) + "\n"
+        finally:
+            span.end()
+
+
+service = QueryService(MAX_CONCURRENCY, MAX_QUEUE)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    service.start()
+    yield
+    http_pool = service.startup.components.get("http_pool")
+    if http_pool is not None:
+        await http_pool.aclose()
+
+
+app = FastAPI(title="NVIDIA NeMo Agent Toolkit with Guardrails", lifespan=lifespan)
+
+
+@app.post("/v1/query", response_model=QueryResponse)
+async def query(request: QueryRequest):
+    if not request.prompt.strip():
+        raise HTTPException(status_code=422, detail="prompt must not be empty")
+    return await service.query(request)
+
+
+@app.post("/v1/query/stream")
+async def query_stream(request: QueryRequest):
+    """Stream the answer as NDJSON events: token, retract (discard the tokens so far) and a final result."""
+    if not request.prompt.strip():
+        raise HTTPException(status_code=422, detail="prompt must not be empty")
+    service.check_admission(request)
+    # opened here and passed on: made current inside the stream generator, the span's
+    # context would leak into the code that iterates it between two events
+    span = trace.get_tracer(SERVICE_NAME).start_span(name="prompt", kind=trace.SpanKind.SERVER)
+    return StreamingResponse(service.stream(request, span), media_type="application/x-ndjson")
+
+
+@app.get("/healthz")
+async def healthz():
+    """200 while the replica is starting or serving, 503 once its start-up failed for good, so it gets restarted."""
+    if service.startup.status()["state"] == "failed":
+        return JSONResponse({"status": "failed", "error": service.startup.error}, status_code=503)
+    return {"status": "ok", "queue_depth": service.waiting}
+
+
+@app.get("/readyz")
+async def readyz():
+    """200 once the components are built and warmed up, 503 with the start-up progress before."""
+    status = service.startup.status()
+    status["warmup"] = service.startup.components.get("warmup_queries")
+    return JSONResponse(status, status_code=200 if service.startup.ready else 503)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.environ.get("SERVER_HOST", "0.0.0.0"), port=int(os.environ.get("SERVER_PORT", "8000")))
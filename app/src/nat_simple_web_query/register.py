@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import Literal
 
 from nat.builder.builder import Builder
 from nat.builder.framework_enum import LLMFrameworkEnum
@@ -15,6 +16,12 @@ logger = logging.getLogger(__name__)
 class TavilySearchToolConfig(FunctionBaseConfig, name="tavily_search"):
     description: str = "Search the web for current information"
     max_results: int = 5
+    # results of identical (normalized) queries are reused for cache_ttl_seconds
+    cache_enabled: bool = True
+    cache_backend: Literal["memory", "sqlite"] = "memory"
+    cache_ttl_seconds: float = 600.0
+    cache_max_entries: int = 1024
+    cache_path: str = "~/.cache/nat_simple_web_query/tavily_search.sqlite"
 
 
 @register_function(config_type=TavilySearchToolConfig, framework_wrappers=[LLMFrameworkEnum.LANGCHAIN])
@@ -29,10 +36,27 @@ async def tavily_search_tool(config: TavilySearchToolConfig, builder: Builder):
         topic="general",
     )
 
-    async def _search(query: str) -> str:
+    async def _tavily_search(question: str) -> str:
+        result = await tavily_tool.ainvoke({"query": question})
+        # the documents format of the built-in tavily_internet_search tool
+        return "\n\n---\n\n".join(
+            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>' for doc in result["results"])
+
+    if config.cache_enabled:
+        from .search_cache import InMemoryCacheBackend, SearchResultCache, SQLiteCacheBackend
+
+        if config.cache_backend == "sqlite":
+            backend = SQLiteCacheBackend(config.cache_path, config.cache_max_entries)
+        else:
+            backend = InMemoryCacheBackend(config.cache_max_entries)
+        cache = SearchResultCache(backend, config.cache_ttl_seconds)
+
+    # same argument name and result format as tavily_internet_search, which it replaces in the configs
+    async def _search(question: str) -> str:
         """Search the web for information."""
-        result = await tavily_tool.ainvoke({"query": query})
-        return str(result)
+        if not config.cache_enabled:
+            return await _tavily_search(question)
+        return await cache.get_or_search(question, config.max_results, _tavily_search)
 
     yield FunctionInfo.from_fn(_search, description=config.description)
 
@@ -43,28 +67,45 @@ class WebQueryToolConfig(FunctionBaseConfig, name="webpage_query"):
     description: str
     chunk_size: int = 1024
     embedder_name: EmbedderRef = "nvidia/nv-embedqa-e5-v5"
+    # chunks, embeddings and the USearch index are cached here between builds
+    cache_dir: str = os.environ.get("NAT_WEBPAGE_CACHE_DIR", "~/.cache/nat_simple_web_query")
 
 
 @register_function(config_type=WebQueryToolConfig, framework_wrappers=[LLMFrameworkEnum.LANGCHAIN])
 async def webquery_tool(config: WebQueryToolConfig, builder: Builder):
+    import asyncio
+
     from langchain.tools.retriever import create_retriever_tool
     from langchain_community.document_loaders import WebBaseLoader
-    from langchain_community.vectorstores import USearch
     from langchain_core.embeddings import Embeddings
     from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-    logger.info("Generating docs for the webpage: %s", config.webpage_url)
+    from .webpage_index_cache import WebpageIndexCache, content_hash, probe_etag
 
     embeddings: Embeddings = await builder.get_embedder(config.embedder_name, wrapper_type=LLMFrameworkEnum.LANGCHAIN)
 
-    loader = WebBaseLoader(config.webpage_url)
+    cache = WebpageIndexCache(config.cache_dir, config.webpage_url, config.chunk_size, config.embedder_name)
+    etag = await asyncio.to_thread(probe_etag, config.webpage_url)
+
+    if cache.matches(etag=etag):
+        # unchanged according to the server, skip downloading the page
+        vector = cache.load(embeddings)
+    else:
+        logger.info("Generating docs for the webpage: %s", config.webpage_url)
+
+        loader = WebBaseLoader(config.webpage_url)
 
-    # Cant use `aload` because its implemented incorrectly and is not async
-    docs = [document async for document in loader.alazy_load()]
+        # Cant use `aload` because its implemented incorrectly and is not async
+        docs = [document async for document in loader.alazy_load()]
+        page_hash = content_hash(docs)
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=config.chunk_size)
-    documents = text_splitter.split_documents(docs)
-    vector = await USearch.afrom_documents(documents, embeddings)
+        if cache.matches(page_hash=page_hash):
+            vector = cache.load(embeddings)
+        else:
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=config.chunk_size)
+            documents = text_splitter.split_documents(docs)
+            # only chunks that changed since the cached version are embedded
+            vector = await cache.update(documents, embeddings, etag, page_hash)
 
     retriever = vector.as_retriever()
 
@@ -0,0 +1,157 @@
+import asyncio
+import functools
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from opentelemetry import metrics
+
+meter = metrics.get_meter(__name__)
+cache_hits = meter.create_counter("tavily_search.cache.hits", description="Search results served from the cache")
+cache_misses = meter.create_counter("tavily_search.cache.misses", description="Searches sent to Tavily")
+cache_evictions = meter.create_counter("tavily_search.cache.evictions",
+                                       description="Cached search results dropped because of size or TTL")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache entry."""
+    return _WHITESPACE_RE.sub(" ", query.casefold()).strip().rstrip("?!. ")
+
+
+class InMemoryCacheBackend:
+    """Size-bounded LRU cache kept in process memory."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    async def get(self, key: str) -> tuple[str, float] | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, value: str, stored_at: float) -> int:
+        """Store ``value`` and return how many least recently used entries were evicted."""
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+class SQLiteCacheBackend:
+    """Size-bounded LRU cache in a SQLite file, shared by processes and kept across restarts."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS search_cache_accessed_at ON search_cache (accessed_at)")
+
+    def _get(self, key: str):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, stored_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE search_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row
+
+    def _set(self, key: str, value: str, stored_at: float) -> int:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, stored_at, time.time()))
+            return self._connection.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> tuple[str, float] | None:
+        row = await asyncio.to_thread(self._get, key)
+        return tuple(row) if row is not None else None
+
+    async def set(self, key: str, value: str, stored_at: float) -> int:
+        """Store ``value`` and return how many least recently used entries were evicted."""
+        return await asyncio.to_thread(self._set, key, value, stored_at)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+
+class SearchResultCache:
+    """TTL cache in front of a search function that collapses concurrent identical lookups."""
+
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._attributes = {"backend": backend.name}
+
+    async def get_or_search(self, query: str, max_results: int, search) -> str:
+        """Return the cached result for ``query`` or await ``search(query)`` and cache it."""
+        key = f"{max_results}:{normalize_query(query)}"
+
+        entry = await self.backend.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if time.time() - stored_at <= self.ttl_seconds:
+                cache_hits.add(1, self._attributes)
+                return value
+            await self.backend.delete(key)
+            cache_evictions.add(1, {**self._attributes, "reason": "expired"})
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            # an identical search is already running, share its result
+            cache_hits.add(1, {**self._attributes, "in_flight": True})
+            return await asyncio.shield(in_flight)
+
+        cache_misses.add(1, self._attributes)
+        # the search runs as its own task: a cancelled caller stops waiting, the search
+        # goes on for the others waiting for the same query and its result is still cached
+        in_flight = asyncio.ensure_future(self._search_and_store(key, query, search))
+        self._in_flight[key] = in_flight
+        in_flight.add_done_callback(functools.partial(self._search_done, key))
+        return await asyncio.shield(in_flight)
+
+    async def _search_and_store(self, key: str, query: str, search) -> str:
+        value = await search(query)
+        # stored before the key leaves _in_flight, so no lookup falls in between
+        evicted = await self.backend.set(key, value, time.time())
+        if evicted:
+            cache_evictions.add(evicted, {**self._attributes, "reason": "size"})
+        return value
+
+    def _search_done(self, key: str, in_flight: asyncio.Future):
+        if self._in_flight.get(key) is in_flight:
+            del self._in_flight[key]
+        if not in_flight.cancelled():
+            # mark the exception as retrieved in case nobody was waiting for it any more
+            in_flight.exception()
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+CHUNKS_FILE = "chunks.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_FILE = "index.usearch"
+
+
+def content_hash(documents) -> str:
+    """Hash the text and metadata of the loaded documents."""
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(document.page_content.encode())
+        digest.update(json.dumps(document.metadata, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def chunk_hash(document) -> str:
+    """Content address of a single chunk."""
+    digest = hashlib.sha256(document.page_content.encode())
+    digest.update(json.dumps(document.metadata, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def probe_etag(url: str, timeout: float = 10.0) -> str | None:
+    """Return the ETag of ``url`` without downloading it, or None if the server has none."""
+    import requests
+
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning("Could not probe ETag of %s: %s", url, e)
+        return None
+    return response.headers.get("ETag")
+
+
+class WebpageIndexCache:
+    """On-disk cache of the chunks, embeddings and USearch index of one webpage.
+
+    The cache directory is derived from the URL, chunk size and embedder name. The
+    manifest in it records the ETag and content hash the index was built from, so a
+    later build can reuse the index when either of them still matches.
+
+    Chunks are content-addressed: when the page changes, only chunks with a new hash
+    are embedded and the vectors of chunks that disappeared are removed from the index.
+    """
+
+    def __init__(self, cache_dir: str, webpage_url: str, chunk_size: int, embedder_name: str):
+        self.webpage_url = webpage_url
+        self.chunk_size = chunk_size
+        self.embedder_name = str(embedder_name)
+        key = hashlib.sha256(f"{webpage_url}\n{chunk_size}\n{self.embedder_name}".encode()).hexdigest()[:32]
+        self.path = Path(cache_dir).expanduser() / key
+
+    def _read_manifest(self) -> dict | None:
+        try:
+            return json.loads((self.path / MANIFEST_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def matches(self, etag: str | None = None, page_hash: str | None = None) -> bool:
+        """Return True if the cached index was built from the given ETag or content hash."""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return False
+        if etag is not None and manifest.get("etag") == etag:
+            return True
+        return page_hash is not None and manifest.get("content_hash") == page_hash
+
+    def load(self, embeddings):
+        """Memory-map the cached index and return it as a USearch vector store."""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import USearch
+        from langchain_core.documents import Document
+        from usearch.index import Index
+
+        chunks = json.loads((self.path / CHUNKS_FILE).read_text())
+        index = Index.restore(str(self.path / INDEX_FILE), view=True)
+        ids = [str(chunk["key"]) for chunk in chunks]
+        docstore = InMemoryDocstore({
+            str(chunk["key"]): Document(page_content=chunk["page_content"], metadata=chunk["metadata"])
+            for chunk in chunks
+        })
+        logger.info("Loaded %d cached chunks for %s from %s", len(chunks), self.webpage_url, self.path)
+        return USearch(embeddings, index, docstore, ids)
+
+    def _load_previous(self):
+        """Return the cached chunks and their vectors, or None if there is nothing to update."""
+        manifest = self._read_manifest()
+        if manifest is None or "next_key" not in manifest:
+            return None
+        try:
+            chunks = json.loads((self.path / CHUNKS_FILE).read_text())
+            vectors = np.load(self.path / EMBEDDINGS_FILE, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(chunks) != len(vectors):
+            return None
+        return manifest, chunks, vectors
+
+    async def update(self, documents, embeddings, etag: str | None, page_hash: str):
+        """Bring the cache in line with ``documents`` and return the vector store.
+
+        Only chunks whose hash is not cached yet are embedded; the USearch index is
+        updated in place and saved together with the chunks and embeddings.
+        """
+        from usearch.index import Index
+
+        # identical chunks would only be returned twice by the retriever
+        documents_by_hash = {}
+        for document in documents:
+            documents_by_hash.setdefault(chunk_hash(document), document)
+
+        previous = self._load_previous()
+        if previous is not None:
+            manifest, old_chunks, old_vectors = previous
+            next_key = manifest["next_key"]
+            index = Index.restore(str(self.path / INDEX_FILE))
+        else:
+            if not documents_by_hash:
+                # nothing to embed and no cached index to learn the dimension from: nothing
+                # is cached, so the next build tries again
+                from langchain_core.vectorstores import InMemoryVectorStore
+
+                logger.warning("No chunks for %s, the webpage_query tool has nothing to search", self.webpage_url)
+                return InMemoryVectorStore(embeddings)
+            old_chunks, old_vectors, next_key, index = [], None, 0, None
+        old_rows = {chunk["hash"]: row for row, chunk in enumerate(old_chunks)}
+
+        new_hashes = [hash_ for hash_ in documents_by_hash if hash_ not in old_rows]
+        removed_keys = [chunk["key"] for chunk in old_chunks if chunk["hash"] not in documents_by_hash]
+
+        new_vectors = np.asarray(
+            await embeddings.aembed_documents([documents_by_hash[hash_].page_content for hash_ in new_hashes]),
+            dtype=np.float32,
+        ) if new_hashes else None
+        if index is None:
+            index = Index(ndim=new_vectors.shape[1], metric="cos")
+        if removed_keys:
+            index.remove(np.asarray(removed_keys, dtype=np.uint64))
+        new_keys = np.arange(next_key, next_key + len(new_hashes), dtype=np.uint64)
+        if new_hashes:
+            index.add(new_keys, new_vectors)
+        logger.info("Updated index for %s: %d chunks embedded, %d removed, %d reused", self.webpage_url,
+                    len(new_hashes), len(removed_keys), len(documents_by_hash) - len(new_hashes))
+
+        new_rows = {hash_: row for row, hash_ in enumerate(new_hashes)}
+        chunks = []
+        vectors = []
+        for hash_, document in documents_by_hash.items():
+            if hash_ in old_rows:
+                key, vector = old_chunks[old_rows[hash_]]["key"], old_vectors[old_rows[hash_]]
+            else:
+                key, vector = int(new_keys[new_rows[hash_]]), new_vectors[new_rows[hash_]]
+            chunks.append({"key": key, "hash": hash_, "page_content": document.page_content, "metadata": document.metadata})
+            vectors.append(vector)
+        # a page without chunks left keeps the shape of its embeddings
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), index.ndim)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        # invalidate first, so a partially written cache is never considered valid
+        (self.path / MANIFEST_FILE).unlink(missing_ok=True)
+        self._replace(CHUNKS_FILE, lambda tmp: tmp.write_text(json.dumps(chunks, default=str)))
+        self._replace(EMBEDDINGS_FILE, lambda tmp: np.save(tmp, vectors, allow_pickle=False))
+        self._replace(INDEX_FILE, lambda tmp: index.save(str(tmp)))
+        manifest = {
+            "webpage_url": self.webpage_url,
+            "chunk_size": self.chunk_size,
+            "embedder_name": self.embedder_name,
+            "etag": etag,
+            "content_hash": page_hash,
+            "ndim": int(index.ndim),
+            "count": len(chunks),
+            # keys of removed chunks are never handed out again
+            "next_key": int(next_key + len(new_hashes)),
+        }
+        self._replace(MANIFEST_FILE, lambda tmp: tmp.write_text(json.dumps(manifest, indent=2)))
+        logger.info("Cached %d chunks for %s in %s", len(chunks), self.webpage_url, self.path)
+        return self.load(embeddings)
+
+    def _replace(self, name: str, write):
+        target = self.path / name
+        # keep the real suffix, np.save appends ".npy" otherwise
+        tmp = target.with_name(f".{os.getpid()}.tmp.{name}")
+        write(tmp)
+        os.replace(tmp, target)
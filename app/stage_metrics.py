@@ -0,0 +1,91 @@
+"""Latency histograms and spans of the query pipeline stages.
+
+Every stage of a query (response cache lookup, input rails, NAT workflow, output
+rails) runs inside ``pipeline_stage``. It opens a ``pipeline.<stage>`` child span of
+the current ``prompt`` span and records the stage time, taken from the monotonic
+``perf_counter`` clock, in the ``pipeline.stage.duration`` histogram with the
+attributes
+
+    pipeline.stage   response_cache, input_rails, nat_workflow or output_rails
+    guardrail.mode   guardrails or no_guardrails
+    outcome          ok, blocked, error or cancelled (a discarded speculative run)
+    config.type      local, build or brev, from update_config.py
+
+The histogram goes through the meter provider Traceloop sets up, exported with delta
+temporality to the collector and from there to Dynatrace. It is recorded in
+milliseconds so the default bucket boundaries (5 ms to 10 s) fit the stage times.
+"""
+
+import asyncio
+import contextlib
+import time
+
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Status, StatusCode
+
+STAGE_RESPONSE_CACHE = "response_cache"
+STAGE_INPUT_RAILS = "input_rails"
+STAGE_NAT_WORKFLOW = "nat_workflow"
+STAGE_OUTPUT_RAILS = "output_rails"
+
+OUTCOME_OK = "ok"
+OUTCOME_BLOCKED = "blocked"
+OUTCOME_ERROR = "error"
+OUTCOME_CANCELLED = "cancelled"
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+stage_duration = meter.create_histogram(
+    "pipeline.stage.duration", unit="ms", description="Time spent in one stage of the query pipeline")
+
+
+class StageOutcome:
+    """Outcome of a running stage, ok unless the code in the stage sets another one."""
+
+    def __init__(self):
+        self.value = OUTCOME_OK
+
+
+@contextlib.contextmanager
+def pipeline_stage(stage, guardrail_mode, config_type, context=None, current=True):
+    """Time a pipeline stage, record it in the stage histogram and as a child span.
+
+    Args:
+        stage: one of the STAGE_* names
+        guardrail_mode: ``guardrails`` or ``no_guardrails``
+        config_type: config type of the active configs
+        context: parent context of the span, by default the current one
+        current: make the stage span the current span; pass False when the stage
+            spans the yields of an async generator, whose context may change in between
+
+    Yields a StageOutcome; set its ``value`` to OUTCOME_BLOCKED or OUTCOME_ERROR when the
+    stage did not pass. Exceptions set OUTCOME_ERROR and cancellation OUTCOME_CANCELLED.
+    """
+    outcome = StageOutcome()
+    span = tracer.start_span(f"pipeline.{stage}", context=context)
+    scope = trace.use_span(span, record_exception=False, set_status_on_exception=False) if current \
+        else contextlib.nullcontext()
+    start_time = time.perf_counter()
+    try:
+        with scope:
+            yield outcome
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome.value = OUTCOME_CANCELLED
+        raise
+    except Exception as e:
+        outcome.value = OUTCOME_ERROR
+        span.record_exception(e)
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        attributes = {
+            "pipeline.stage": stage,
+            "guardrail.mode": guardrail_mode,
+            "outcome": outcome.value,
+            "config.type": config_type,
+        }
+        stage_duration.record(duration_ms, attributes)
+        span.set_attributes(attributes)
+        if outcome.value == OUTCOME_ERROR:
+            span.set_status(Status(StatusCode.ERROR))
+        span.end()
@@ -0,0 +1,282 @@
+"""Background start-up of the pipeline components, with a start-up profile.
+
+Importing NeMo Guardrails and the Traceloop SDK, building ``LLMRails`` (models and
+the flow embedding index) and building the NAT workflow take seconds. ``Startup``
+runs these initializers one after another in a background thread and times each of
+them, so the Streamlit app can render its page right away and show the progress
+until the components are ready.
+
+With ``STARTUP_PROFILE=1`` the app prints the initializer timing table when the
+start-up finishes, together with an ``-X importtime`` report of the heavy modules.
+``python app/startup.py`` prints both without starting the app.
+
+A failed step (e.g. a model endpoint that is not up yet) is retried with exponential
+backoff; the start-up only fails once a step failed STARTUP_RETRIES more times. The
+warm-up query is only an optimization: if it fails, the failure is logged and reported
+in the status, but the replica still gets ready. When the start-up finished, its status is written to a readiness marker file, which
+``python app/warmup.py --check`` and ``--live`` read for the container probes of the
+Streamlit app (the server answers ``GET /readyz`` and ``GET /healthz`` instead).
+"""
+
+# environment variables used:
+# - STARTUP_PROFILE: print the import time report and initializer timings at start-up (default: false)
+# - STARTUP_READY_FILE: readiness marker written once the start-up finished (default: /tmp/nat-guardrails-ready.json)
+# - STARTUP_RETRIES: retries of a failed start-up step before the start-up fails (default: 5)
+# - STARTUP_RETRY_SECONDS: wait before the first retry, doubled for every further one, at most 60s (default: 2)
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+READY_FILE = Path(os.environ.get("STARTUP_READY_FILE", "/tmp/nat-guardrails-ready.json"))
+RETRIES = int(os.environ.get("STARTUP_RETRIES", "5"))
+RETRY_SECONDS = float(os.environ.get("STARTUP_RETRY_SECONDS", "2"))
+MAX_RETRY_SECONDS = 60.0
+# steps whose failure is reported but neither retried nor failing the start-up
+OPTIONAL_STEPS = ("warmup_queries",)
+
+# modules whose import dominates the start-up, measured by import_time_report()
+HEAVY_MODULES = (
+    "nemoguardrails",
+    "traceloop.sdk",
+    "nat.runtime.loader",
+    "langchain_core",
+    "opentelemetry.exporter.otlp.proto.http.trace_exporter",
+    "numpy",
+    "pipeline",
+)
+
+_IMPORT_TIME_RE = re.compile(r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<indent>\s+)(?P<module>\S+)")
+
+
+def profile_enabled():
+    return os.environ.get("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+
+
+class Startup:
+    """Run named initializers in a background thread and time each of them.
+
+    Each step is ``(name, function)``; the function gets the dict of the results of
+    the earlier steps and its own result is stored under its name. A step that raises
+    is retried up to ``retries`` times, waiting ``retry_seconds`` before the first retry
+    and twice as long before every further one; after that the start-up stops and
+    ``error`` tells which step failed. A step in ``optional_steps`` runs once, and its
+    failure only ends up in ``warnings``. With a ``ready_file`` the final status, ready or
+    failed, is written to it.
+    """
+
+    def __init__(self, steps, name="startup", ready_file=None, retries=RETRIES, retry_seconds=RETRY_SECONDS,
+                 optional_steps=OPTIONAL_STEPS):
+        self.steps = steps
+        self.name = name
+        self.ready_file = ready_file
+        self.retries = retries
+        self.retry_seconds = retry_seconds
+        self.optional_steps = optional_steps
+        self.components = {}
+        self.warnings = {}
+        self.timings = []
+        self.current_step = None
+        self.attempt = 0
+        self.last_error = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the initializers in a daemon thread and return self."""
+        threading.Thread(target=self.run, name=self.name, daemon=True).start()
+        return self
+
+    def run(self):
+        """Run the initializers in the calling thread."""
+        self.started_at = time.perf_counter()
+        if self.ready_file:
+            # a marker left by an earlier process must not report this one as ready
+            Path(self.ready_file).unlink(missing_ok=True)
+        try:
+            for step_name, step in self.steps:
+                if not self._run_step(step_name, step):
+                    break
+        finally:
+            with self._lock:
+                self.current_step = None
+                self.finished_at = time.perf_counter()
+            self._done.set()
+        if self.ready_file:
+            write_ready_file(self.ready_file, self.status())
+        if profile_enabled():
+            print(import_time_report())
+            print(self.timing_table())
+        return self
+
+    def _run_step(self, step_name, step):
+        """Run one step with its retries, return True if it succeeded."""
+        with self._lock:
+            self.current_step = step_name
+        step_start = time.perf_counter()
+        try:
+            if step_name in self.optional_steps:
+                try:
+                    self.components[step_name] = step(self.components)
+                except Exception as e:
+                    with self._lock:
+                        self.warnings[step_name] = str(e)
+                    self.components[step_name] = None
+                    print(f"⚠️ Optional start-up step '{step_name}' failed, continuing without it: {e}")
+                return True
+            for attempt in range(self.retries + 1):
+                with self._lock:
+                    self.attempt = attempt
+                try:
+                    self.components[step_name] = step(self.components)
+                    return True
+                except Exception as e:
+                    with self._lock:
+                        self.last_error = f"{step_name}: {e}"
+                    if attempt == self.retries:
+                        self.error = self.last_error
+                        print(f"❌ Start-up step '{step_name}' failed: {e}")
+                        return False
+                    delay = min(self.retry_seconds * 2 ** attempt, MAX_RETRY_SECONDS)
+                    print(f"⚠️ Start-up step '{step_name}' failed, retry {attempt + 1}/{self.retries} "
+                          f"in {delay:.0f}s: {e}")
+                    time.sleep(delay)
+        finally:
+            with self._lock:
+                self.timings.append((step_name, time.perf_counter() - step_start))
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        return self.done and self.error is None
+
+    def wait(self, timeout=None):
+        """Block until the start-up finished, return True if it succeeded."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self):
+        """Return the state, the running step and the step timings as a dict."""
+        with self._lock:
+            if self.started_at is None:
+                state = "pending"
+            elif not self._done.is_set():
+                state = "starting"
+            else:
+                state = "failed" if self.error else "ready"
+            end = self.finished_at or time.perf_counter()
+            return {
+                "state": state,
+                "current_step": self.current_step,
+                "retry": self.attempt if self.current_step else 0,
+                "last_error": self.last_error,
+                "error": self.error,
+                "warnings": dict(self.warnings),
+                "elapsed_seconds": end - self.started_at if self.started_at is not None else 0.0,
+                "steps": [{"name": step_name, "seconds": seconds} for step_name, seconds in self.timings],
+            }
+
+    def timing_table(self):
+        """Return the step timings formatted as a table."""
+        status = self.status()
+        lines = [f"⏱️  Start-up profile ({status['state']})", f"{'step':<24} {'seconds':>8}"]
+        lines += [f"{step['name']:<24} {step['seconds']:>8.2f}" for step in status["steps"]]
+        lines.append(f"{'total':<24} {status['elapsed_seconds']:>8.2f}")
+        return "\n".join(lines)
+
+
+def write_ready_file(path, status):
+    """Write the start-up status of this process to the readiness marker, atomically."""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({**status, "pid": os.getpid(), "written_at": time.time()}))
+    os.replace(tmp_path, path)
+
+
+def read_ready_file(path=READY_FILE):
+    """Return the status in the readiness marker, or None if there is no marker of a running process."""
+    try:
+        status = json.loads(Path(path).read_text())
+        os.kill(status["pid"], 0)
+    except (OSError, ValueError, KeyError):
+        return None
+    return status
+
+
+def pipeline_steps(service_name, event_loop=None, warmup_queries=None):
+    """Start-up steps of the guarded pipeline, in dependency order.
+
+    Args:
+        service_name: service name of the Traceloop SDK
+        event_loop: loop the NAT workflow and the guardrails run on, with a ``run(coro)``
+            method (``BackgroundLoop`` or ``RunningLoop``); by default a new ``BackgroundLoop``
+        warmup_queries: send one synthetic query through every stage after the start-up,
+            by default the WARMUP_QUERIES environment variable (see warmup.py)
+    """
+    import pipeline
+    import warmup
+    from async_runtime import BackgroundLoop
+
+    if warmup_queries is None:
+        warmup_queries = warmup.queries_enabled()
+
+    # the rails steps are skipped (None) when there is no guardrails config
+    return [
+        ("traceloop", lambda components: pipeline.init_traceloop(service_name)),
+        ("logging", lambda components: pipeline.configure_logging()),
+        ("event_loop", lambda components: event_loop or BackgroundLoop(name="nat-guardrails-event-loop")),
+        ("http_pool", lambda components: pipeline.load_http_pool()),
+        ("guardrails", lambda components: pipeline.load_guardrails()),
+        ("local_input_rails", lambda components: pipeline.load_local_input_rails(
+            components["guardrails"]) if components["guardrails"] else None),
+        ("parallel_input_rails", lambda components: pipeline.load_parallel_input_rails(
+            components["guardrails"], components["local_input_rails"]) if components["guardrails"] else None),
+        ("response_cache", lambda components: pipeline.load_response_cache()),
+        ("nat_workflow", lambda components: components["event_loop"].run(pipeline.warm_nat_workflow())),
+    ] + ([("warmup_queries", lambda components: components["event_loop"].run(warmup.warm_up_stages(components)))]
+         if warmup_queries else [])
+
+
+def import_time_report(modules=HEAVY_MODULES, limit=15):
+    """Import ``modules`` in a fresh interpreter with ``-X importtime``, return the slowest ones as a table."""
+    code = "\n".join(f"try:\n    import {module}\nexcept ImportError:\n    pass" for module in modules)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=APP_DIR,
+                               capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        # top-level packages only, their cumulative time includes their submodules
+        if match and len(match["indent"]) == 1:
+            rows.append((int(match["cumulative"]), int(match["self"]), match["module"]))
+    rows.sort(reverse=True)
+    lines = [f"⏱️  Import time report ({sys.executable} -X importtime)",
+             f"{'module':<56} {'cumulative (ms)':>16} {'self (ms)':>10}"]
+    lines += [f"{module:<56} {cumulative / 1000:>16.1f} {self_time / 1000:>10.1f}"
+              for cumulative, self_time, module in rows[:limit]]
+    lines.append(f"{'total':<56} {sum(row[0] for row in rows) / 1000:>16.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(APP_DIR))
+    from pipeline import SERVICE_NAME
+
+    startup = Startup(pipeline_steps(SERVICE_NAME)).run()
+    if not profile_enabled():
+        print(import_time_report())
+        print(startup.timing_table())
+    if "event_loop" in startup.components:
+        startup.components["event_loop"].stop()
+    raise SystemExit(0 if startup.ready else 1)
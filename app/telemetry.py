@@ -0,0 +1,124 @@
+"""Telemetry profiles for the span export of the Traceloop SDK.
+
+``development`` exports every span synchronously when it ends (``disable_batch=True``),
+which shows spans immediately but puts an OTLP round trip on the request path.
+``production`` hands spans to a background thread that exports them in batches. Its
+queue is bounded: when the collector is slow or down, new spans are dropped instead of
+blocking requests or growing memory, and the drops are counted.
+
+Environment variables:
+    - TELEMETRY_PROFILE: 'production' or 'development' (default: production)
+    - OTEL_BSP_MAX_QUEUE_SIZE: spans waiting for export before new ones are dropped (default: 2048)
+    - OTEL_BSP_SCHEDULE_DELAY: flush interval in milliseconds (default: 1000)
+    - OTEL_BSP_MAX_EXPORT_BATCH_SIZE: spans per export request (default: 512)
+    - OTEL_BSP_EXPORT_TIMEOUT: timeout of one export request in milliseconds (default: 10000)
+"""
+
+import os
+import threading
+
+from opentelemetry import metrics
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+PROFILE_PRODUCTION = "production"
+PROFILE_DEVELOPMENT = "development"
+
+meter = metrics.get_meter(__name__)
+dropped_spans_counter = meter.create_counter(
+    "otel.exporter.spans.dropped", description="Spans dropped because the export queue was full")
+failed_spans_counter = meter.create_counter(
+    "otel.exporter.spans.failed", description="Spans the collector did not accept")
+
+
+class _CountingExporter(SpanExporter):
+    """Passes batches on to the real exporter and reports how many spans left the queue."""
+
+    def __init__(self, exporter, on_exported):
+        self._exporter = exporter
+        self._on_exported = on_exported
+
+    def export(self, spans):
+        try:
+            result = self._exporter.export(spans)
+        except Exception:
+            result = SpanExportResult.FAILURE
+            raise
+        finally:
+            self._on_exported(len(spans))
+            if result != SpanExportResult.SUCCESS:
+                failed_spans_counter.add(len(spans))
+        return result
+
+    def shutdown(self):
+        return self._exporter.shutdown()
+
+    def force_flush(self, timeout_millis=30000):
+        return self._exporter.force_flush(timeout_millis)
+
+
+class DroppingBatchSpanProcessor(BatchSpanProcessor):
+    """BatchSpanProcessor that never blocks and counts the spans it drops.
+
+    Spans are admitted while fewer than ``max_queue_size`` spans are waiting for or in
+    export; past that, ``on_end`` drops the span, increments ``dropped_spans`` and the
+    ``otel.exporter.spans.dropped`` counter, and returns right away.
+    """
+
+    def __init__(self, span_exporter, max_queue_size, schedule_delay_millis, max_export_batch_size,
+                 export_timeout_millis):
+        self.max_queue_size = max_queue_size
+        self.dropped_spans = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        super().__init__(
+            _CountingExporter(span_exporter, self._exported),
+            max_queue_size=max_queue_size,
+            schedule_delay_millis=schedule_delay_millis,
+            max_export_batch_size=max_export_batch_size,
+            export_timeout_millis=export_timeout_millis,
+        )
+
+    def on_end(self, span):
+        if not (span.context and span.context.trace_flags.sampled):
+            return
+        with self._pending_lock:
+            if self._pending >= self.max_queue_size:
+                self.dropped_spans += 1
+                dropped_spans_counter.add(1)
+                return
+            self._pending += 1
+        super().on_end(span)
+
+    def _exported(self, count):
+        with self._pending_lock:
+            self._pending -= count
+
+
+def telemetry_profile():
+    """Return the configured telemetry profile."""
+    return os.environ.get("TELEMETRY_PROFILE", PROFILE_PRODUCTION).lower()
+
+
+def create_span_processor(api_endpoint, headers=None, profile=None):
+    """Return the span processor for ``profile``, or None for synchronous export.
+
+    ``api_endpoint`` is the OTLP/HTTP base URL as passed to ``Traceloop.init``.
+    """
+    if (profile or telemetry_profile()) == PROFILE_DEVELOPMENT:
+        return None
+
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    export_timeout_millis = int(os.environ.get("OTEL_BSP_EXPORT_TIMEOUT", "10000"))
+    exporter = OTLPSpanExporter(
+        endpoint=f"{api_endpoint.rstrip('/')}/v1/traces",
+        headers=headers,
+        timeout=export_timeout_millis / 1000,
+    )
+    return DroppingBatchSpanProcessor(
+        exporter,
+        max_queue_size=int(os.environ.get("OTEL_BSP_MAX_QUEUE_SIZE", "2048")),
+        schedule_delay_millis=int(os.environ.get("OTEL_BSP_SCHEDULE_DELAY", "1000")),
+        max_export_batch_size=int(os.environ.get("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+        export_timeout_millis=export_timeout_millis,
+    )
@@ -0,0 +1,88 @@
+"""Tests of the semantic response cache (response_cache.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from response_cache import SemanticResponseCache, _Namespace  # noqa: E402
+
+VECTORS = {
+    "what is dynatrace": [1.0, 0.0, 0.0],
+    "what's dynatrace": [0.99, 0.1, 0.0],
+    "how do traces work": [0.0, 1.0, 0.0],
+    "best pasta recipe": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbedder:
+    """Embedder with fixed vectors that counts its requests."""
+
+    def __init__(self):
+        self.embedded = []
+
+    async def embed(self, prompt):
+        key = prompt.casefold().rstrip("?")
+        self.embedded.append(key)
+        vector = np.asarray(VECTORS[key], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+def make_cache(**kwargs):
+    embedder = FakeEmbedder()
+    return SemanticResponseCache("config.yml", embedder=embedder, threshold=0.95, **kwargs), embedder
+
+
+def test_exact_match_needs_no_embedding():
+    cache, embedder = make_cache()
+    asyncio.run(cache.store("What is Dynatrace?", "guardrails", "An observability platform", 2.0))
+    embedder.embedded.clear()
+    assert cache.lookup_exact("what is  dynatrace", "guardrails").answer == "An observability platform"
+    assert cache.lookup_exact("what is dynatrace", "no_guardrails") is None
+    assert embedder.embedded == []
+
+
+def test_similar_prompt_is_found_by_embedding():
+    cache, _ = make_cache()
+
+    async def run():
+        await cache.store("What is Dynatrace?", "guardrails", "An observability platform", 2.0)
+        await cache.store("How do traces work?", "guardrails", "Spans", 2.0)
+        return await cache.lookup("What's Dynatrace?", "guardrails"), await cache.lookup("Best pasta recipe", "guardrails")
+
+    (similar, vector), (unrelated, _) = asyncio.run(run())
+    assert similar.answer == "An observability platform" and similar.similarity > 0.95
+    assert vector is not None
+    assert unrelated is None
+
+
+def test_expired_entries_are_dropped_during_the_lookup():
+    cache, _ = make_cache(ttl_seconds=0)
+
+    async def run():
+        await cache.store("What is Dynatrace?", "guardrails", "An observability platform", 2.0)
+        await asyncio.sleep(0.01)
+        return await cache.lookup("What's Dynatrace?", "guardrails")
+
+    hit, _ = asyncio.run(run())
+    assert hit is None
+    assert cache._namespaces["guardrails"].matrix() == ([], None)
+
+
+def test_matrix_is_updated_in_place():
+    namespace = _Namespace()
+    vectors = {f"prompt {index}": np.full(4, index, dtype=np.float32) for index in range(40)}
+    for key, vector in vectors.items():
+        namespace.put(key, vector, key)
+    for index in range(0, 40, 3):
+        namespace.pop(f"prompt {index}")
+    namespace.put("prompt 1", np.full(4, 100, dtype=np.float32), "prompt 1")
+    vectors["prompt 1"] = np.full(4, 100, dtype=np.float32)
+
+    keys, matrix = namespace.matrix()
+    assert sorted(keys) == sorted(namespace.entries)
+    for key, row in zip(keys, matrix):
+        assert np.array_equal(row, vectors[key])
@@ -0,0 +1,145 @@
+"""Tests of the tavily_search result cache (src/nat_simple_web_query/search_cache.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nat_simple_web_query.search_cache import InMemoryCacheBackend, SearchResultCache, normalize_query  # noqa: E402
+
+
+class FakeSearch:
+    """Search function that counts its calls and can be held until released."""
+
+    def __init__(self, hold=False):
+        self.calls = []
+        self.release = asyncio.Event()
+        if not hold:
+            self.release.set()
+
+    async def __call__(self, query):
+        self.calls.append(query)
+        await self.release.wait()
+        return f"results for {query}"
+
+
+def test_normalize_query():
+    assert normalize_query("  What is   Dynatrace?? ") == "what is dynatrace"
+
+
+def test_identical_queries_are_searched_once():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=60)
+        search = FakeSearch()
+        first = await cache.get_or_search("What is Dynatrace?", 5, search)
+        second = await cache.get_or_search("what is  dynatrace", 5, search)
+        return first, second, search.calls
+
+    first, second, calls = asyncio.run(run())
+    assert first == second == "results for What is Dynatrace?"
+    assert calls == ["What is Dynatrace?"]
+
+
+def test_max_results_is_part_of_the_key():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=60)
+        search = FakeSearch()
+        await cache.get_or_search("nat", 5, search)
+        await cache.get_or_search("nat", 10, search)
+        return search.calls
+
+    assert asyncio.run(run()) == ["nat", "nat"]
+
+
+def test_expired_entries_are_searched_again():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=0)
+        search = FakeSearch()
+        await cache.get_or_search("nat", 5, search)
+        await asyncio.sleep(0.01)
+        await cache.get_or_search("nat", 5, search)
+        return search.calls
+
+    assert asyncio.run(run()) == ["nat", "nat"]
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def run():
+        backend = InMemoryCacheBackend(2)
+        cache = SearchResultCache(backend, ttl_seconds=60)
+        search = FakeSearch()
+        for query in ("a", "b", "a", "c", "a", "b"):
+            await cache.get_or_search(query, 5, search)
+        return search.calls
+
+    # "b" was evicted by "c", "a" stayed because it was used again
+    assert asyncio.run(run()) == ["a", "b", "c", "b"]
+
+
+def test_concurrent_identical_queries_share_one_search():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=60)
+        search = FakeSearch(hold=True)
+        lookups = [asyncio.create_task(cache.get_or_search("nat", 5, search)) for _ in range(3)]
+        await asyncio.sleep(0)
+        search.release.set()
+        return await asyncio.gather(*lookups), search.calls
+
+    results, calls = asyncio.run(run())
+    assert results == ["results for nat"] * 3
+    assert calls == ["nat"]
+
+
+def test_cancelled_first_caller_does_not_fail_the_others():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=60)
+        search = FakeSearch(hold=True)
+        first = asyncio.create_task(cache.get_or_search("nat", 5, search))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_search("nat", 5, search))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        search.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, await cache.get_or_search("nat", 5, search), search.calls
+
+    second, cached, calls = asyncio.run(run())
+    assert second == cached == "results for nat"
+    assert calls == ["nat"]
+
+
+def test_search_of_cancelled_caller_is_still_cached():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=60)
+        search = FakeSearch(hold=True)
+        lookup = asyncio.create_task(cache.get_or_search("nat", 5, search))
+        await asyncio.sleep(0)
+        lookup.cancel()
+        search.release.set()
+        await asyncio.sleep(0.01)
+        return await cache.get_or_search("nat", 5, search), search.calls
+
+    assert asyncio.run(run()) == ("results for nat", ["nat"])
+
+
+def test_failed_search_is_not_cached():
+    async def run():
+        cache = SearchResultCache(InMemoryCacheBackend(16), ttl_seconds=60)
+        calls = []
+
+        async def failing_search(query):
+            calls.append(query)
+            if len(calls) == 1:
+                raise RuntimeError("Tavily unavailable")
+            return f"results for {query}"
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_search("nat", 5, failing_search)
+        return await cache.get_or_search("nat", 5, failing_search), calls
+
+    assert asyncio.run(run()) == ("results for nat", ["nat", "nat"])
@@ -0,0 +1,51 @@
+"""Tests of the background start-up (startup.py)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from startup import Startup  # noqa: E402
+
+
+def failing(times, result="built"):
+    """Step that raises the first ``times`` calls, then returns ``result``."""
+    calls = []
+
+    def step(components):
+        calls.append(len(calls))
+        if len(calls) <= times:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+        return result
+
+    step.calls = calls
+    return step
+
+
+def test_failed_step_is_retried():
+    step = failing(2)
+    startup = Startup([("guardrails", step)], retries=3, retry_seconds=0).run()
+    assert startup.ready
+    assert startup.components["guardrails"] == "built"
+    assert len(step.calls) == 3
+
+
+def test_step_failing_all_retries_fails_the_start_up():
+    startup = Startup([("guardrails", failing(5)), ("nat_workflow", failing(0))], retries=1, retry_seconds=0).run()
+    assert not startup.ready
+    assert startup.status()["state"] == "failed"
+    assert startup.error == "guardrails: attempt 2 failed"
+    assert "nat_workflow" not in startup.components
+
+
+def test_failed_warm_up_query_does_not_fail_the_start_up(tmp_path):
+    warmup = failing(1)
+    ready_file = tmp_path / "ready.json"
+    startup = Startup([("nat_workflow", failing(0)), ("warmup_queries", warmup)], ready_file=ready_file,
+                      retries=3, retry_seconds=0).run()
+    assert startup.ready
+    assert startup.status()["warnings"] == {"warmup_queries": "attempt 1 failed"}
+    assert startup.components["warmup_queries"] is None
+    # not retried, the first user query warms up the pipeline instead
+    assert len(warmup.calls) == 1
+    assert '"state": "ready"' in ready_file.read_text()
@@ -0,0 +1,93 @@
+"""Tests of the embedding topic classifier (guardrails_config/topic_classifier.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "guardrails_config"))
+
+from topic_classifier import OFF_TOPIC, ON_TOPIC, UNCERTAIN, EmbeddingTopicClassifier  # noqa: E402
+
+EXAMPLES = {
+    "observability": (True, ["traces", "metrics"]),
+    "food": (False, ["pasta"]),
+}
+
+# unit vectors: one axis per topic, prompts in between are ambiguous
+VECTORS = {
+    "traces": [1.0, 0.0, 0.0],
+    "metrics": [0.9, 0.1, 0.0],
+    "pasta": [0.0, 1.0, 0.0],
+    "distributed tracing": [0.95, 0.05, 0.0],
+    "pizza": [0.05, 0.95, 0.0],
+    "pasta metrics": [0.7, 0.7, 0.0],
+    "chess": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbedder:
+    """Embedder with fixed vectors that counts the texts it embedded."""
+
+    embedder_name = "fake"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.embedded = []
+
+    def _vector(self, text):
+        vector = np.asarray(VECTORS[text], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    async def embed(self, text):
+        if self.fail:
+            raise RuntimeError("embedder unavailable")
+        self.embedded.append(text)
+        return self._vector(text)
+
+    async def embed_texts(self, texts):
+        self.embedded.extend(texts)
+        return np.vstack([self._vector(text) for text in texts])
+
+
+def classify(classifier, *texts):
+    async def run():
+        return [(await classifier.classify(text)).label for text in texts]
+
+    return asyncio.run(run())
+
+
+def test_confident_predictions_are_decided_locally():
+    classifier = EmbeddingTopicClassifier(EXAMPLES, min_similarity=0.5, min_margin=0.2, embedder=FakeEmbedder())
+    assert classify(classifier, "distributed tracing", "pizza") == [ON_TOPIC, OFF_TOPIC]
+
+
+def test_ambiguous_and_unrelated_prompts_are_uncertain():
+    classifier = EmbeddingTopicClassifier(EXAMPLES, min_similarity=0.5, min_margin=0.2, embedder=FakeEmbedder())
+    # close to both labels, close to neither
+    assert classify(classifier, "pasta metrics", "chess") == [UNCERTAIN, UNCERTAIN]
+
+
+def test_missing_input_or_embedder_is_uncertain():
+    classifier = EmbeddingTopicClassifier(EXAMPLES)
+    assert classify(classifier, "traces") == [UNCERTAIN]
+    classifier.bind(FakeEmbedder())
+    assert classify(classifier, "", "   ") == [UNCERTAIN, UNCERTAIN]
+
+
+def test_embedding_failure_is_uncertain():
+    classifier = EmbeddingTopicClassifier(EXAMPLES, embedder=FakeEmbedder(fail=True))
+    assert classify(classifier, "traces") == [UNCERTAIN]
+
+
+def test_example_embeddings_are_cached_on_disk(tmp_path):
+    first = FakeEmbedder()
+    classifier = EmbeddingTopicClassifier(EXAMPLES, min_margin=0.2, cache_dir=tmp_path, embedder=first)
+    classify(classifier, "pizza")
+    assert first.embedded == ["traces", "metrics", "pasta", "pizza"]
+
+    second = FakeEmbedder()
+    classifier = EmbeddingTopicClassifier(EXAMPLES, min_margin=0.2, cache_dir=tmp_path, embedder=second)
+    assert classify(classifier, "pizza") == [OFF_TOPIC]
+    assert second.embedded == ["pizza"]
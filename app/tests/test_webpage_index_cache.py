@@ -0,0 +1,49 @@
+"""Tests of the webpage_query index cache (src/nat_simple_web_query/webpage_index_cache.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import FakeEmbeddings  # noqa: E402
+
+from nat_simple_web_query.webpage_index_cache import WebpageIndexCache  # noqa: E402
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Random embeddings that remember how many texts were embedded."""
+
+    embedded: int = 0
+
+    async def aembed_documents(self, texts):
+        self.embedded += len(texts)
+        return await super().aembed_documents(texts)
+
+
+def test_empty_first_build_returns_an_empty_store(tmp_path):
+    cache = WebpageIndexCache(str(tmp_path), "https://example.com", 1024, "embedder")
+    store = asyncio.run(cache.update([], CountingEmbeddings(size=8), None, "empty"))
+    assert store.as_retriever().invoke("anything") == []
+    # nothing was cached, the next build tries again
+    assert not cache.matches(page_hash="empty")
+
+
+def test_only_new_chunks_are_embedded(tmp_path):
+    cache = WebpageIndexCache(str(tmp_path), "https://example.com", 1024, "embedder")
+    embeddings = CountingEmbeddings(size=8)
+    asyncio.run(cache.update([Document(page_content="a"), Document(page_content="b")], embeddings, None, "v1"))
+    store = asyncio.run(cache.update([Document(page_content="b"), Document(page_content="c")], embeddings, None, "v2"))
+    assert embeddings.embedded == 3
+    assert sorted(doc.page_content for doc in store.as_retriever(search_kwargs={"k": 5}).invoke("b")) == ["b", "c"]
+    assert cache.matches(page_hash="v2")
+
+
+def test_page_without_chunks_after_a_cached_build(tmp_path):
+    cache = WebpageIndexCache(str(tmp_path), "https://example.com", 1024, "embedder")
+    embeddings = CountingEmbeddings(size=8)
+    asyncio.run(cache.update([Document(page_content="a")], embeddings, None, "v1"))
+    asyncio.run(cache.update([], embeddings, None, "v2"))
+    store = asyncio.run(cache.update([Document(page_content="a")], embeddings, None, "v3"))
+    assert [doc.page_content for doc in store.as_retriever().invoke("a")] == ["a"]
@@ -9,6 +9,12 @@ It performs two main operations:
 2. For 'brev' deployments, replaces placeholder values with actual NVIDIA model endpoint URLs
    from environment variables
 
+The generated config.yml files start with a "# config type: <type>" line, which the
+pipeline reports in the config.type attribute of its stage metrics. The http_pool
+section of the guardrails templates configures the shared connection pools of all
+model clients (app/http_pool.py); in the brev template its per-endpoint limits are
+keyed by the endpoint placeholders, so they follow the endpoint URLs.
+
 Usage:
     python app/update_config.py local   # Copies config.yml.local → config.yml
     python app/update_config.py build   # Copies config.yml.build → config.yml
@@ -26,12 +32,30 @@ Config File Locations:
 """
 
 import argparse
+import functools
 import os
-import shutil
 from pathlib import Path
 
 APP_DIR = Path(__file__).resolve().parent
 REPO_ROOT = APP_DIR.parent
+# first line of a generated config.yml, the pipeline reports the config type in its metrics
+CONFIG_TYPE_HEADER = "# config type: "
+
+def read_config_type(config_path):
+    """Return the config type a config.yml was generated from, or 'unknown'."""
+    try:
+        mtime_ns = os.stat(config_path).st_mtime_ns
+    except OSError:
+        return "unknown"
+    return _read_config_type(str(config_path), mtime_ns)
+
+@functools.lru_cache(maxsize=16)
+def _read_config_type(config_path, mtime_ns):
+    with open(config_path) as config_file:
+        first_line = config_file.readline()
+    if not first_line.startswith(CONFIG_TYPE_HEADER):
+        return "unknown"
+    return first_line[len(CONFIG_TYPE_HEADER):].strip()
 
 def copy_config_template(config_type):
     """Copy config template files to active config.yml based on config type."""
@@ -59,7 +83,7 @@ def copy_config_template(config_type):
             print(f"❌ Error: {source_file} not found")
             exit(1)
         
-        shutil.copy2(source_file, dest_file)
+        dest_file.write_text(f"{CONFIG_TYPE_HEADER}{config_type}\n" + source_file.read_text())
         print(f"✓ Copied {source_file} → {dest_file}")
 
 def update_brev_endpoint(config_type):
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Warm-up of the guarded query pipeline ahead of the first user query.
+
+The start-up in startup.py builds the components (Traceloop, guardrails, input rails,
+response cache, NAT workflow). ``warm_up_stages`` then sends one synthetic query
+through every stage on the same event loop and with the same components the users
+get, so the model clients, their connection pools and TLS sessions, the embedding
+index of the guardrails and the NAT agent are hot before the replica reports ready.
+
+The Streamlit app and the server run the warm-up as the last start-up step. It is
+best-effort: a failed warm-up query is logged and reported in the start-up status but
+does not keep the replica from getting ready, the first user query then pays the cold
+start. As a
+command it runs the same start-up once in its own process, which fills the on-disk
+caches (downloaded embedding models, the topic classifier example embeddings if
+the topic control rail is enabled and TOPIC_CLASSIFIER_CACHE_DIR is set) and checks that
+every endpoint answers, or checks the readiness marker of a running app:
+
+    python app/warmup.py            # start-up and warm-up, prints the timings, exits 1 if not ready
+    python app/warmup.py --check    # exits 0 if the app on this host is ready (readiness probe)
+    python app/warmup.py --live     # exits 1 if the start-up of the app on this host failed (liveness probe)
+"""
+
+# environment variables used:
+# - WARMUP_QUERIES: send one synthetic query through every pipeline stage during start-up (default: true)
+# - WARMUP_PROMPT: prompt of the synthetic query (default: "How does Dynatrace help an SRE?")
+
+import argparse
+import json
+import os
+import time
+
+from opentelemetry import trace
+
+WARMUP_PROMPT = os.environ.get("WARMUP_PROMPT", "How does Dynatrace help an SRE?")
+
+tracer = trace.get_tracer(__name__)
+
+
+def queries_enabled():
+    return os.environ.get("WARMUP_QUERIES", "true").lower() in ("1", "true", "yes")
+
+
+def _check_rails_result(stage, is_safe, message):
+    # a blocked prompt still warmed the rails, an unreachable rails model did not
+    if not is_safe and message.startswith("Error checking"):
+        raise RuntimeError(f"{stage}: {message}")
+
+
+async def warm_up_stages(components, prompt=WARMUP_PROMPT):
+    """Send one synthetic query through every pipeline stage, return the seconds per stage.
+
+    Runs on the event loop of the components. Nothing is stored in the response cache;
+    raises RuntimeError if a stage could not reach its model or tool.
+    """
+    from pipeline import NAT_CONFIG_PATH, check_model_input_rails, check_output_guardrails, run_nat_workflow
+
+    rails = components.get("guardrails")
+    local_rails = components.get("local_input_rails")
+    response_cache = components.get("response_cache")
+    timings = {}
+
+    with tracer.start_as_current_span("warmup") as span:
+        span.set_attribute("warmup.prompt", prompt)
+        if response_cache:
+            start_time = time.perf_counter()
+            await response_cache.embed(prompt)
+            timings["response_cache"] = time.perf_counter() - start_time
+
+        if rails:
+            if local_rails:
+                start_time = time.perf_counter()
+                local_rails.check(prompt)
+                timings["local_input_rails"] = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            is_safe, message = await check_model_input_rails(rails, prompt, components.get("parallel_input_rails"))
+            timings["input_rails"] = time.perf_counter() - start_time
+            _check_rails_result("input rails", is_safe, message)
+
+        start_time = time.perf_counter()
+        workflow_success, workflow_result = await run_nat_workflow(prompt, NAT_CONFIG_PATH)
+        timings["nat_workflow"] = time.perf_counter() - start_time
+        if not workflow_success:
+            raise RuntimeError(f"NAT workflow: {workflow_result}")
+
+        if rails:
+            start_time = time.perf_counter()
+            is_safe, message = await check_output_guardrails(rails, prompt, workflow_result)
+            timings["output_rails"] = time.perf_counter() - start_time
+            _check_rails_result("output rails", is_safe, message)
+
+        span.set_attributes({f"warmup.{stage}.seconds": seconds for stage, seconds in timings.items()})
+
+    print("✓ Warm-up query passed all stages: " +
+          ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up the guarded query pipeline or check its readiness")
+    parser.add_argument("--check", action="store_true",
+                        help="Only check the readiness marker of the running app, exit 0 if it is ready")
+    parser.add_argument("--live", action="store_true",
+                        help="Only check the readiness marker of the running app, exit 1 if its start-up failed")
+    parser.add_argument("--skip-queries", action="store_true", help="Build the components without the warm-up query")
+    args = parser.parse_args()
+
+    from startup import READY_FILE, Startup, pipeline_steps, read_ready_file
+
+    if args.check:
+        status = read_ready_file(READY_FILE)
+        print(json.dumps(status or {"state": "not ready"}, indent=2))
+        raise SystemExit(0 if status and status["state"] == "ready" else 1)
+    if args.live:
+        # no marker while the app is still starting, it is only written once the start-up finished
+        status = read_ready_file(READY_FILE)
+        print(json.dumps(status or {"state": "starting"}, indent=2))
+        raise SystemExit(1 if status and status["state"] == "failed" else 0)
+
+    from pipeline import SERVICE_NAME, find_missing_config_files
+
+    missing_files = find_missing_config_files()
+    if missing_files:
+        print(f"❌ Config files not found: {', '.join(missing_files)}. "
+              "Run 'python app/update_config.py <config_type>' to generate them.")
+        raise SystemExit(1)
+
+    startup = Startup(pipeline_steps(SERVICE_NAME, warmup_queries=not args.skip_queries)).run()
+    print(startup.timing_table())
+    print("✓ Ready" if startup.ready else f"❌ Not ready: {startup.error}")
+    if "event_loop" in startup.components:
+        startup.components["event_loop"].stop()
+    # the app gets ready without the warm-up query, this check also fails when a stage is not reachable
+    raise SystemExit(0 if startup.ready and not startup.warnings else 1)
+
+
+if __name__ == "__main__":
+    main()
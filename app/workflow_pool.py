@@ -0,0 +1,171 @@
+"""Process-wide pool of warm NAT workflows.
+
+Loading a NAT workflow parses the YAML config and builds the LLM client, the tool
+registry and the agent. The pool does that once per config file and content hash and
+hands the resulting session manager out to every concurrent session. The workflow is
+only rebuilt when the config file on disk changes.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import sys
+import threading
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent / "src"
+
+
+def register_components():
+    """Register the NAT components of src/nat_simple_web_query (tavily_search, webpage_query).
+
+    The package is not installed, so NAT does not discover it through its entry points;
+    importing the module registers its functions.
+    """
+    if str(SRC_DIR) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR))
+    import nat_simple_web_query.register  # noqa: F401
+
+
+class _PooledWorkflow:
+    """A built workflow together with the exit stack that keeps it alive."""
+
+    def __init__(self, config_hash, stat_key, exit_stack, session_manager):
+        self.config_hash = config_hash
+        self.stat_key = stat_key
+        self.exit_stack = exit_stack
+        self.session_manager = session_manager
+        self.active = 0
+        self.retired = False
+
+    async def close(self):
+        await self.exit_stack.aclose()
+
+
+class WorkflowPool:
+    """Build NAT workflows once and share them across queries.
+
+    Workflows hold async clients, so an entry is bound to the event loop it was built
+    on. Entries of loops that have been closed are dropped on the next acquire.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        self.warm_hits = 0
+        self.cold_builds = 0
+        self.last_build_seconds = 0.0
+        self.total_build_seconds = 0.0
+
+    def stats(self):
+        """Return the warm-hit / cold-build counters and build latency."""
+        with self._lock:
+            return {
+                "warm_hits": self.warm_hits,
+                "cold_builds": self.cold_builds,
+                "last_build_seconds": self.last_build_seconds,
+                "avg_build_seconds": self.total_build_seconds / self.cold_builds if self.cold_builds else 0.0,
+                "workflows": len(self._entries),
+            }
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, config_path):
+        """Yield a warm NAT session manager for ``config_path``, building it if needed."""
+        entry = await self._get_entry(Path(config_path).resolve())
+        entry.active += 1
+        try:
+            yield entry.session_manager
+        finally:
+            entry.active -= 1
+            if entry.retired and entry.active == 0:
+                await entry.close()
+
+    async def aclose(self):
+        """Close every workflow built on the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key in self._entries if key[1] is loop]
+            entries = [self._entries.pop(key) for key in keys]
+            for key in keys:
+                self._build_locks.pop(key, None)
+        for entry in entries:
+            await entry.close()
+
+    async def _get_entry(self, config_path):
+        loop = asyncio.get_running_loop()
+        key = (config_path, loop)
+        with self._lock:
+            self._drop_closed_loops()
+            build_lock = self._build_locks.get(key)
+            if build_lock is None:
+                build_lock = self._build_locks[key] = asyncio.Lock()
+
+        async with build_lock:
+            entry = self._entries.get(key)
+            stat_key = _stat_key(config_path)
+            if entry is not None and entry.stat_key == stat_key:
+                self._count_warm_hit()
+                return entry
+
+            config_hash = _hash_file(config_path)
+            if entry is not None and entry.config_hash == config_hash:
+                # touched but not changed, e.g. update_config.py copied the same template
+                entry.stat_key = stat_key
+                self._count_warm_hit()
+                return entry
+
+            new_entry = await self._build(config_path, config_hash, stat_key)
+            with self._lock:
+                self._entries[key] = new_entry
+            if entry is not None:
+                print(f"✓ NAT config changed, rebuilt workflow for {config_path}")
+                entry.retired = True
+                if entry.active == 0:
+                    await entry.close()
+            return new_entry
+
+    async def _build(self, config_path, config_hash, stat_key):
+        from nat.runtime.loader import load_workflow
+
+        register_components()
+
+        start_time = time.perf_counter()
+        exit_stack = contextlib.AsyncExitStack()
+        try:
+            session_manager = await exit_stack.enter_async_context(load_workflow(config_path))
+        except BaseException:
+            await exit_stack.aclose()
+            raise
+        duration = time.perf_counter() - start_time
+
+        with self._lock:
+            self.cold_builds += 1
+            self.last_build_seconds = duration
+            self.total_build_seconds += duration
+        print(f"⏱️  NAT workflow build time: {duration:.2f} seconds")
+        return _PooledWorkflow(config_hash, stat_key, exit_stack, session_manager)
+
+    def _count_warm_hit(self):
+        with self._lock:
+            self.warm_hits += 1
+
+    def _drop_closed_loops(self):
+        # resources of a closed loop can no longer be awaited, so they are just released
+        for key in [key for key in self._build_locks if key[1].is_closed()]:
+            self._build_locks.pop(key, None)
+            self._entries.pop(key, None)
+
+
+def _stat_key(config_path):
+    stat = config_path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _hash_file(config_path):
+    return hashlib.sha256(config_path.read_bytes()).hexdigest()
+
+
+# shared by every session of this process
+workflow_pool = WorkflowPool()